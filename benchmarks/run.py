@@ -0,0 +1,341 @@
+#!/usr/bin/python
+'''Benchmark the display pipeline against fake SPI and GPIO devices.
+
+    python benchmarks/run.py                      # run everything
+    python benchmarks/run.py write_buffer puts    # run some benchmarks
+    python benchmarks/run.py --save baseline.json
+    python benchmarks/run.py --compare baseline.json
+
+For each benchmark this reports operations per second, the number of
+bytes that would have been sent over SPI per second, and the peak
+memory allocated by a single operation.  With `--compare`, results are
+checked against a saved baseline, and the exit status is non-zero if
+any benchmark got slower (or allocates more) by more than
+`--threshold`.'''
+
+import argparse
+import functools
+import json
+import logging
+import math
+import platform
+import sys
+import time
+import tracemalloc
+
+import st7565.animation
+import st7565.bitmap
+import st7565.dither
+import st7565.fake
+import st7565.lcd
+import st7565.metrics
+import st7565.sprite
+
+try:
+    from PIL import Image, ImageDraw
+except ImportError:
+    Image = None
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    '''Register a benchmark.  The decorated function does the setup and
+    returns the operation to be timed.'''
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+class Context (object):
+    '''The fake hardware and display that benchmarks run against.'''
+
+    def __init__(self):
+        self.spi = st7565.fake.FakeSpiDev()
+        self.gpio = st7565.fake.FakeGPIO()
+        self.lcd = st7565.lcd.LCD(
+            spi=self.spi, gpio=self.gpio, init=False,
+            metrics=st7565.metrics.Metrics(enabled=False))
+        self.screen = st7565.bitmap.Bitmap()
+
+
+def test_image(size=(64, 64)):
+    img = Image.new('1', size, 1)
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((4, 4, size[0] - 4, size[1] - 4), fill=0)
+    draw.rectangle((size[0] // 4, size[1] // 4,
+                    size[0] * 3 // 4, size[1] * 3 // 4), fill=1)
+    return img
+
+
+@benchmark
+def write_buffer(ctx):
+    '''Full frame writes, each different from the last.'''
+    frames = [bytes(bytearray([i]) * 1024) for i in range(2)]
+    state = [0]
+
+    def run():
+        state[0] ^= 1
+        ctx.lcd.write_buffer(frames[state[0]])
+    return run
+
+
+@benchmark
+def write_buffer_force(ctx):
+    '''Full frame writes with force=True.'''
+    return functools.partial(ctx.lcd.write_buffer, ctx.screen, force=True)
+
+
+@benchmark
+def write_buffer_small_change(ctx):
+    '''Frame writes where only a few bytes of one page change.'''
+    ctx.lcd.write_buffer(ctx.screen, force=True)
+    state = [0]
+
+    def run():
+        state[0] = (state[0] + 1) % 1000
+        ctx.screen.puts(100, 28, '%03d' % state[0])
+        ctx.lcd.write_buffer(ctx.screen)
+        ctx.screen.puts(100, 28, '%03d' % state[0], pen=False)
+    return run
+
+
+@benchmark
+def clear(ctx):
+    return ctx.lcd.clear
+
+
+@benchmark
+def puts(ctx):
+    '''A line of text at the current position.'''
+    return functools.partial(ctx.lcd.puts, 'The quick brown fox')
+
+
+@benchmark
+def bitmap_puts(ctx):
+    '''A line of text drawn into a bitmap, not aligned to a page.'''
+    return functools.partial(ctx.screen.puts, 3, 13, 'The quick brown fox')
+
+
+@benchmark
+def drawbitmap(ctx):
+    '''A 64x64 image drawn centered.'''
+    if Image is None:
+        return None
+    img = test_image()
+    return functools.partial(ctx.screen.drawbitmap, img,
+                             centerx=True, centery=True)
+
+
+@benchmark
+def vscroll(ctx):
+    ctx.screen.box(10, 10, 100, 50)
+    return functools.partial(ctx.screen.vscroll, 3)
+
+
+@benchmark
+def hscroll(ctx):
+    ctx.screen.box(10, 10, 100, 50)
+    return functools.partial(ctx.screen.hscroll, 3)
+
+
+@benchmark
+def box(ctx):
+    return functools.partial(ctx.screen.box, 5, 3, 120, 60)
+
+
+@benchmark
+def fill_rect(ctx):
+    return functools.partial(ctx.screen.fill_rect, 5, 3, 120, 60,
+                             st7565.bitmap.XOR)
+
+
+@benchmark
+def lines(ctx):
+    '''32 lines radiating from the center, as on a gauge.'''
+    ends = [(int(64 + 60 * math.cos(a * math.pi / 16)),
+             int(32 + 30 * math.sin(a * math.pi / 16)))
+            for a in range(32)]
+
+    def run():
+        for x, y in ends:
+            ctx.screen.line(64, 32, x, y, st7565.bitmap.XOR)
+    return run
+
+
+@benchmark
+def circles(ctx):
+    '''A filled circle inside an outlined one.'''
+    def run():
+        ctx.screen.circle(64, 32, 30)
+        ctx.screen.fill_circle(64, 32, 20, st7565.bitmap.XOR)
+    return run
+
+
+@benchmark
+def sprites(ctx):
+    '''20 masked 16x16 sprites drawn at unaligned positions.'''
+    icon = st7565.bitmap.Bitmap(2, 16)
+    icon.fill_circle(7, 7, 7)
+    mask = icon.copy()
+    icon.fill_circle(7, 7, 4, st7565.bitmap.CLEAR)
+    sprite = st7565.sprite.Sprite(icon, mask)
+    positions = [(i * 6 - 4, (i * 13) % 60 - 4) for i in range(20)]
+
+    def run():
+        for x, y in positions:
+            ctx.screen.blit(sprite, x, y, st7565.bitmap.COPY)
+    return run
+
+
+def dither(method):
+    '''A full screen gradient dithered with one method.'''
+    gray = bytes(bytearray((x * 2 + y) % 256
+                           for y in range(64) for x in range(128)))
+    return functools.partial(st7565.dither.dither_gray,
+                             gray, 128, 64, method)
+
+
+@benchmark
+def dither_bayer(ctx):
+    return dither('bayer')
+
+
+@benchmark
+def dither_floyd_steinberg(ctx):
+    return dither('floyd-steinberg')
+
+
+@benchmark
+def generate_spin_frames(ctx):
+    '''36 frames of a spinning 64x64 image, generated in-process.'''
+    if Image is None:
+        return None
+    img = test_image()
+
+    def run():
+        for frame in st7565.animation.spin(img, 10, workers=0):
+            pass
+    return run
+
+
+@benchmark
+def generate_scroll_frames(ctx):
+    '''128 frames of a horizontally scrolling bitmap, in-process.'''
+    ctx.screen.box(10, 10, 100, 50)
+
+    def run():
+        for frame in st7565.animation.hscroll(ctx.screen, 1, workers=0):
+            pass
+    return run
+
+
+def measure(name, min_time=1.0, min_runs=5):
+    ctx = Context()
+    run = BENCHMARKS[name](ctx)
+    if run is None:
+        return None
+
+    # Warm up caches, then measure allocations for one operation.
+    run()
+    tracemalloc.start()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    ctx.spi.reset()
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        run()
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if runs >= min_runs and elapsed >= min_time:
+            break
+
+    return {
+        'ops_per_sec': runs / elapsed,
+        'bytes_per_sec': ctx.spi.bytes / elapsed,
+        'spi_writes_per_op': float(ctx.spi.writes) / runs,
+        'peak_alloc_bytes': peak,
+    }
+
+
+def compare(results, baseline, threshold):
+    '''Print a comparison with a baseline and return the names of the
+    benchmarks that regressed.'''
+    regressed = []
+    for name, result in sorted(results.items()):
+        base = baseline.get(name)
+        if not base or not result:
+            continue
+
+        speed = result['ops_per_sec'] / base['ops_per_sec']
+        alloc = (float(result['peak_alloc_bytes']) /
+                 max(1, base['peak_alloc_bytes']))
+        flag = ''
+        if speed < 1 - threshold or alloc > 1 + threshold:
+            regressed.append(name)
+            flag = '  REGRESSION'
+        print('%-28s speed %6.2fx  alloc %6.2fx%s' % (
+            name, speed, alloc, flag))
+
+    return regressed
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument('--time', type=float, default=1.0,
+                   help='minimum time to spend on each benchmark')
+    p.add_argument('--save', metavar='FILE',
+                   help='save results as a JSON baseline')
+    p.add_argument('--compare', metavar='FILE',
+                   help='compare results with a JSON baseline')
+    p.add_argument('--threshold', type=float, default=0.2,
+                   help='fractional slowdown that counts as a regression')
+    p.add_argument('--list', action='store_true',
+                   help='list the available benchmarks')
+    p.add_argument('names', nargs='*')
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(level='WARN')
+
+    if args.list:
+        for name in sorted(BENCHMARKS):
+            doc = BENCHMARKS[name].__doc__ or ''
+            print('%-28s %s' % (name, doc.strip()))
+        return
+
+    names = args.names or sorted(BENCHMARKS)
+    results = {}
+    for name in names:
+        result = measure(name, min_time=args.time)
+        results[name] = result
+        if result is None:
+            print('%-28s skipped (needs PIL)' % name)
+            continue
+        print('%-28s %10.1f ops/s %12.0f B/s %6.1f writes/op '
+              '%8d B peak' % (
+                  name, result['ops_per_sec'], result['bytes_per_sec'],
+                  result['spi_writes_per_op'], result['peak_alloc_bytes']))
+
+    if args.save:
+        with open(args.save, 'w') as fd:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'results': results,
+            }, fd, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as fd:
+            baseline = json.load(fd)['results']
+        print()
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
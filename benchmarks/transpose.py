@@ -0,0 +1,59 @@
+#!/usr/bin/python
+'''Compare the pure-Python 8x8 transpose conversion used by
+`Bitmap.drawbitmap` with the original per-pixel `set_pixel` loop.
+
+    python benchmarks/transpose.py [--repeat N]
+'''
+
+import argparse
+import random
+import timeit
+
+import st7565.bitmap
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument('--repeat', type=int, default=20)
+    p.add_argument('--width', type=int, default=128)
+    p.add_argument('--height', type=int, default=64)
+    p.add_argument('--ty', type=int, default=0)
+    return p.parse_args()
+
+
+def set_pixel_loop(screen, data, width, height, ty):
+    stride = (width + 7) // 8
+    for x in range(width):
+        for y in range(height):
+            pen = data[y * stride + x // 8] & (0x80 >> (x % 8))
+            screen.set_pixel(x, ty + y, pen == 0)
+
+
+def main():
+    args = parse_args()
+    stride = (args.width + 7) // 8
+    data = bytes(bytearray(random.getrandbits(8)
+                           for i in range(stride * args.height)))
+
+    st7565.bitmap.numpy = None
+    screen = st7565.bitmap.Bitmap()
+
+    slow = min(timeit.repeat(
+        lambda: set_pixel_loop(screen, data,
+                               args.width, args.height, args.ty),
+        number=1, repeat=args.repeat))
+    expected = screen.copy()
+
+    fast = min(timeit.repeat(
+        lambda: screen._draw_rows(data, args.width, args.height,
+                                  0, args.ty, invert=True),
+        number=1, repeat=args.repeat))
+    assert screen == expected
+
+    print('set_pixel loop: %8.3f ms' % (slow * 1000))
+    print('transpose:      %8.3f ms' % (fast * 1000))
+    print('speedup:        %8.1fx' % (slow / fast))
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,9 @@ import setuptools
 
 setuptools.setup(
     install_requires=open('requirements.txt').readlines(),
+    extras_require={
+        'numpy': ['numpy'],
+    },
     version='0.1.0',
     name='st7565',
     packages=setuptools.find_packages(),
@@ -10,6 +13,8 @@ setuptools.setup(
         'console_scripts': [
             'stleds = st7565.cmd.stleds:main',
             'stdemo = st7565.cmd.stdemo:main',
+            'stfont = st7565.cmd.stfont:main',
+            'stplay = st7565.cmd.stplay:main',
         ],
     }
 )
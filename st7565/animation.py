@@ -0,0 +1,110 @@
+'''Precompute animation frames in parallel.
+
+`precompute` calls a transform once for each of a sequence of
+parameters in a pool of worker processes, and yields the resulting
+frames in order as they become available:
+
+    frames = precompute(functools.partial(spin_frame, img),
+                        range(0, 360, 10))
+    for frame in frames:
+        lcd.write_buffer(frame)
+
+A transform is any picklable callable (a module-level function, or a
+`functools.partial` of one) that takes a single parameter and returns
+either a `st7565.bitmap.Bitmap` or a `PIL.Image.Image`.  Images are
+drawn centered on an empty bitmap, dithered if a `dither` method (see
+`st7565.dither`) is given.  Workers send frames back as compact
+page-format `bytes`.'''
+
+import functools
+import logging
+
+from concurrent.futures import ProcessPoolExecutor
+
+import st7565.bitmap
+
+LOG = logging.getLogger(__name__)
+
+
+def render(func, param, pages=8, columns=128, dither=None):
+    '''Call `func(param)` and return the result as page-format
+    `bytes`.'''
+    out = func(param)
+    if isinstance(out, st7565.bitmap.Bitmap):
+        return bytes(out)
+
+    bitmap = st7565.bitmap.Bitmap(pages, columns)
+    bitmap.drawbitmap(out, centerx=True, centery=True, dither=dither)
+    return bytes(bitmap)
+
+
+def precompute(func, params, workers=None, pages=8, columns=128,
+               dither=None):
+    '''Generate one frame for each value in `params` by calling
+    `func(value)` in a pool of `workers` processes (by default, one
+    per CPU).  Yields frames in the order of `params` as soon as each
+    is ready, so playback can start before they are all done.  If
+    `workers` is 0 frames are generated in this process.'''
+    job = functools.partial(render, func, pages=pages, columns=columns,
+                            dither=dither)
+
+    if workers == 0:
+        for param in params:
+            yield job(param)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        for frame in pool.map(job, params):
+            yield frame
+
+
+def spin_frame(img, angle, mode='1'):
+    '''Return `img` rotated by `angle` degrees and cropped to its
+    original size, as an image in `mode` with a white background.'''
+    from PIL import Image
+
+    work = img.convert('RGBA')
+    x = work.rotate(angle, expand=True)
+    x = x.crop(box=(x.size[0]//2 - work.size[0]//2,
+                    x.size[1]//2 - work.size[1]//2,
+                    x.size[0]//2 + work.size[0]//2,
+                    x.size[1]//2 + work.size[1]//2))
+    mask = Image.new('RGBA', x.size, (255,) * 4)
+    return Image.composite(x, mask, x).convert(mode)
+
+
+def hscroll_frame(bitmap, steps):
+    '''Return a copy of `bitmap` scrolled horizontally by `steps`.'''
+    out = bitmap.copy()
+    out.hscroll(steps)
+    return out
+
+
+def vscroll_frame(bitmap, steps):
+    '''Return a copy of `bitmap` scrolled vertically by `steps`.'''
+    out = bitmap.copy()
+    out.vscroll(steps)
+    return out
+
+
+def spin(img, step=10, dither=None, **kwargs):
+    '''Precompute the frames of `img` spinning through a full turn in
+    increments of `step` degrees, dithered with `dither` if given.
+    Keyword arguments are passed to `precompute`.'''
+    func = functools.partial(spin_frame, img.convert('RGBA'),
+                             mode='L' if dither else '1')
+    return precompute(func, range(0, 360, step), dither=dither, **kwargs)
+
+
+def hscroll(bitmap, step=1, **kwargs):
+    '''Precompute the frames of `bitmap` scrolling horizontally through
+    its full width in increments of `step` pixels.'''
+    return precompute(functools.partial(hscroll_frame, bitmap),
+                      range(0, bitmap.width, step), **kwargs)
+
+
+def vscroll(bitmap, step=1, **kwargs):
+    '''Precompute the frames of `bitmap` scrolling vertically through
+    its full height in increments of `step` pixels.'''
+    return precompute(functools.partial(vscroll_frame, bitmap),
+                      range(0, bitmap.height, step), **kwargs)
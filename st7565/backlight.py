@@ -1,7 +1,12 @@
-import RPIO as GPIO
-import RPIO.PWM as PWM
 import logging
 
+import st7565.metrics
+import st7565.pwm
+import st7565.transitions
+
+# Duty cycles run from 0 to RESOLUTION (see st7565.pwm).
+RESOLUTION = st7565.transitions.RESOLUTION
+
 LCD_RED = 18
 LCD_GREEN = 22
 LCD_BLUE = 23
@@ -16,31 +21,43 @@ class Backlight (object):
     def __init__(self,
                  pin_red=LCD_RED,
                  pin_green=LCD_GREEN,
-                 pin_blue=LCD_BLUE):
+                 pin_blue=LCD_BLUE,
+                 metrics=None,
+                 backend=None,
+                 freq=None):
         self.pin_red = pin_red
         self.pin_blue = pin_blue
         self.pin_green = pin_green
+        self.freq = freq
+
+        # The PWM backend or its name (see st7565.pwm).
+        self.pwm = 'rpio' if backend is None else backend
+        self.metrics = (st7565.metrics.registry if metrics is None
+                        else metrics)
+
+        # The duty cycle last set on each channel, so that unchanged
+        # channels can be skipped.
+        self.duties = [None, None, None]
+        self._job = None
+        self._scheduler = None
 
-        self.init_gpio()
         self.init_pwm()
         self.all_leds_off()
 
-    def init_gpio(self):
-        '''Initialize GPIO configuration.'''
-        LOG.debug('initializting GPIO configuration')
-        GPIO.setmode(GPIO.BCM)
-        for pin in [self.pin_red, self.pin_green, self.pin_blue]:
-            GPIO.setup(pin, GPIO.OUT, initial=0)
-
     def init_pwm(self):
-        '''Initialize PWM configuration.  We are using RPIO.PWM to
-        implement software PWM via DMA, using the PCM implementation.  We
-        initalize three DMA channels, one for each color.'''
-        LOG.debug('initializting PWM configuration')
-        PWM.setup(delay_hw=PWM.DELAY_VIA_PCM)
-        PWM.set_loglevel(PWM.LOG_LEVEL_ERRORS)
-        for ch in [0, 1, 2]:
-            PWM.init_channel(ch)
+        '''Initialize PWM configuration: open the backend if we were
+        given its name, and set up one channel for each color.'''
+        if isinstance(self.pwm, str):
+            self.pwm = st7565.pwm.open_backend(self.pwm, freq=self.freq)
+
+        for ch, pin in enumerate([self.pin_red, self.pin_green,
+                                  self.pin_blue]):
+            self.pwm.setup(ch, pin)
+
+    def close(self):
+        '''Stop any transition and release the PWM channels.'''
+        self.stop_transition()
+        self.pwm.close()
 
     def all_leds_off(self):
         '''Turn off all LEDs.'''
@@ -51,12 +68,24 @@ class Backlight (object):
         self.backlight(1, 1, 1)
 
     def _set_led(self, pin, pwm, val):
-        LOG.debug('set LED on pin %d to %s', pin, val)
-        if val == 0 or val == 1:
-            PWM.clear_channel(pwm)
-            GPIO.output(pin, 1-int(val))
-        else:
-            PWM.add_channel_pulse(pwm, pin, 0, 1999 - int(1999 * val))
+        self._set_duty(pin, pwm, int(RESOLUTION * val))
+
+    def _set_duty(self, pin, pwm, duty):
+        if duty == self.duties[pwm]:
+            return
+
+        LOG.debug('set LED on pin %d to %d/%d', pin, duty, RESOLUTION)
+        metrics = self.metrics
+        if metrics.enabled:
+            started = st7565.metrics.clock()
+
+        self.pwm.set_duty(pwm, duty)
+        self.duties[pwm] = duty
+
+        if metrics.enabled:
+            metrics.incr('backlight.updates')
+            metrics.observe('backlight.update_seconds',
+                            st7565.metrics.clock() - started)
 
     @property
     def red(self):
@@ -96,3 +125,48 @@ class Backlight (object):
         self.red = red
         self.green = green
         self.blue = blue
+
+    def set_duties(self, duties):
+        '''Set the duty cycle (between 0 and `RESOLUTION`) of the red,
+        green and blue channels.  Channels that are already at that duty
+        cycle are left alone.'''
+        for pin, pwm, duty in zip(
+                (self.pin_red, self.pin_green, self.pin_blue), (0, 1, 2),
+                duties):
+            self._set_duty(pin, pwm, duty)
+
+        self._red, self._green, self._blue = (
+            float(duty) / RESOLUTION for duty in self.duties)
+
+    def transition(self, transition, scheduler=None):
+        '''Play `transition` (see `st7565.transitions`), replacing any
+        transition already playing.  Transitions are played by
+        `scheduler`, which defaults to the shared
+        `st7565.transitions.default_scheduler`.  Nothing plays until
+        that scheduler runs: `start` it once to play transitions on a
+        background thread, or call its `tick` method from your own
+        loop.'''
+        self.stop_transition()
+        if scheduler is None:
+            scheduler = st7565.transitions.default_scheduler()
+
+        self._scheduler = scheduler
+        self._job = scheduler.add(self, transition)
+        return self._job
+
+    def stop_transition(self):
+        '''Stop the transition that is playing, if any, leaving the
+        backlight at its current color.'''
+        if self._job is not None:
+            self._scheduler.cancel(self._job)
+            self._job = self._scheduler = None
+
+    def fade(self, red, green, blue, duration=1.0, scheduler=None):
+        '''Fade from the current color to `(red, green, blue)`, given as
+        brightness values (see `st7565.transitions`).'''
+        start = (self._red, self._green, self._blue)
+        return self.transition(
+            st7565.transitions.fade(
+                [st7565.transitions.to_brightness(v) for v in start],
+                (red, green, blue), duration),
+            scheduler=scheduler)
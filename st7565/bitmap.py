@@ -1,10 +1,30 @@
 import logging
 import st7565.bitops as bitops
+import st7565.dither
+import st7565.text as text
+import st7565.transpose as transpose
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 LOG = logging.getLogger(__name__)
 
+# Pen modes (see st7565.bitops).
+CLEAR = bitops.CLEAR
+SET = bitops.SET
+XOR = bitops.XOR
+
+# Raster operations for `Bitmap.blit` (see st7565.bitops).
+OR = bitops.OR
+AND = bitops.AND
+COPY = bitops.COPY
+
 
-class Bitmap (list):
+class Bitmap (bytearray):
+
+    __slots__ = ('pages', 'columns', 'width', 'height')
 
     def __init__(self, pages=8, columns=128):
         '''Create an ST7565-compatible bitmap.  Each *page* contains
@@ -31,7 +51,10 @@ class Bitmap (list):
                    0     .     |    .
 
         This buffer can be written directly to the LCD using the
-        `st7565.lcd.LCD.write_buffer` method.
+        `st7565.lcd.LCD.write_buffer` method.  It is a `bytearray`, so
+        it supports the buffer protocol and can be handed to anything
+        that accepts one (`memoryview`, `numpy.frombuffer`,
+        `PIL.Image.frombuffer`, the SPI layer) without conversion.
         '''
 
         self.pages = pages
@@ -39,69 +62,361 @@ class Bitmap (list):
         self.width = columns
         self.height = 8 * pages
 
-        super(Bitmap, self).__init__([0] * pages * columns)
+        super(Bitmap, self).__init__(pages * columns)
+
+    def copy(self):
+        '''Return a new `Bitmap` with the same geometry and contents.'''
+        new = Bitmap(self.pages, self.columns)
+        new[:] = self
+        return new
+
+    def __copy__(self):
+        return self.copy()
+
+    def __reduce_ex__(self, protocol):
+        return (_rebuild, (self.pages, self.columns, bytes(self)))
+
+    @classmethod
+    def from_image(cls, img, dither=None):
+        '''Create a bitmap just large enough to hold `img` (a
+        `PIL.Image.Image`), and draw the image into it (see
+        `drawbitmap`).  The height is rounded up to a whole page.'''
+        img_x, img_y = img.size
+        bitmap = cls((img_y + 7) // 8, img_x)
+        bitmap.drawbitmap(img, dither=dither)
+        return bitmap
 
     def clear(self):
         '''Clear the buffer (reset all locations to 0).'''
-        self[:] = [0] * self.pages * self.columns
+        self[:] = bytes(len(self))
 
-    def set_pixel(self, x, y, pen=True):
-        '''Set (or unset, if `pen` == `False`) a single pixel.'''
-        if x < 0 or x > self.width:
+    def set_pixel(self, x, y, pen=SET):
+        '''Set (or unset, if `pen` == `False`, or flip, if `pen` ==
+        `XOR`) a single pixel.'''
+        if x < 0 or x >= self.width:
             raise ValueError(x)
-        if y < 0 or y > self.height:
+        if y < 0 or y >= self.height:
             raise ValueError(y)
 
-        col = x
-        page = y/8
+        i = (y // 8) * self.columns + x
+        self[i] = bitops.apply_mask(self[i], 0x80 >> (y % 8), pen)
 
-        i = (page * self.columns) + col
+    def _check(self, x1, y1, x2, y2):
+        if x1 < 0 or x2 >= self.width:
+            raise ValueError(x1 if x1 < 0 else x2)
+        if y1 < 0 or y2 >= self.height:
+            raise ValueError(y1 if y1 < 0 else y2)
 
-        if pen:
-            self[i] |= 1 << (7-(y % 8))
-        else:
-            self[i] &= ~(1 << (7-(y % 8)))
+    def _clip(self, x1, y1, x2, y2):
+        '''Return the rectangle with corners `(x1, y1)` and `(x2, y2)`
+        (in either order) clipped to the bitmap, or None if none of it is
+        visible.'''
+        if x2 < x1:
+            x1, x2 = x2, x1
+        if y2 < y1:
+            y1, y2 = y2, y1
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, self.width - 1), min(y2, self.height - 1)
+        if x1 > x2 or y1 > y2:
+            return None
+        return x1, y1, x2, y2
+
+    def _fill(self, x1, y1, x2, y2, pen):
+        '''Fill the (already clipped) rectangle from `(x1, y1)` to `(x2,
+        y2)` inclusive, one masked run of bytes per page.'''
+        columns = self.columns
+        n = x2 - x1 + 1
+        for page in range(y1 // 8, y2 // 8 + 1):
+            top = max(y1 - page * 8, 0)
+            bottom = min(y2 - page * 8, 7)
+            mask = bitops.span_mask(top, bottom)
+            start = page * columns + x1
+            if n == 1:
+                self[start] = bitops.apply_mask(self[start], mask, pen)
+            elif mask == 0xff and pen != XOR:
+                self[start:start + n] = (b'\xff' if pen else b'\x00') * n
+            else:
+                self[start:start + n] = self[start:start + n].translate(
+                    bitops.mask_table(pen, mask))
+
+    def _plot(self, points, pen):
+        '''Draw a collection of `(x, y)` points, skipping those outside
+        the bitmap.  The bits for each byte are gathered first so each
+        byte is written once (and a point listed twice is only flipped
+        once in XOR mode).'''
+        width, height, columns = self.width, self.height, self.columns
+        masks = {}
+        for x, y in points:
+            if 0 <= x < width and 0 <= y < height:
+                i = (y >> 3) * columns + x
+                masks[i] = masks.get(i, 0) | (0x80 >> (y & 7))
+
+        for i, mask in masks.items():
+            self[i] = bitops.apply_mask(self[i], mask, pen)
 
-    def vline(self, x, y, len, pen=True):
+    def vline(self, x, y, len, pen=SET):
         '''Create a vertical line starting at position `(x,y)` and extending
         for `len` pixels.'''
-        LOG.debug('vline from (%d,%d) length %d',
-                  x, y, len)
-        for l in range(len):
-            self.set_pixel(x, y+l, pen)
+        if len <= 0:
+            return
+        self._check(x, y, x, y + len - 1)
+        self._fill(x, y, x, y + len - 1, pen)
 
-    def hline(self, x, y, len, pen=True):
+    def hline(self, x, y, len, pen=SET):
         '''Create a horizontal line starting at position `(x,y)` and extending
         for `len` pixels.'''
-        LOG.debug('hline from (%d,%d) length %d',
-                  x, y, len)
-        for l in range(len):
-            self.set_pixel(x+l, y, pen)
+        if len <= 0:
+            return
+        self._check(x, y, x + len - 1, y)
+        self._fill(x, y, x + len - 1, y, pen)
 
-    def box(self, x1, y1, x2, y2, pen=True):
+    def box(self, x1, y1, x2, y2, pen=SET):
         '''Create a box with upper left corner at position `(x1, y1)`
         and bottom right corner at position `(x2, y2)`.  Set pixels if
-        `pen` == `True`, unset pixels if `pen` == `False`.'''
-        LOG.debug('box from (%d, %d) to (%d, %d)',
-                  x1, y1, x2, y2)
-        self.hline(x1, y1, (x2-x1) + 1, pen)
-        self.hline(x1, y2, (x2-x1) + 1, pen)
-        self.vline(x1, y1, (y2-y1) + 1, pen)
-        self.vline(x2, y1, (y2-y1) + 1, pen)
-
-    def drawbitmap(self, img, tx=0, ty=0, centerx=False, centery=False):
+        `pen` == `True`, unset pixels if `pen` == `False`, flip them if
+        `pen` == `XOR`.'''
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        self._check(x1, y1, x2, y2)
+
+        # Draw each pixel once, so that XOR leaves the corners set.
+        self._fill(x1, y1, x2, y1, pen)
+        if y2 > y1:
+            self._fill(x1, y2, x2, y2, pen)
+        if y2 - y1 > 1:
+            self._fill(x1, y1 + 1, x1, y2 - 1, pen)
+            if x2 > x1:
+                self._fill(x2, y1 + 1, x2, y2 - 1, pen)
+
+    def fill_rect(self, x1, y1, x2, y2, pen=SET):
+        '''Fill the rectangle with corners `(x1, y1)` and `(x2, y2)`,
+        clipped to the bitmap.'''
+        rect = self._clip(x1, y1, x2, y2)
+        if rect is not None:
+            self._fill(rect[0], rect[1], rect[2], rect[3], pen)
+
+    def line(self, x1, y1, x2, y2, pen=SET):
+        '''Draw a line from `(x1, y1)` to `(x2, y2)` using Bresenham's
+        algorithm, clipped to the bitmap.'''
+        if x1 == x2 or y1 == y2:
+            self.fill_rect(x1, y1, x2, y2, pen)
+            return
+
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+
+        points = []
+        x, y = x1, y1
+        while True:
+            points.append((x, y))
+            if x == x2 and y == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x += sx
+            if e2 <= dx:
+                err += dx
+                y += sy
+
+        self._plot(points, pen)
+
+    def circle(self, cx, cy, r, pen=SET):
+        '''Draw a circle of radius `r` centered on `(cx, cy)`, clipped
+        to the bitmap.'''
+        if r < 0:
+            return
+
+        points = []
+        x, y = r, 0
+        err = 1 - r
+        while x >= y:
+            points.extend((
+                (cx + x, cy + y), (cx - x, cy + y),
+                (cx + x, cy - y), (cx - x, cy - y),
+                (cx + y, cy + x), (cx - y, cy + x),
+                (cx + y, cy - x), (cx - y, cy - x),
+            ))
+            y += 1
+            if err < 0:
+                err += 2 * y + 1
+            else:
+                x -= 1
+                err += 2 * (y - x) + 1
+
+        self._plot(points, pen)
+
+    def fill_circle(self, cx, cy, r, pen=SET):
+        '''Draw a filled circle of radius `r` centered on `(cx, cy)`,
+        clipped to the bitmap.  The circle is built from vertical spans,
+        one per column, which are combined into a row of masks for each
+        page and applied with one operation per page.'''
+        if r < 0:
+            return
+
+        x1 = max(cx - r, 0)
+        x2 = min(cx + r, self.width - 1)
+        if x1 > x2:
+            return
+
+        # The half height of the circle at each column offset, from the
+        # same midpoint algorithm as `circle` so the two line up.
+        half = [0] * (r + 1)
+        x, y = r, 0
+        err = 1 - r
+        while x >= y:
+            half[x] = max(half[x], y)
+            half[y] = max(half[y], x)
+            y += 1
+            if err < 0:
+                err += 2 * y + 1
+            else:
+                x -= 1
+                err += 2 * (y - x) + 1
+
+        n = x2 - x1 + 1
+        first = max(cy - r, 0) // 8
+        last = min(cy + r, self.height - 1) // 8
+        if first > last:
+            return
+        rows = [bytearray(n) for page in range(first, last + 1)]
+
+        for col in range(x1, x2 + 1):
+            h = half[abs(col - cx)]
+            top = max(cy - h, 0)
+            bottom = min(cy + h, self.height - 1)
+            if top > bottom:
+                continue
+            for page in range(top // 8, bottom // 8 + 1):
+                rows[page - first][col - x1] = bitops.span_mask(
+                    max(top - page * 8, 0), min(bottom - page * 8, 7))
+
+        for page, row in enumerate(rows, first):
+            start = page * self.columns + x1
+            val = bitops.apply_mask(
+                int.from_bytes(self[start:start + n], 'big'),
+                int.from_bytes(row, 'big'), pen)
+            self[start:start + n] = val.to_bytes(n, 'big')
+
+    def shifted(self, shift):
+        '''Return the contents shifted down by `shift` (0-7) pixels, as
+        a list of `pages + 1` rows of column bytes.'''
+        columns = self.columns
+        blank = bytes(columns)
+        rows = [bytes(self[p * columns:(p + 1) * columns])
+                for p in range(self.pages)]
+        if not shift:
+            return rows + [blank]
+
+        rows = [blank] + rows + [blank]
+        return [bitops.shift_rows_down(rows[p], rows[p + 1], shift)
+                for p in range(self.pages + 1)]
+
+    def blit(self, src, x, y, op=OR, mask=None):
+        '''Draw the bitmap (or `st7565.sprite.Sprite`) `src` with its top
+        left corner at `(x, y)`, clipped to this bitmap.  `op` is one of:
+
+            OR      set pixels that are set in `src`
+            XOR     flip pixels that are set in `src`
+            CLEAR   clear pixels that are set in `src`
+            AND     clear pixels that are clear in `src`
+            COPY    replace pixels with `src`
+
+        If `mask` (a bitmap the size of `src`) is given, only pixels that
+        are set in the mask are touched.  A sprite's own mask is used
+        if it has one and `mask` is not given.
+
+        The source is shifted to the destination's page alignment (a
+        sprite keeps its shifted copies), and each destination page is
+        then combined with one operation across the columns.'''
+        x1 = max(x, 0)
+        x2 = min(x + src.columns, self.columns)
+        if x1 >= x2 or y >= self.height or y + src.height <= 0:
+            return
+
+        page, shift = divmod(y, 8)
+        rows = src.shifted(shift)
+        if mask is None:
+            mask = getattr(src, 'mask', None)
+        masks = None if mask is None else mask.shifted(shift)
+
+        n = x2 - x1
+        lo = x1 - x
+        hi = lo + n
+        columns = self.columns
+
+        for i, row in enumerate(rows):
+            p = page + i
+            if p < 0 or p >= self.pages:
+                continue
+
+            # The bits of this page covered by the source.
+            if i == 0:
+                cover = 0xff >> shift
+            elif i == len(rows) - 1:
+                cover = (0xff << (8 - shift)) & 0xff
+            else:
+                cover = 0xff
+            if not cover:
+                continue
+
+            start = p * columns + x1
+            row = row[lo:hi]
+            if masks is None and op == COPY and cover == 0xff:
+                self[start:start + n] = row
+                continue
+
+            d = int.from_bytes(self[start:start + n], 'big')
+            v = int.from_bytes(row, 'big')
+            if masks is not None:
+                m = int.from_bytes(masks[i][lo:hi], 'big')
+                v &= m
+            elif op in (AND, COPY):
+                m = int.from_bytes(bytes((cover,)) * n, 'big')
+
+            if op == XOR:
+                d ^= v
+            elif op == COPY:
+                d = (d & ~m) | v
+            elif op == AND:
+                d &= v | ~m
+            elif op:
+                d |= v
+            else:
+                d &= ~v
+
+            self[start:start + n] = d.to_bytes(n, 'big')
+
+    def puts(self, x, y, s, pen=True, renderer=None):
+        '''Draw the string `s` with its top left corner at position
+        `(x, y)`.  `y` need not be a multiple of 8.  Uses the given
+        `st7565.text.TextRenderer`, or a shared one for the default
+        font.'''
+        if renderer is None:
+            renderer = _default_renderer()
+        renderer.draw(self, x, y, s, pen)
+
+    def drawbitmap(self, img, tx=0, ty=0, centerx=False, centery=False,
+                   dither=None):
         '''Render an image (a `PIL.Image.Image` instance) onto the buffer,
         with upper left at position `(tx, ty)`.  Center the image
         horizontally if `centerx` is `True`, and center the image
         vertically if `centery` is True.
         
         The image must be no larger than the size of the bitmap buffer, and
-        must be a mode '1' (monochrome) image.'''
+        is converted to a mode '1' (monochrome) image by PIL, unless a
+        `dither` method (see `st7565.dither`) is given, in which case it
+        is converted to grayscale and dithered.  Pixels covered by the
+        image replace the contents of the buffer.  When NumPy is
+        available the image is converted to page format in bulk rather
+        than pixel by pixel; otherwise it is converted in 8x8 blocks by
+        `st7565.transpose`.'''
 
         LOG.debug('render image of size (%d, %d) at position (%d, %d).',
                   *(img.size + (tx, ty)))
-        # convert to black and white
-        img = img.convert('1')
         img_x, img_y = img.size
 
         # bail out if the image is too big
@@ -112,25 +427,107 @@ class Bitmap (list):
                                  self.width, self.height))
 
         if centerx:
-            tx = self.width/2 - img_x/2
+            tx = self.width // 2 - img_x // 2
 
         if centery:
-            ty = self.height/2 - img_y/2
+            ty = self.height // 2 - img_y // 2
+
+        if (tx < 0 or ty < 0 or
+                tx + img_x > self.width or ty + img_y > self.height):
+            raise ValueError('image of size (%d,%d) at (%d,%d) does not '
+                             'fit in (%d,%d)' % (
+                                 img_x, img_y, tx, ty,
+                                 self.width, self.height))
+
+        if dither:
+            data = st7565.dither.dither(img, dither)
+            self._draw_rows(data, img_x, img_y, tx, ty)
+        else:
+            # convert to black and white
+            img = img.convert('1')
+            self._draw_rows(img.tobytes(), img_x, img_y, tx, ty,
+                            invert=True)
+
+    def _draw_rows(self, data, img_x, img_y, tx, ty, invert=False):
+        '''Copy packed 1-bit image rows (MSB first, each row padded to a
+        whole byte) into the buffer at `(tx, ty)`.  Set bits are drawn
+        as set pixels, or as unset pixels if `invert` is true.'''
+        if numpy is not None:
+            self._draw_rows_numpy(data, img_x, img_y, tx, ty, invert)
+            return
 
-        imgdata = list(img.getdata())
-        for x in range(img_x):
-            for y in range(img_y):
-                pen = imgdata[(y*img_x) + x]
-                self.set_pixel(tx+x, ty+y, pen == 0)
+        first = ty // 8
+        offset = ty - first * 8
+        ink = transpose.pack_rows(data, img_x, img_y,
+                                  offset=offset, invert=invert)
+
+        for i, mask in enumerate(transpose.page_masks(img_y, offset)):
+            start = (first + i) * self.columns + tx
+            end = start + img_x
+            src = ink[i * img_x:(i + 1) * img_x]
+            if mask == 0xff:
+                self[start:end] = src
+                continue
+
+            keep = int.from_bytes(bytes((mask ^ 0xff,)) * img_x, 'big')
+            val = ((int.from_bytes(self[start:end], 'big') & keep) |
+                   int.from_bytes(src, 'big'))
+            self[start:end] = val.to_bytes(img_x, 'big')
+
+    def _draw_rows_numpy(self, data, img_x, img_y, tx, ty, invert):
+        stride = (img_x + 7) // 8
+        first = ty // 8
+        last = (ty + img_y + 7) // 8
+        npages = last - first
+        offset = ty - first * 8
+
+        rows = numpy.frombuffer(data, dtype=numpy.uint8)
+        rows = rows[:stride * img_y].reshape(img_y, stride)
+
+        # Lay the image out on a page-aligned canvas, along with a mask
+        # of the pixels it covers, then pack each group of 8 rows into
+        # column bytes with the top row in the most significant bit.
+        ink = numpy.zeros((npages * 8, img_x), dtype=numpy.uint8)
+        ink[offset:offset + img_y] = (
+            numpy.unpackbits(rows, axis=1)[:, :img_x] ^ int(invert))
+        mask = numpy.zeros((npages * 8, img_x), dtype=numpy.uint8)
+        mask[offset:offset + img_y] = 1
+
+        ink = numpy.packbits(
+            ink.reshape(npages, 8, img_x).transpose(0, 2, 1), axis=2)
+        mask = numpy.packbits(
+            mask.reshape(npages, 8, img_x).transpose(0, 2, 1), axis=2)
+
+        dst = numpy.frombuffer(self, dtype=numpy.uint8).reshape(
+            self.pages, self.columns)
+        region = dst[first:last, tx:tx + img_x]
+        region &= ~mask.reshape(npages, img_x)
+        region |= ink.reshape(npages, img_x)
+        del region, dst
 
     def vscroll(self, steps=1):
-        '''Scroll the bitmap buffer vertically by `steps` pixels.'''
-        for col in range(self.columns):
-            bits = self[col::self.columns]
-            if steps > 0:
-                self[col::self.columns] = bitops.rotater(bits, steps)
-            elif steps < 0:
-                self[col::self.columns] = bitops.rotatel(bits, abs(steps))
+        '''Scroll the bitmap buffer vertically by `steps` pixels (down if
+        `steps` is positive, up if it is negative).  Rows that scroll off
+        one edge wrap around to the other.
+
+        Whole pages are rotated with a single slice assignment; what is
+        left is applied a page row at a time, shifting all of the
+        columns together.'''
+        steps %= self.height
+        if not steps:
+            return
+
+        pages, bits = divmod(steps, 8)
+        if pages:
+            split = (self.pages - pages) * self.columns
+            self[:] = self[split:] + self[:split]
+
+        if bits:
+            rows = [self[p * self.columns:(p + 1) * self.columns]
+                    for p in range(self.pages)]
+            for p in range(self.pages):
+                self[p * self.columns:(p + 1) * self.columns] = (
+                    bitops.shift_rows_down(rows[p - 1], rows[p], bits))
 
     def hscroll(self, steps=1):
         '''Scroll the bitmap buffer horizontally by `steps` pixels.'''
@@ -159,3 +556,19 @@ class Bitmap (list):
                 lines.append(''.join((str(x) for x in line)))
 
         return '\n'.join(lines)
+
+
+_renderer = None
+
+
+def _default_renderer():
+    global _renderer
+    if _renderer is None:
+        _renderer = text.TextRenderer()
+    return _renderer
+
+
+def _rebuild(pages, columns, data):
+    bitmap = Bitmap(pages, columns)
+    bitmap[:] = data
+    return bitmap
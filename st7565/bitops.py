@@ -1,5 +1,66 @@
 '''A collection of misc. bit operations.'''
 
+# Translation tables (for use with `bytes.translate`) that shift every
+# byte of a buffer right or left by 0-8 bits.
+SHR = [bytes(bytearray(i >> n for i in range(256))) for n in range(9)]
+SHL = [bytes(bytearray((i << n) & 0xff for i in range(256)))
+       for n in range(9)]
+
+# A translation table that reverses the order of the bits in a byte.
+REVERSE = bytes(bytearray(int('{:08b}'.format(i)[::-1], 2)
+                          for i in range(256)))
+
+# Pen modes for drawing.  `True` and `False` work as SET and CLEAR.
+CLEAR = 0
+SET = 1
+XOR = 2
+
+# Raster operations for `Bitmap.blit`.  OR, XOR and CLEAR act like the
+# pen modes, using the source's set pixels as the mask.
+OR = SET
+AND = 3
+COPY = 4
+
+_mask_tables = {}
+
+
+def mask_table(pen, mask):
+    '''Return a translation table that sets (`SET`), clears (`CLEAR`) or
+    flips (`XOR`) the bits in `mask` in every byte.'''
+    key = (pen, mask)
+    try:
+        return _mask_tables[key]
+    except KeyError:
+        pass
+
+    if pen == XOR:
+        table = bytes(bytearray(i ^ mask for i in range(256)))
+    elif pen:
+        table = bytes(bytearray(i | mask for i in range(256)))
+    else:
+        table = bytes(bytearray(i & ~mask for i in range(256)))
+
+    _mask_tables[key] = table
+    return table
+
+
+def apply_mask(value, mask, pen):
+    '''Apply `mask` to `value` (a byte, or a whole row of bytes as an
+    integer) with the pen mode `pen`.'''
+    if pen == XOR:
+        return value ^ mask
+    elif pen:
+        return value | mask
+    else:
+        return value & ~mask
+
+
+def span_mask(top, bottom):
+    '''Return the byte mask for rows `top` through `bottom` (0-7,
+    inclusive) of a page.'''
+    return (0xff >> top) & (0xff << (7 - bottom)) & 0xff
+
+
 def rotater(row, steps=1):
     '''Rotate an array of integers one bit to the right.'''
     lost = 0
@@ -32,3 +93,16 @@ def rotatel(row, steps=1):
         row[0] |= (lost >> (8-steps))
 
     return row
+
+
+def shift_rows_down(upper, lower, steps):
+    '''Given two vertically adjacent rows of column bytes (top pixel in
+    the most significant bit), return the bytes of `lower` after
+    shifting both rows down by `steps` (0-7) pixels: the low bits of
+    `upper` move into the top of `lower`.'''
+    if steps == 0:
+        return bytes(lower)
+    n = len(lower)
+    return (int.from_bytes(bytes(lower).translate(SHR[steps]), 'big') |
+            int.from_bytes(bytes(upper).translate(SHL[8 - steps]), 'big')
+            ).to_bytes(n, 'big')
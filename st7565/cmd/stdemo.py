@@ -1,44 +1,42 @@
 #!/usr/bin/python
 
-import RPIO as GPIO
-GPIO.setwarnings(False)
-
 import time
 import argparse
-import threading
-import math
 
 from pkg_resources import Requirement, resource_filename
 
-from itertools import cycle
 from PIL import Image
 
+import st7565.animation
 import st7565.backlight
 import st7565.lcd
 import st7565.bitmap
+import st7565.dither
+import st7565.framecache
+import st7565.gpio
+import st7565.pwm
+import st7565.scheduler
+import st7565.transitions
 
 args = None
 leds = None
 lcd = None
 screen = None
-
-
-def pulse():
-    for angle in cycle(range(0, 361)):
-        r = (math.sin(math.radians(angle)) + 1)/2
-        g = (math.sin(math.radians((angle + 90) % 360)) + 1)/2
-        b = (math.sin(math.radians((angle + 180) % 360)) + 1)/2
-
-        leds.backlight(r, g, b)
-        time.sleep(0.01)
+scheduler = None
 
 
 def parse_args():
     p = argparse.ArgumentParser()
 
     g = p.add_argument_group('GPIO')
+    g.add_argument('--gpio', default='rpio',
+                   choices=sorted(st7565.gpio.BACKENDS),
+                   help='GPIO backend for the A0 and RST lines')
     g.add_argument('--pin-a0', type=int)
     g.add_argument('--pin-rst', type=int)
+    g.add_argument('--pwm', default='rpio',
+                   choices=sorted(st7565.pwm.BACKENDS),
+                   help='PWM backend for the backlight')
     g.add_argument('--pin-red', type=int)
     g.add_argument('--pin-green', type=int)
     g.add_argument('--pin-blue', type=int)
@@ -46,6 +44,8 @@ def parse_args():
     g = p.add_argument_group('SPI')
     g.add_argument('--spi-bus', default=0)
     g.add_argument('--spi-dev', default=0)
+    g.add_argument('--spi-speed', type=int,
+                   help='SPI clock speed in Hz')
 
     g = p.add_argument_group('Animation')
     g.add_argument('--spin',
@@ -62,9 +62,18 @@ def parse_args():
                    dest='animation')
 
     g.add_argument('--step', type=int)
+    g.add_argument('--dither', choices=st7565.dither.METHODS,
+                   help='dither the image instead of thresholding it')
     g.add_argument('--delay', default=0.001, type=float)
+    g.add_argument('--fps', type=float,
+                   help='pace animations to this frame rate using a '
+                   'background writer thread (overrides --delay)')
     g.add_argument('--pulse', action='store_true')
     g.add_argument('--wild', action='store_true')
+    g.add_argument('--cache-dir',
+                   help='where to cache generated animation frames')
+    g.add_argument('--no-cache', action='store_true',
+                   help='do not cache generated animation frames')
 
     p.add_argument('--no-init', action='store_true')
     p.add_argument('--adafruit', '-a',
@@ -77,63 +86,83 @@ def parse_args():
     return p.parse_args()
 
 
+def show(buffer):
+    '''Display a frame of an animation, paced by the frame scheduler if
+    --fps was given or by --delay otherwise.'''
+    if scheduler is not None:
+        scheduler.back[:] = buffer
+        scheduler.present()
+    else:
+        lcd.write_buffer(buffer)
+        time.sleep(args.delay)
+
+
 def display_image(img):
     '''Display an image on the LCD screen.'''
-    screen.drawbitmap(img, centerx=True, centery=True)
+    screen.drawbitmap(img, centerx=True, centery=True,
+                      dither=args.dither)
     lcd.write_buffer(screen)
 
 
 def vscroll_image(img):
-    '''Display an image on the LCD screen and scroll it vertically.'''
-    screen.drawbitmap(img, centerx=True, centery=True)
+    '''Display an image on the LCD screen and scroll it vertically.
+    Uses the controller's hardware scrolling unless the display needs a
+    page map or frames are being paced by the frame scheduler.'''
+    screen.drawbitmap(img, centerx=True, centery=True,
+                      dither=args.dither)
 
     while True:
         screen.vscroll(args.step)
-        lcd.write_buffer(screen)
-        time.sleep(args.delay)
+        if lcd.pagemap or scheduler is not None:
+            show(screen)
+        else:
+            lcd.vscroll(args.step, screen)
+            time.sleep(args.delay)
 
 
 def hscroll_image(img):
     '''Display an image on the LCD screen and scroll it horizontally.'''
-    screen.drawbitmap(img, centerx=True, centery=True)
+    screen.drawbitmap(img, centerx=True, centery=True,
+                      dither=args.dither)
 
     while True:
         screen.hscroll(args.step)
-        lcd.write_buffer(screen)
-        time.sleep(args.delay)
+        show(screen)
 
 
 def spin_image(img):
     '''Display an image on the LCD screen and spin it.'''
-    lcd.pos(4, 24)
-    lcd.puts('Generating frames...')
-
-    work = img.convert('RGBA')
-
-    frames = []
-    for angle in range(0, 360, args.step):
-        lcd.pos(4)
-        lcd.puts('%3s' % (int((angle/360.0) * 100)))
-        lcd.send_data([0xff] * int(angle/360.0 * (128-24)))
-
-        x = work.rotate(angle, expand=True)
-        x = x.crop(box=(x.size[0]/2 - work.size[0]/2,
-                        x.size[1]/2 - work.size[1]/2,
-                        x.size[0]/2 + work.size[0]/2,
-                        x.size[1]/2 + work.size[1]/2))
-        mask = Image.new('RGBA', x.size, (255,) * 4)
-        out = Image.composite(x, mask, x)
-        screen.drawbitmap(out.convert('1'), centerx=True, centery=True)
-        frames.append(screen[:])
+    cache = None
+    if not args.no_cache:
+        cache = st7565.framecache.FrameCache(args.cache_dir)
+        key = st7565.framecache.cache_key(
+            img, animation='spin', step=args.step,
+            pages=screen.pages, columns=screen.columns,
+            centerx=True, centery=True, dither=args.dither)
+        frames = cache.get(key)
+    else:
+        frames = None
+
+    if frames is None:
+        # Play frames as they are generated, then loop over them.
+        frames = []
+        for frame in st7565.animation.spin(img, args.step,
+                                           dither=args.dither,
+                                           pages=screen.pages,
+                                           columns=screen.columns):
+            frames.append(frame)
+            show(frame)
+
+        if cache is not None:
+            cache.put(key, frames)
 
     while True:
         for frame in frames:
-            lcd.write_buffer(frame)
-            time.sleep(args.delay)
+            show(frame)
 
 
 def main():
-    global args, lcd, leds, screen
+    global args, lcd, leds, screen, scheduler
 
     args = parse_args()
 
@@ -141,7 +170,7 @@ def main():
         args.spin = args.pulse = True
 
     lcd_kwargs = {}
-    backlight_kwargs = {}
+    backlight_kwargs = {'backend': args.pwm}
 
     if args.pin_a0 is not None:
         lcd_kwargs['pin_a0'] = args.pin_a0
@@ -151,6 +180,8 @@ def main():
         lcd_kwargs['spi_bus'] = args.spi_bus
     if args.spi_dev is not None:
         lcd_kwargs['spi_dev'] = args.spi_dev
+    if args.spi_speed is not None:
+        lcd_kwargs['spi_speed_hz'] = args.spi_speed
     if args.no_init:
         lcd_kwargs['init'] = False
     if args.pin_red is not None:
@@ -160,7 +191,8 @@ def main():
     if args.pin_blue is not None:
         backlight_kwargs['pin_blue'] = args.pin_blue
 
-    lcd = st7565.lcd.LCD(adafruit=args.adafruit, **lcd_kwargs)
+    lcd = st7565.lcd.LCD(adafruit=args.adafruit, gpio=args.gpio,
+                         **lcd_kwargs)
     leds = st7565.backlight.Backlight(**backlight_kwargs)
     screen = st7565.bitmap.Bitmap()
 
@@ -169,9 +201,13 @@ def main():
     lcd.clear()
     leds.all_leds_on()
 
+    if args.fps:
+        scheduler = st7565.scheduler.FrameScheduler(lcd, fps=args.fps)
+        scheduler.start()
+
     if args.pulse:
-        t = threading.Thread(target=pulse)
-        t.start()
+        st7565.transitions.default_scheduler().start()
+        leds.transition(st7565.transitions.rainbow())
 
     if args.animation == 'spin':
         args.step = 10 if args.step is None else args.step
@@ -185,6 +221,10 @@ def main():
     else:
         display_image(img)
 
+        # Keep the backlight pulsing.
+        while args.pulse:
+            time.sleep(300)
+
 
 if __name__ == '__main__':
     main()
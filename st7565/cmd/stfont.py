@@ -0,0 +1,49 @@
+#!/usr/bin/python
+
+import argparse
+import logging
+
+import st7565.bitmap
+import st7565.fonts
+import st7565.text
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Compile a BDF font into a font atlas, or preview '
+        'a font.')
+    p.add_argument('--output', '-o',
+                   help='write the compiled atlas here')
+    p.add_argument('--show', '-s', metavar='TEXT',
+                   help='print TEXT rendered in the font')
+    p.add_argument('--debug',
+                   action='store_const',
+                   const='DEBUG',
+                   dest='loglevel')
+    p.add_argument('font')
+
+    p.set_defaults(loglevel='WARN')
+
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=args.loglevel)
+
+    if args.output:
+        st7565.fonts.compile(args.font, args.output)
+        font = st7565.fonts.atlas.Atlas(args.output)
+    else:
+        font = st7565.fonts.load(args.font)
+
+    if args.show:
+        renderer = st7565.text.TextRenderer(font)
+        screen = st7565.bitmap.Bitmap(pages=font.pages,
+                                      columns=renderer.width(args.show))
+        screen.puts(0, 0, args.show, renderer=renderer)
+        print(screen.dump())
+
+if __name__ == '__main__':
+    main()
@@ -5,13 +5,18 @@ import argparse
 import logging
 
 import st7565.backlight
+import st7565.pwm
 
 
 def parse_args():
     p = argparse.ArgumentParser()
     p.add_argument('--pins',
                    nargs=3)
-    p.add_argument('--frequency')
+    p.add_argument('--frequency', type=int,
+                   help='PWM frequency in Hz')
+    p.add_argument('--backend', default='rpio',
+                   choices=sorted(st7565.pwm.BACKENDS),
+                   help='PWM backend')
     p.add_argument('--on',
                    action='store_true',
                    dest='all_leds')
@@ -42,7 +47,7 @@ def main():
     logging.basicConfig(
         level=args.loglevel)
 
-    kwargs = {}
+    kwargs = {'backend': args.backend}
     if args.pins:
         kwargs['pin_red'] = args.pins[0]
         kwargs['pin_green'] = args.pins[1]
@@ -0,0 +1,100 @@
+#!/usr/bin/python
+
+import argparse
+import logging
+import sys
+
+import st7565.dither
+import st7565.gpio
+import st7565.lcd
+import st7565.playback
+
+
+def parse_args():
+    p = argparse.ArgumentParser(
+        description='Play a stream of PBM/PGM or raw frames on the LCD, '
+        'e.g.: ffmpeg -i video.mp4 -vf scale=-2:64 -f image2pipe '
+        '-c:v pgm - | stplay')
+
+    g = p.add_argument_group('GPIO')
+    g.add_argument('--gpio', default='rpio',
+                   choices=sorted(st7565.gpio.BACKENDS),
+                   help='GPIO backend for the A0 and RST lines')
+    g.add_argument('--pin-a0', type=int)
+    g.add_argument('--pin-rst', type=int)
+
+    g = p.add_argument_group('SPI')
+    g.add_argument('--spi-bus', type=int, default=0)
+    g.add_argument('--spi-dev', type=int, default=0)
+    g.add_argument('--spi-speed', type=int,
+                   help='SPI clock speed in Hz')
+
+    g = p.add_argument_group('Playback')
+    g.add_argument('--fps', type=float, default=30,
+                   help='frames per second (0 to show frames as fast '
+                   'as they arrive)')
+    g.add_argument('--format', choices=st7565.playback.FORMATS,
+                   default='auto')
+    g.add_argument('--dither', choices=st7565.dither.METHODS,
+                   default='bayer',
+                   help='how to convert PGM frames to black and white')
+    g.add_argument('--queue', type=int, default=8,
+                   help='number of decoded frames to buffer')
+    g.add_argument('--drop', action='store_true',
+                   help='skip frames to keep up with the frame rate')
+
+    p.add_argument('--no-init', action='store_true')
+    p.add_argument('--adafruit', '-a',
+                   action='store_true')
+    p.add_argument('--debug',
+                   action='store_const',
+                   const='DEBUG',
+                   dest='loglevel')
+    p.add_argument('input', nargs='?', default='-',
+                   help='file or FIFO to read (default: standard input)')
+
+    p.set_defaults(loglevel='WARN')
+
+    return p.parse_args()
+
+
+def main():
+    args = parse_args()
+    logging.basicConfig(
+        level=args.loglevel)
+
+    lcd_kwargs = {}
+    if args.pin_a0 is not None:
+        lcd_kwargs['pin_a0'] = args.pin_a0
+    if args.pin_rst is not None:
+        lcd_kwargs['pin_rst'] = args.pin_rst
+    if args.spi_speed is not None:
+        lcd_kwargs['spi_speed_hz'] = args.spi_speed
+    if args.no_init:
+        lcd_kwargs['init'] = False
+
+    lcd = st7565.lcd.LCD(adafruit=args.adafruit, gpio=args.gpio,
+                         spi_bus=args.spi_bus, spi_dev=args.spi_dev,
+                         **lcd_kwargs)
+    lcd.clear()
+
+    if args.input == '-':
+        fd = sys.stdin.buffer
+    else:
+        fd = open(args.input, 'rb')
+
+    player = st7565.playback.Player(
+        lcd, fd, fps=args.fps, format=args.format, dither=args.dither,
+        queue_size=args.queue, drop=args.drop)
+
+    try:
+        player.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sys.stderr.write(
+            'played %(frames)d frames (%(dropped)d dropped, %(late)d late) '
+            'at %(fps).1f fps\n' % player.stats())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+'''Convert grayscale images to 1-bit, for drawing on the display.
+
+    data = st7565.dither.dither(img, 'atkinson')
+    screen.drawbitmap(img, dither='atkinson')   # the same, drawn
+
+Methods:
+
+    threshold         every pixel darker than middle gray is set
+    bayer             ordered dithering with a Bayer matrix (`size` 2,
+                      4 or 8); cheap, stable from frame to frame, and
+                      the best choice for video
+    floyd-steinberg   error diffusion; the most faithful tones
+    atkinson          error diffusion that drops a quarter of the error,
+                      for more contrast and cleaner highlights
+
+The result is packed 1-bit rows, most significant bit first, each row
+padded to a whole byte, with bits set for dark pixels: the format
+`st7565.bitmap.Bitmap._draw_rows` turns into page bytes.
+
+With NumPy, ordered dithering and packing are done on whole arrays,
+and error diffusion only loops in Python along each row; the error
+carried to the following rows is added a row at a time.  Without it,
+rows are processed with `bytes.translate` and lookup tables.'''
+
+import logging
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+LOG = logging.getLogger(__name__)
+
+THRESHOLD = 128
+
+# (dx, dy, weight) for each neighbour that receives part of a pixel's
+# error, and the divisor for the weights.
+FLOYD_STEINBERG = (((1, 0, 7), (-1, 1, 3), (0, 1, 5), (1, 1, 1)), 16)
+ATKINSON = (((1, 0, 1), (2, 0, 1),
+             (-1, 1, 1), (0, 1, 1), (1, 1, 1),
+             (0, 2, 1)), 8)
+
+KERNELS = {
+    'floyd-steinberg': FLOYD_STEINBERG,
+    'atkinson': ATKINSON,
+}
+
+METHODS = ('threshold', 'bayer') + tuple(sorted(KERNELS))
+
+_bayer = {}
+_bayer_arrays = {}
+_compare_tables = {}
+
+# _bit_tables[n] maps a byte holding 0 or 1 to that bit at position n.
+_bit_tables = [bytes(bytearray((i & 1) << n for i in range(256)))
+               for n in range(8)]
+
+
+def bayer_matrix(size=4):
+    '''Return the Bayer threshold matrix of the given size (a power of
+    two) as a tuple of rows, scaled to gray levels 0-255.  Matrices are
+    computed once and cached.'''
+    try:
+        return _bayer[size]
+    except KeyError:
+        pass
+
+    if size < 2 or size & (size - 1):
+        raise ValueError('Bayer matrix size must be a power of two')
+
+    m = [[0]]
+    while len(m) < size:
+        m = ([[4 * v for v in row] + [4 * v + 2 for v in row] for row in m] +
+             [[4 * v + 3 for v in row] + [4 * v + 1 for v in row]
+              for row in m])
+
+    cells = size * size
+    matrix = tuple(tuple(int((v + 0.5) * 256 / cells) for v in row)
+                   for row in m)
+    _bayer[size] = matrix
+    return matrix
+
+
+def _compare_table(threshold):
+    '''Return a translation table mapping gray levels below `threshold`
+    to 1 and the rest to 0.'''
+    try:
+        return _compare_tables[threshold]
+    except KeyError:
+        table = bytes(bytearray(int(g < threshold) for g in range(256)))
+        _compare_tables[threshold] = table
+        return table
+
+
+def pack_row(bits, stride):
+    '''Pack a row of bytes holding 0 or 1 (padded to `stride * 8`) into
+    `stride` bytes, most significant bit first.'''
+    v = 0
+    for k in range(8):
+        v |= int.from_bytes(bits[k::8].translate(_bit_tables[7 - k]), 'big')
+    return v.to_bytes(stride, 'big')
+
+
+def _gray(img):
+    img = img.convert('L')
+    return img.tobytes(), img.size[0], img.size[1]
+
+
+def dither(img, method='floyd-steinberg', size=4):
+    '''Dither a `PIL.Image.Image` with `method` (see the module
+    documentation) and return the packed rows.'''
+    data, width, height = _gray(img)
+    return dither_gray(data, width, height, method, size)
+
+
+def dither_gray(data, width, height, method='floyd-steinberg', size=4):
+    '''Dither 8-bit grayscale pixels (`width * height` bytes, 0 is
+    black) and return the packed rows.'''
+    if len(data) < width * height:
+        raise ValueError('expected %d bytes of image data, got %d' % (
+            width * height, len(data)))
+
+    if method == 'threshold':
+        return ordered(data, width, height, ((THRESHOLD,),))
+    elif method == 'bayer':
+        return ordered(data, width, height, bayer_matrix(size))
+
+    try:
+        kernel, divisor = KERNELS[method]
+    except KeyError:
+        raise ValueError('unknown dithering method: %s' % method)
+
+    return diffuse(data, width, height, kernel, divisor)
+
+
+def ordered(data, width, height, matrix):
+    '''Ordered dithering: set each pixel that is darker than the entry of
+    the threshold `matrix` (tiled over the image) at its position.'''
+    stride = (width + 7) // 8
+    n = len(matrix)
+
+    if numpy is not None:
+        key = (matrix, width, height)
+        thresholds = _bayer_arrays.get(key)
+        if thresholds is None:
+            tile = numpy.array(matrix, dtype=numpy.uint8)
+            thresholds = numpy.tile(
+                tile, ((height + n - 1) // n, (width + n - 1) // n)
+            )[:height, :width]
+            _bayer_arrays.clear()
+            _bayer_arrays[key] = thresholds
+
+        gray = numpy.frombuffer(data, dtype=numpy.uint8,
+                                count=width * height).reshape(height, width)
+        return numpy.packbits(gray < thresholds, axis=1).tobytes()
+
+    out = bytearray()
+    bits = bytearray(stride * 8)
+    data = bytes(data)
+    for y in range(height):
+        row = data[y * width:(y + 1) * width]
+        thresholds = matrix[y % n]
+        for j in range(min(n, width)):
+            bits[j:width:n] = row[j::n].translate(
+                _compare_table(thresholds[j]))
+        out += pack_row(bits, stride)
+
+    return bytes(out)
+
+
+def diffuse(data, width, height, kernel, divisor):
+    '''Error diffusion dithering: each pixel is set if it (plus the error
+    it has received) is darker than middle gray, and the difference
+    between its value and the value shown is passed on to its
+    neighbours according to `kernel`.'''
+    stride = (width + 7) // 8
+    right = [(dx, w) for dx, dy, w in kernel if dy == 0]
+    below = [(dx, dy, w) for dx, dy, w in kernel if dy > 0]
+    depth = max(dy for dx, dy, w in kernel) + 1
+    pad = max(abs(dx) for dx, dy, w in kernel)
+    half = divisor // 2
+
+    # Error sums (in units of 1/divisor) for this row and the rows
+    # below it, with `pad` columns of slack on each side.
+    if numpy is not None:
+        acc = [numpy.zeros(width + 2 * pad, dtype=numpy.int32)
+               for i in range(depth)]
+    else:
+        acc = [[0] * (width + 2 * pad) for i in range(depth)]
+
+    out = bytearray()
+    bits = bytearray(stride * 8)
+    errors = [0] * width
+    data = bytes(data)
+
+    for y in range(height):
+        cur = acc[0]
+        if numpy is not None:
+            cur = cur.tolist()
+
+        base = y * width
+        for x in range(width):
+            v = data[base + x] + (cur[x + pad] + half) // divisor
+            if v < THRESHOLD:
+                bits[x] = 1
+                err = v
+            else:
+                bits[x] = 0
+                err = v - 255
+
+            errors[x] = err
+            for dx, w in right:
+                cur[x + pad + dx] += err * w
+
+        out += pack_row(bits, stride)
+
+        # Spread the row's errors to the rows below, and move on a row.
+        acc.append(acc.pop(0))
+        if numpy is not None:
+            acc[-1][:] = 0
+            errs = numpy.array(errors, dtype=numpy.int32)
+            for dx, dy, w in below:
+                acc[dy - 1][pad + dx:pad + dx + width] += errs * w
+        else:
+            last = acc[-1]
+            last[:] = [0] * len(last)
+            for dx, dy, w in below:
+                row = acc[dy - 1]
+                for x in range(width):
+                    row[pad + dx + x] += errors[x] * w
+
+    return bytes(out)
@@ -0,0 +1,273 @@
+'''A software model of the ST7565 controller.
+
+`Emulator` decodes the byte stream that `st7565.lcd.LCD` sends, using
+the level of the A0 line to tell commands from data, and keeps a copy
+of the 132x65 display RAM.  It stands in for both the SPI device and
+the GPIO module, so the whole rendering pipeline can run on any
+machine:
+
+    emu = Emulator()
+    lcd = st7565.lcd.LCD(spi=emu, gpio=emu)
+    lcd.write_buffer(screen)
+    assert emu.frame() == screen
+    emu.save('screen.png')
+
+The model has two steps.  The controller numbers display lines the
+way the datasheet does: line `L` is bit `L % 8` of page `L // 8` (D0
+first), and COM output `c` shows line `(c + start_line) % 64` (with
+`c` counted from the other end when the COM output mode is reversed).
+The panel is then wired to the COM outputs the way this package
+expects, so that with a start line of 0 the most significant bit of
+each page byte is the top row of that page: row `y` is connected to
+COM `8 * page + 7 - y % 8`, where `page` is `y // 8` put through the
+page map.  With `adafruit=True` the emulator uses the same page map
+and column offset as `LCD(adafruit=True)`.'''
+
+import logging
+
+import st7565.bitmap
+import st7565.lcd
+import st7565.ops as ops
+
+LOG = logging.getLogger(__name__)
+
+RAM_PAGES = 9
+RAM_COLUMNS = 132
+
+# Commands that are followed by a second byte.
+TWO_BYTE_COMMANDS = (
+    ops.BRIGHTNESS_SET,
+    ops.STATIC_INDICATOR_SET,
+    ops.STATIC_INDICATOR_SET | 1,
+    ops.BOOSTER_RATIO_SET,
+)
+
+RMW_END = 0b11101110  # EE
+
+
+class Emulator (object):
+
+    def __init__(self, pin_a0=st7565.lcd.LCD_A0,
+                 pin_rst=st7565.lcd.LCD_RST,
+                 adafruit=False):
+        self.pin_a0 = pin_a0
+        self.pin_rst = pin_rst
+
+        if adafruit:
+            self.pagemap = [3, 2, 1, 0, 7, 6, 5, 4]
+            self.column_offset = 1
+        else:
+            self.pagemap = None
+            self.column_offset = 0
+
+        self.ram = bytearray(RAM_PAGES * RAM_COLUMNS)
+        self.a0 = 1
+        self.levels = {}
+        self.fd = -1
+
+        self.command_bytes = 0
+        self.data_bytes = 0
+        self.unknown = 0
+
+        self.reset()
+
+    def reset(self):
+        '''Reset the controller registers, as the RESET command does.
+        Display RAM is left alone.'''
+        self.page = 0
+        self.column = 0
+        self.start_line = 0
+        self.adc_reverse = False
+        self.com_reverse = False
+        self.reverse = False
+        self.all_points = False
+        self.display_on = False
+        self.bias = 0
+        self.power = 0
+        self.resistor_ratio = 0
+        self.brightness = 0x20
+        self.static_indicator = 0
+        self.booster_ratio = 0
+        self._rmw_column = None
+        self._expect = None
+
+    # GPIO backend interface (see st7565.gpio)
+
+    def setup(self, pin, initial=0):
+        self.output(pin, initial)
+
+    def output(self, pin, value):
+        value = int(value)
+        if pin == self.pin_a0:
+            self.a0 = value
+        elif pin == self.pin_rst and value == 0 and self.levels.get(pin):
+            LOG.debug('hardware reset')
+            self.reset()
+        self.levels[pin] = value
+
+    # SPI interface
+
+    def write(self, bytes):
+        if self.a0:
+            self.write_data(bytes)
+        else:
+            self.write_command(bytes)
+
+    def write_segments(self, segments):
+        for seg in segments:
+            self.write(seg)
+
+    writebytes = write
+
+    def close(self):
+        pass
+
+    def fileno(self):
+        return self.fd
+
+    # Controller
+
+    def write_command(self, bytes):
+        '''Execute a sequence of command bytes.'''
+        for b in bytearray(bytes):
+            self.command_bytes += 1
+            if self._expect is not None:
+                setattr(self, self._expect, b)
+                self._expect = None
+            else:
+                self._command(b)
+
+    def _command(self, b):
+        if b in TWO_BYTE_COMMANDS:
+            if b == ops.BRIGHTNESS_SET:
+                self._expect = 'brightness'
+            elif b == ops.BOOSTER_RATIO_SET:
+                self._expect = 'booster_ratio'
+            else:
+                self._expect = 'static_indicator'
+        elif b & 0xf0 == ops.PAGE_SET:
+            self.page = b & 0x0f
+        elif b & 0xf0 == ops.COLUMN_SET_MSB:
+            self.column = (self.column & 0x0f) | ((b & 0x0f) << 4)
+        elif b & 0xf0 == ops.COLUMN_SET_LSB:
+            self.column = (self.column & 0xf0) | (b & 0x0f)
+        elif b & 0xc0 == ops.DISPLAY_START_LINE_SET:
+            self.start_line = b & 0x3f
+        elif b & 0xfe == ops.ADC_SELECT:
+            self.adc_reverse = bool(b & 1)
+        elif b & 0xfe == ops.BIAS_SET:
+            self.bias = b & 1
+        elif b & 0xfe == ops.DISPLAY_ALL_POINTS_NORMAL:
+            self.all_points = bool(b & 1)
+        elif b & 0xfe == ops.DISPLAY_NORMAL:
+            self.reverse = bool(b & 1)
+        elif b & 0xfe == ops.DISPLAY_OFF:
+            self.display_on = bool(b & 1)
+        elif b & 0xf0 == ops.COMMON_OUTPUT_MODE_SELECT:
+            self.com_reverse = bool(b & 0x08)
+        elif b & 0xf8 == ops.POWER_CONTROL_SET:
+            self.power = b & 0x07
+        elif b & 0xf8 == ops.REGULATOR_RESISTOR_SET:
+            self.resistor_ratio = b & 0x07
+        elif b == ops.RMW:
+            self._rmw_column = self.column
+        elif b == RMW_END:
+            if self._rmw_column is not None:
+                self.column = self._rmw_column
+                self._rmw_column = None
+        elif b == ops.RESET:
+            self.reset()
+        elif b == ops.NOP:
+            pass
+        else:
+            LOG.warning('unknown command 0x%02x', b)
+            self.unknown += 1
+
+    def write_data(self, bytes):
+        '''Write data bytes to display RAM at the current address.  The
+        column address increments after each byte and stops at the last
+        column.'''
+        data = bytearray(bytes)
+        self.data_bytes += len(data)
+        if self.page >= RAM_PAGES:
+            return
+
+        n = min(len(data), RAM_COLUMNS - self.column)
+        start = self.page * RAM_COLUMNS + self.column
+        self.ram[start:start + n] = data[:n]
+        self.column = min(self.column + len(data), RAM_COLUMNS - 1)
+
+    # Output
+
+    def com(self, y):
+        '''Return the COM output that panel row `y` is wired to.'''
+        page = y // 8
+        if self.pagemap:
+            page = self.pagemap[page]
+        return page * 8 + 7 - y % 8
+
+    def line(self, com):
+        '''Return the display line that COM output `com` shows.'''
+        if self.com_reverse:
+            com = 63 - com
+        return (com + self.start_line) % 64
+
+    def pixel(self, x, y):
+        '''Return the state of the pixel at `(x, y)` as seen on a
+        128x64 panel.'''
+        if not self.display_on:
+            return False
+        if self.all_points:
+            return True
+
+        page, bit = divmod(self.line(self.com(y)), 8)
+
+        seg = x + self.column_offset
+        col = RAM_COLUMNS - 1 - seg if self.adc_reverse else seg
+
+        on = bool(self.ram[page * RAM_COLUMNS + col] & (1 << bit))
+        return on != self.reverse
+
+    def frame(self):
+        '''Return what the panel shows as a `st7565.bitmap.Bitmap`.'''
+        out = st7565.bitmap.Bitmap()
+        for y in range(out.height):
+            mask = 0x80 >> (y % 8)
+            base = (y // 8) * out.columns
+            for x in range(out.columns):
+                if self.pixel(x, y):
+                    out[base + x] |= mask
+        return out
+
+    def dump(self, chars=None):
+        '''Return the panel contents as ASCII art (see
+        `st7565.bitmap.Bitmap.dump`).'''
+        return self.frame().dump(chars)
+
+    def dump_ram(self, chars=None):
+        '''Return all of display RAM (132x65, without applying any of
+        the display settings) as ASCII art.'''
+        ram = st7565.bitmap.Bitmap(RAM_PAGES, RAM_COLUMNS)
+        ram[:] = self.ram
+        return ram.dump(chars)
+
+    def image(self, scale=1):
+        '''Return the panel contents as a `PIL.Image.Image`, with set
+        pixels drawn in black.'''
+        from PIL import Image
+
+        frame = self.frame()
+        img = Image.new('1', (frame.width, frame.height), 1)
+        pixels = img.load()
+        for y in range(frame.height):
+            for x in range(frame.width):
+                if frame[(y // 8) * frame.columns + x] & (0x80 >> (y % 8)):
+                    pixels[x, y] = 0
+
+        if scale != 1:
+            img = img.resize((frame.width * scale, frame.height * scale))
+        return img
+
+    def save(self, path, scale=4):
+        '''Save the panel contents as an image file (e.g. a PNG).'''
+        self.image(scale).save(path)
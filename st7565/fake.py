@@ -0,0 +1,58 @@
+'''Stand-ins for the hardware, for running the display code on
+machines without an ST7565 attached (benchmarks, tests, CI):
+
+    spi = FakeSpiDev()
+    lcd = st7565.lcd.LCD(spi=spi, gpio=FakeGPIO(), init=False)
+    lcd.write_buffer(screen)
+    print(spi.bytes)
+'''
+
+import logging
+
+from st7565.gpio import FakeGPIO  # noqa
+
+LOG = logging.getLogger(__name__)
+
+
+class FakeSpiDev (object):
+    '''Accepts writes like `st7565.spidev.SpiDev` and counts them.  If
+    `record` is true every write is also kept in `log`.'''
+
+    def __init__(self, bus=0, dev=0, record=False):
+        self.bus = bus
+        self.dev = dev
+        self.record = record
+        self.fd = -1
+        self.reset()
+
+    def reset(self):
+        '''Reset the counters and the write log.'''
+        self.writes = 0
+        self.messages = 0
+        self.bytes = 0
+        self.log = []
+
+    def write(self, bytes):
+        self.write_segments([bytes])
+
+    def write_segments(self, segments):
+        self.messages += 1
+        for seg in segments:
+            self.writes += 1
+            self.bytes += len(seg)
+            if self.record:
+                self.log.append(bytes(bytearray(seg)))
+
+    writebytes = write
+
+    def close(self):
+        pass
+
+    def fileno(self):
+        return self.fd
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
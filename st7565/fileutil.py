@@ -0,0 +1,39 @@
+'''Helpers for the files the package keeps on disk.'''
+
+import contextlib
+import os
+import tempfile
+
+
+def cache_dir(name):
+    '''Return the directory where cached `name` files are kept, following
+    the XDG base directory specification
+    (`$XDG_CACHE_HOME/st7565/<name>`, by default under `~/.cache`).'''
+    base = os.environ.get('XDG_CACHE_HOME',
+                          os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'st7565', name)
+
+
+@contextlib.contextmanager
+def atomic_write(path, mode='wb'):
+    '''Write `path` all at once:
+
+        with atomic_write(path) as out:
+            out.write(data)
+
+    The block writes to a temporary file in the same directory, which
+    is renamed over `path` when the block completes, so that readers
+    never see a partial file.  If the block raises, the temporary file
+    is removed and `path` is left as it was.'''
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               suffix='.tmp')
+    try:
+        with os.fdopen(fd, mode) as out:
+            yield out
+        os.rename(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,77 @@
+'''Bitmap fonts.
+
+A font is any object with a `pages` attribute (the glyph height in
+pages) and a `glyph(c)` method returning the page-format bytes for a
+character (`width` column bytes for each page, top page first), or
+`None` if there is no such glyph.  Glyph widths may differ.
+
+`load` returns a compiled `st7565.fonts.atlas.Atlas` for a BDF font
+or a precompiled atlas file; `ModuleFont` adapts font modules such as
+`st7565.fonts.font5x7`.'''
+
+import hashlib
+import os
+
+import st7565.fileutil
+from st7565.fonts import atlas
+
+SUFFIX = '.stf'
+
+
+class ModuleFont (object):
+    '''A single-page font stored as a Python module with `glyphs` and
+    `min_char` attributes, like `st7565.fonts.font5x7`.'''
+
+    pages = 1
+
+    def __init__(self, module):
+        self.module = module
+        self.ascent = 8
+
+    def glyph(self, c):
+        i = ord(c) - self.module.min_char
+        if 0 <= i < len(self.module.glyphs):
+            return bytes(bytearray(self.module.glyphs[i]))
+
+
+def default_cache_dir():
+    '''Return the directory where compiled fonts are kept.'''
+    return st7565.fileutil.cache_dir('fonts')
+
+
+def compile(src, dst):
+    '''Compile the BDF font at path `src` into an atlas at path `dst`.'''
+    with open(src, 'rb') as fd:
+        font = atlas.read_bdf(fd)
+
+    with st7565.fileutil.atomic_write(dst) as out:
+        atlas.write_atlas(out, font)
+
+
+def load(path, cache_dir=None):
+    '''Load the font at `path`.  Compiled atlases are mapped directly.
+    BDF fonts are compiled the first time they are loaded, and the atlas
+    is kept in `cache_dir` (keyed by the font's content) for next
+    time.'''
+    with open(path, 'rb') as fd:
+        magic = fd.read(len(atlas.MAGIC))
+        if magic == atlas.MAGIC:
+            content = None
+        else:
+            content = hashlib.sha1(magic)
+            for chunk in iter(lambda: fd.read(65536), b''):
+                content.update(chunk)
+
+    if content is None:
+        return atlas.Atlas(path)
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+
+    dst = os.path.join(cache_dir, content.hexdigest() + SUFFIX)
+    if not os.path.exists(dst):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        compile(path, dst)
+
+    return atlas.Atlas(dst)
@@ -0,0 +1,208 @@
+'''Compiled bitmap font atlases.
+
+An atlas holds every glyph of a font pre-packed in the page/column
+format used by the display, so that drawing text never converts
+pixels.  The file format is:
+
+    header   magic, version, pages, first code point, glyph count,
+             ascent
+    index    one (offset, width) entry per code point; a width of
+             0xffff marks a missing glyph
+    data     for each glyph, `width` column bytes for each of `pages`
+             pages, top page first
+
+`Atlas` maps the file with `mmap` and reads glyphs out of it on demand,
+so loading a font costs no time and creates no per-glyph objects.
+
+Atlases are compiled from BDF fonts (`read_bdf`) or from font modules
+in the style of `st7565.fonts.font5x7` (`read_module`).'''
+
+import mmap
+import struct
+
+MAGIC = b'ST7565FA'
+VERSION = 1
+
+# magic, version, pages, reserved, first, count, ascent
+HEADER = struct.Struct('<8sHBBIIH')
+INDEX = struct.Struct('<IH')
+
+MISSING = 0xffff
+
+
+class FontData (object):
+    '''An uncompiled font: a mapping of code points to glyphs, where
+    each glyph is `(width, data)` and `data` holds `width` column bytes
+    for each of `pages` pages.'''
+
+    def __init__(self, pages, ascent=None, glyphs=None):
+        self.pages = pages
+        self.ascent = pages * 8 if ascent is None else ascent
+        self.glyphs = {} if glyphs is None else glyphs
+
+    def glyph(self, c):
+        try:
+            return self.glyphs[ord(c)][1]
+        except KeyError:
+            return None
+
+
+def read_module(module):
+    '''Return a `FontData` for a font module with `glyphs` and
+    `min_char` attributes, such as `st7565.fonts.font5x7`.'''
+    font = FontData(1)
+    for i, columns in enumerate(module.glyphs):
+        font.glyphs[module.min_char + i] = (
+            len(columns), bytes(bytearray(columns)))
+    return font
+
+
+def read_bdf(fd):
+    '''Return a `FontData` for the BDF font read from the file object
+    `fd`.  Glyphs keep their own advance width (DWIDTH), so proportional
+    fonts stay proportional; the height is the font's ascent plus
+    descent, rounded up to whole pages.'''
+    ascent = descent = None
+    bbox = None
+    chars = []
+    char = None
+    bitmap = None
+
+    for line in fd:
+        if isinstance(line, bytes):
+            line = line.decode('latin-1')
+        words = line.split()
+        if not words:
+            continue
+        key = words[0]
+
+        if bitmap is not None:
+            if key == 'ENDCHAR':
+                char['bitmap'] = bitmap
+                chars.append(char)
+                char = bitmap = None
+            else:
+                bitmap.append(int(key, 16))
+        elif key == 'FONTBOUNDINGBOX':
+            bbox = [int(x) for x in words[1:5]]
+        elif key == 'FONT_ASCENT':
+            ascent = int(words[1])
+        elif key == 'FONT_DESCENT':
+            descent = int(words[1])
+        elif key == 'STARTCHAR':
+            char = {}
+        elif char is None:
+            continue
+        elif key == 'ENCODING':
+            char['encoding'] = int(words[1])
+        elif key == 'DWIDTH':
+            char['dwidth'] = int(words[1])
+        elif key == 'BBX':
+            char['bbx'] = [int(x) for x in words[1:5]]
+        elif key == 'BITMAP':
+            bitmap = []
+
+    if ascent is None or descent is None:
+        if bbox is None:
+            raise ValueError('BDF font has no FONT_ASCENT/FONT_DESCENT '
+                             'or FONTBOUNDINGBOX')
+        ascent = bbox[1] + bbox[3]
+        descent = -bbox[3]
+
+    height = ascent + descent
+    font = FontData((height + 7) // 8, ascent=ascent)
+
+    for char in chars:
+        code = char.get('encoding', -1)
+        if code < 0:
+            continue
+
+        w, h, xoff, yoff = char.get('bbx', bbox)
+        width = char.get('dwidth', w)
+        data = bytearray(font.pages * width)
+        top = ascent - (yoff + h)
+        rowbits = ((w + 7) // 8) * 8
+
+        for gy, row in enumerate(char['bitmap']):
+            y = top + gy
+            if y < 0 or y >= height:
+                continue
+            page, bit = divmod(y, 8)
+            for gx in range(w):
+                x = xoff + gx
+                if 0 <= x < width and row & (1 << (rowbits - 1 - gx)):
+                    data[page * width + x] |= 0x80 >> bit
+
+        font.glyphs[code] = (width, bytes(data))
+
+    return font
+
+
+def write_atlas(fd, font):
+    '''Write `font` (a `FontData`) as a compiled atlas to the binary
+    file object `fd`.'''
+    codes = sorted(font.glyphs)
+    first = codes[0] if codes else 0
+    count = codes[-1] - first + 1 if codes else 0
+
+    fd.write(HEADER.pack(MAGIC, VERSION, font.pages, 0,
+                         first, count, font.ascent))
+
+    offset = 0
+    for code in range(first, first + count):
+        if code in font.glyphs:
+            width, data = font.glyphs[code]
+            fd.write(INDEX.pack(offset, width))
+            offset += len(data)
+        else:
+            fd.write(INDEX.pack(0, MISSING))
+
+    for code in codes:
+        fd.write(font.glyphs[code][1])
+
+
+class Atlas (object):
+    '''A compiled font atlas, mapped into memory from `path`.'''
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as fd:
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            (magic, version, self.pages, reserved,
+             self.first, self.count, self.ascent) = (
+                 HEADER.unpack_from(self._map))
+        except struct.error:
+            magic = None
+
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise ValueError('%s: not a font atlas' % path)
+
+        self._data = HEADER.size + INDEX.size * self.count
+
+    def glyph(self, c):
+        '''Return the page-format bytes for character `c`, or `None` if
+        the font has no such glyph.'''
+        i = ord(c) - self.first
+        if i < 0 or i >= self.count:
+            return None
+
+        offset, width = INDEX.unpack_from(
+            self._map, HEADER.size + INDEX.size * i)
+        if width == MISSING:
+            return None
+
+        start = self._data + offset
+        return self._map[start:start + width * self.pages]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -0,0 +1,210 @@
+import hashlib
+import logging
+import mmap
+import os
+import struct
+
+import st7565.fileutil
+
+LOG = logging.getLogger(__name__)
+
+MAGIC = b'ST7565FC'
+VERSION = 1
+
+# magic, version, frame size, frame count
+HEADER = struct.Struct('<8sHII')
+
+SUFFIX = '.frames'
+
+DEFAULT_MAX_SIZE = 32 * 1024 * 1024
+
+
+def default_cache_dir():
+    '''Return the default location of the frame cache, following the
+    XDG base directory specification.'''
+    return st7565.fileutil.cache_dir('frames')
+
+
+def cache_key(img, **params):
+    '''Return a cache key for frames generated from `img` (a
+    `PIL.Image.Image`) with the given keyword parameters, e.g.:
+
+        cache_key(img, animation='spin', step=10, centerx=True)
+
+    The key depends on the image content, not on where it was loaded
+    from.'''
+    h = hashlib.sha1()
+    h.update(('%s %r;' % (img.mode, img.size)).encode('utf-8'))
+    h.update(img.tobytes())
+    for name in sorted(params):
+        h.update(('%s=%r;' % (name, params[name])).encode('utf-8'))
+
+    return h.hexdigest()
+
+
+class Frames (object):
+    '''A read-only sequence of frames stored in a cache file.  The file
+    is mapped into memory with `mmap`, and each frame is a `memoryview`
+    into the mapping, so loading costs nothing up front and frames are
+    never copied.'''
+
+    def __init__(self, path):
+        self.path = path
+
+        with open(path, 'rb') as fd:
+            self._map = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            magic, version, self.frame_size, self.count = (
+                HEADER.unpack_from(self._map))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('%s: not a frame cache file' % path)
+            if len(self._map) != (HEADER.size +
+                                  self.frame_size * self.count):
+                raise ValueError('%s: truncated frame cache file' % path)
+        except (struct.error, ValueError):
+            self._map.close()
+            raise ValueError('%s: invalid frame cache file' % path)
+
+        view = memoryview(self._map)
+        self._frames = [
+            view[HEADER.size + i * self.frame_size:
+                 HEADER.size + (i + 1) * self.frame_size]
+            for i in range(self.count)]
+        view.release()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self._frames[i]
+
+    def __iter__(self):
+        return iter(self._frames)
+
+    def close(self):
+        '''Unmap the file.  Frames obtained from this object must not be
+        used afterwards.'''
+        for frame in self._frames:
+            frame.release()
+        self._frames = []
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class FrameCache (object):
+    '''A directory of precomputed animation frames.  Each entry is a
+    single file holding a header and the raw page-format frames, named
+    after its key (see `cache_key`).  When the total size of the cache
+    exceeds `max_size` bytes the least recently used entries are
+    removed.'''
+
+    def __init__(self, path=None, max_size=DEFAULT_MAX_SIZE):
+        if path is None:
+            path = default_cache_dir()
+
+        self.path = path
+        self.max_size = max_size
+
+    def path_for(self, key):
+        return os.path.join(self.path, key + SUFFIX)
+
+    def get(self, key):
+        '''Return the `Frames` stored under `key`, or `None` if there
+        are none.'''
+        path = self.path_for(key)
+        try:
+            frames = Frames(path)
+        except (IOError, OSError):
+            return None
+        except ValueError as exc:
+            LOG.warning('removing %s', exc)
+            self._remove(path)
+            return None
+
+        LOG.debug('loaded %d frames from %s', len(frames), path)
+
+        # Mark this entry as recently used.
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+
+        return frames
+
+    def put(self, key, frames):
+        '''Store a sequence of equally sized frames under `key`, then
+        remove old entries if the cache has grown too large.'''
+        frames = [bytes(frame) for frame in frames]
+        frame_size = len(frames[0]) if frames else 0
+        if any(len(frame) != frame_size for frame in frames):
+            raise ValueError('frames must all be the same size')
+
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+
+        path = self.path_for(key)
+        LOG.debug('writing %d frames to %s', len(frames), path)
+
+        # A reader never sees a partial entry.
+        with st7565.fileutil.atomic_write(path) as out:
+            out.write(HEADER.pack(MAGIC, VERSION, frame_size, len(frames)))
+            for frame in frames:
+                out.write(frame)
+
+        self.evict(keep=path)
+
+    def entries(self):
+        '''Return a list of `(mtime, size, path)` tuples for every entry
+        in the cache, least recently used first.'''
+        entries = []
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return entries
+
+        for name in names:
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.path, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+
+        entries.sort()
+        return entries
+
+    def evict(self, keep=None):
+        '''Remove least recently used entries until the cache is no
+        larger than `max_size`.  The entry at path `keep` is never
+        removed.'''
+        entries = self.entries()
+        total = sum(size for mtime, size, path in entries)
+
+        for mtime, size, path in entries:
+            if total <= self.max_size:
+                break
+            if path == keep:
+                continue
+
+            LOG.debug('evicting %s', path)
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        '''Remove every entry from the cache.'''
+        for mtime, size, path in self.entries():
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
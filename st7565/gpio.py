@@ -0,0 +1,161 @@
+'''GPIO backends.
+
+A backend drives output pins, using BCM pin numbers.  Every backend
+has the same small interface:
+
+    setup(pin, initial=0)   configure `pin` as an output at level
+                            `initial`
+    output(pin, value)      set `pin` high (true) or low (false)
+    close()                 release the pins
+
+Available backends, by name (see `open_backend`):
+
+    rpio    the RPIO module
+    mem     direct writes to the BCM283x GPIO registers through
+            /dev/gpiomem
+    gpiod   the Linux GPIO character device, via libgpiod's Python
+            bindings (version 2)
+    fake    no hardware; records pin levels
+'''
+
+import logging
+import mmap
+import os
+
+LOG = logging.getLogger(__name__)
+
+GPIOMEM = '/dev/gpiomem'
+
+# BCM283x GPIO register offsets, in 32-bit words.
+GPFSEL0 = 0x00 // 4
+GPSET0 = 0x1c // 4
+GPCLR0 = 0x28 // 4
+
+
+class RPIOBackend (object):
+    '''Drive pins with the RPIO module.'''
+
+    def __init__(self):
+        import RPIO
+        self.rpio = RPIO
+        RPIO.setwarnings(False)
+        RPIO.setmode(RPIO.BCM)
+
+    def setup(self, pin, initial=0):
+        self.rpio.setup(pin, self.rpio.OUT, initial=int(initial))
+
+    def output(self, pin, value):
+        self.rpio.output(pin, value)
+
+    def close(self):
+        pass
+
+
+class MemGPIO (object):
+    '''Drive pins by writing the BCM283x GPIO set and clear registers
+    through a memory mapping of `/dev/gpiomem`.  Setting a pin costs one
+    32-bit store.  This works on the Raspberry Pi models up to the Pi 4;
+    it does not need root, only access to `/dev/gpiomem`.'''
+
+    def __init__(self, path=GPIOMEM):
+        fd = os.open(path, os.O_RDWR | os.O_SYNC)
+        try:
+            self._map = mmap.mmap(fd, mmap.PAGESIZE, mmap.MAP_SHARED,
+                                  mmap.PROT_READ | mmap.PROT_WRITE)
+        finally:
+            os.close(fd)
+
+        self._regs = memoryview(self._map).cast('I')
+
+    def setup(self, pin, initial=0):
+        self.output(pin, initial)
+
+        reg = GPFSEL0 + pin // 10
+        shift = (pin % 10) * 3
+        self._regs[reg] = (self._regs[reg] & ~(7 << shift)) | (1 << shift)
+
+    def output(self, pin, value):
+        if value:
+            self._regs[GPSET0 + (pin >> 5)] = 1 << (pin & 31)
+        else:
+            self._regs[GPCLR0 + (pin >> 5)] = 1 << (pin & 31)
+
+    def close(self):
+        self._regs.release()
+        self._map.close()
+
+
+class GpiodBackend (object):
+    '''Drive pins through the Linux GPIO character device
+    (`/dev/gpiochipN`) using the `gpiod` module (libgpiod 2.x).'''
+
+    def __init__(self, chip='/dev/gpiochip0', consumer='st7565'):
+        import gpiod
+        self.gpiod = gpiod
+        self.chip = chip
+        self.consumer = consumer
+        self._requests = {}
+
+    def setup(self, pin, initial=0):
+        gpiod = self.gpiod
+        value = gpiod.line.Value.ACTIVE if initial else (
+            gpiod.line.Value.INACTIVE)
+        self._requests[pin] = gpiod.request_lines(
+            self.chip,
+            consumer=self.consumer,
+            config={pin: gpiod.LineSettings(
+                direction=gpiod.line.Direction.OUTPUT,
+                output_value=value)})
+
+    def output(self, pin, value):
+        self._requests[pin].set_value(
+            pin,
+            self.gpiod.line.Value.ACTIVE if value
+            else self.gpiod.line.Value.INACTIVE)
+
+    def close(self):
+        for request in self._requests.values():
+            request.release()
+        self._requests = {}
+
+
+class FakeGPIO (object):
+    '''A backend with no hardware behind it.  Records the level of each
+    pin in `levels` and counts calls to `output`.'''
+
+    def __init__(self):
+        self.levels = {}
+        self.outputs = 0
+
+    def setup(self, pin, initial=0):
+        self.levels[pin] = int(initial)
+
+    def output(self, pin, value):
+        self.outputs += 1
+        self.levels[pin] = int(value)
+
+    def input(self, pin):
+        return self.levels.get(pin, 0)
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'rpio': RPIOBackend,
+    'mem': MemGPIO,
+    'gpiod': GpiodBackend,
+    'fake': FakeGPIO,
+}
+
+
+def open_backend(name='rpio', **kwargs):
+    '''Create the GPIO backend called `name` (see `BACKENDS`), passing it
+    any keyword arguments.'''
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError('unknown GPIO backend: %s' % name)
+
+    LOG.debug('using %s GPIO backend', name)
+    return cls(**kwargs)
@@ -0,0 +1,302 @@
+'''Gray levels on a 1-bit panel, by alternating bit-planes.
+
+A `bits`-bit image is split into `bits` bit-planes.  The planes are
+shown in turn, each for a share of the time proportional to its weight
+(plane `k` for `2**k` of every `2**bits - 1` time slots), so a pixel
+appears as dark as its level:
+
+    gray = GrayscaleDisplay(lcd, bits=2)
+    gray.show(img)
+    gray.start()
+    ...
+    print(gray.stats())
+    gray.stop()
+
+The slots of each plane are spread evenly through the cycle (the most
+significant plane gets every other slot) to keep flicker down.  Each
+slot starts with one `LCD.write_buffer`, which only sends the bytes
+that differ from the previous plane, so writes take very different
+times (none at all when a plane follows itself).  Every slot is
+therefore paced to the same length: the given `rate`, or else the
+slowest of the last `WINDOW` writes.  That starts out as the time a
+full write of the display takes, measured when the display first
+cycles, and follows the writes as they change, so one slow write
+lengthens the slots only until it drops out of the window.  `stats`
+reports what was actually achieved.'''
+
+import collections
+import logging
+import threading
+import time
+
+import st7565.bitmap
+import st7565.dither
+
+LOG = logging.getLogger(__name__)
+
+# Sleep until this long before a deadline, then spin.
+SPIN = 0.0005
+
+# Without a rate, slots last as long as the slowest of this many recent
+# writes.
+WINDOW = 64
+
+
+def schedule(bits):
+    '''Return the order in which the planes of a `bits`-bit image are
+    shown: a list of `2**bits - 1` plane numbers, in which plane `k`
+    appears `2**k` times, evenly spaced.'''
+    order = []
+    for i in range(1, 1 << bits):
+        trailing = (i & -i).bit_length() - 1
+        order.append(bits - 1 - trailing)
+    return order
+
+
+def levels_table(bits):
+    '''Return a translation table from 8-bit gray (0 is black) to a
+    `bits`-bit darkness level (0 is white).'''
+    top = (1 << bits) - 1
+    return bytes(bytearray(((255 - g) * top + 127) // 255
+                           for g in range(256)))
+
+
+def planes(levels, width, height, bits, pages=8, columns=128, tx=0, ty=0):
+    '''Split `width * height` bytes of darkness levels into `bits`
+    bitmaps, least significant plane first, with the image at `(tx,
+    ty)`.'''
+    stride = (width + 7) // 8
+    levels = bytes(levels)
+    result = []
+    for k in range(bits):
+        table = bytes(bytearray((i >> k) & 1 for i in range(256)))
+        bits_row = bytearray(stride * 8)
+        data = bytearray()
+        for y in range(height):
+            bits_row[:width] = levels[y * width:(y + 1) * width].translate(
+                table)
+            data += st7565.dither.pack_row(bits_row, stride)
+
+        plane = st7565.bitmap.Bitmap(pages, columns)
+        plane._draw_rows(bytes(data), width, height, tx, ty)
+        result.append(plane)
+
+    return result
+
+
+class GrayscaleDisplay (object):
+    '''Show `bits`-bit (2 or 4) grayscale images on an
+    `st7565.lcd.LCD`.
+
+    If `rate` is given, time slots are paced at that many per second;
+    otherwise each slot lasts as long as the slowest of the last
+    `window` writes (starting from `calibrate`), so the slots are as
+    short as they can be while still all being the same length.  While
+    running, the writer thread owns the LCD; don't call its methods
+    from other threads.
+
+    `clock` and `sleep` are the time functions used for pacing.'''
+
+    def __init__(self, lcd, bits=2, rate=None, spin=SPIN, window=WINDOW,
+                 clock=time.monotonic, sleep=time.sleep):
+        if bits not in (2, 4):
+            raise ValueError('bits must be 2 or 4')
+
+        self.lcd = lcd
+        self.bits = bits
+        self.rate = rate
+        self.period = 1.0 / rate if rate else None
+        self.spin = spin
+        self.clock = clock
+        self.sleep = sleep
+        self.schedule = schedule(bits)
+
+        blank = st7565.bitmap.Bitmap()
+        self.width = blank.width
+        self.height = blank.height
+        self._planes = [blank] * bits
+        self._next = None
+        self._deadline = None
+
+        self._lock = threading.Lock()
+        self._running = False
+        self._thread = None
+        self._error = None
+
+        self._writes = collections.deque(maxlen=window)
+        self._times = collections.deque(maxlen=32)
+        self.slots = 0
+        self.cycles = 0
+        self.late = 0
+
+    def show(self, img, tx=0, ty=0, centerx=False, centery=False):
+        '''Display a `PIL.Image.Image`, converted to grayscale and reduced
+        to `bits` bits.  The new image takes over at the start of the
+        next cycle.'''
+        img = img.convert('L')
+        width, height = img.size
+        if centerx:
+            tx = (self.width - width) // 2
+        if centery:
+            ty = (self.height - height) // 2
+        self.show_gray(img.tobytes(), width, height, tx, ty)
+
+    def show_gray(self, data, width, height, tx=0, ty=0):
+        '''Display 8-bit grayscale pixels (`width * height` bytes, 0 is
+        black).'''
+        levels = bytes(data[:width * height]).translate(
+            levels_table(self.bits))
+        self.show_levels(levels, width, height, tx, ty)
+
+    def show_levels(self, levels, width, height, tx=0, ty=0):
+        '''Display `width * height` bytes of darkness levels, from 0
+        (clear) to `2**bits - 1` (set in every plane).'''
+        if (tx < 0 or ty < 0 or tx + width > self.width or
+                ty + height > self.height):
+            raise ValueError('image of size (%d,%d) at (%d,%d) does not '
+                             'fit on the display' % (width, height, tx, ty))
+
+        new = planes(levels, width, height, self.bits, tx=tx, ty=ty)
+        with self._lock:
+            self._check()
+            if self._running:
+                self._next = new
+            else:
+                self._planes = new
+
+    def cycle(self):
+        '''Show every slot of one cycle, pacing them to the slot length.
+        Use this to drive the display from your own loop instead of
+        calling `start`.'''
+        with self._lock:
+            if self._next is not None:
+                self._planes, self._next = self._next, None
+            current = self._planes
+
+        if self.period is None:
+            self.period = self.calibrate(current)
+            self._writes.append(self.period)
+            LOG.debug('grayscale slots last %.6f seconds', self.period)
+
+        deadline = self._deadline
+        if deadline is None:
+            deadline = self.clock()
+
+        for plane in self.schedule:
+            started = self.clock()
+            self.lcd.write_buffer(current[plane])
+            self.slots += 1
+
+            now = self.clock()
+            if not self.rate:
+                self._writes.append(now - started)
+                self.period = max(self._writes)
+
+            deadline += self.period
+            if now > deadline + self.period:
+                self.late += 1
+                deadline = now
+            else:
+                self._wait(deadline)
+
+        self._deadline = deadline
+        self.cycles += 1
+        self._times.append(self.clock())
+
+    def calibrate(self, planes=None, writes=3):
+        '''Return the longest time a forced write of the whole display
+        took, over `writes` writes of each of `planes` (by default the
+        planes being shown).  This is the slot length the display starts
+        with when no `rate` was given.'''
+        if planes is None:
+            planes = self._planes
+
+        worst = 0
+        for i in range(writes):
+            for plane in planes:
+                started = self.clock()
+                self.lcd.write_buffer(plane, force=True)
+                worst = max(worst, self.clock() - started)
+        return worst
+
+    def _wait(self, deadline):
+        '''Sleep until shortly before `deadline`, then spin until it.'''
+        delay = deadline - self.clock() - self.spin
+        if delay > 0:
+            self.sleep(delay)
+        while self.clock() < deadline:
+            pass
+
+    @property
+    def refresh_rate(self):
+        '''Complete cycles (every plane shown with its full weight) per
+        second, over the last few dozen cycles.'''
+        if len(self._times) < 2:
+            return 0.0
+        elapsed = self._times[-1] - self._times[0]
+        if not elapsed:
+            return 0.0
+        return (len(self._times) - 1) / elapsed
+
+    def stats(self):
+        '''Return a dictionary of refresh statistics.'''
+        refresh = self.refresh_rate
+        return {
+            'bits': self.bits,
+            'refresh_rate': refresh,
+            'slot_rate': refresh * len(self.schedule),
+            'slot_seconds': self.period or 0.0,
+            'cycles': self.cycles,
+            'slots': self.slots,
+            'late': self.late,
+        }
+
+    def start(self):
+        '''Start cycling the planes on a background thread.'''
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+
+        LOG.debug('starting %d-bit grayscale display', self.bits)
+        self._thread = threading.Thread(target=self._run,
+                                        name='st7565-grayscale')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''Stop the background thread at the end of the current
+        cycle.'''
+        with self._lock:
+            self._running = False
+            self._deadline = None
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        with self._lock:
+            self._check()
+
+    def _check(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self):
+        while self._running:
+            try:
+                self.cycle()
+            except Exception as exc:
+                LOG.exception('failed to write grayscale frame')
+                with self._lock:
+                    self._error = exc
+                    self._running = False
+                break
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
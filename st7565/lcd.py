@@ -1,11 +1,15 @@
+import contextlib
 import ctypes
 import logging
 
-import RPIO as GPIO
-
+import st7565.bitmap
+import st7565.bitops
+import st7565.gpio
+import st7565.grayscale
+import st7565.metrics
 import st7565.spidev
 import st7565.ops
-import st7565.fonts.font5x7 as font5x7
+import st7565.text
 
 LOG = logging.getLogger(__name__)
 
@@ -16,6 +20,9 @@ BRIGHTNESS = 0x20
 LCD_RST = 25
 LCD_A0 = 24
 
+PAGES = 8
+COLUMNS = 128
+
 BIAS_1_9 = 0
 BIAS_1_7 = 1
 
@@ -53,22 +60,56 @@ class LCD (object):
                  pin_a0=LCD_A0,
                  spi_bus=0,
                  spi_dev=0,
+                 spi_speed_hz=None,
                  brightness=BRIGHTNESS,
                  init=True,
-                 adafruit=False):
+                 adafruit=False,
+                 font=None,
+                 metrics=None,
+                 spi=None,
+                 gpio=None):
 
         self.pin_rst = pin_rst
         self.pin_a0 = pin_a0
         self.spi_bus = spi_bus
         self.spi_dev = spi_dev
+        self.spi_speed_hz = spi_speed_hz
         self.brightness = brightness
         self.adafruit = adafruit
+        self.metrics = (st7565.metrics.registry if metrics is None
+                        else metrics)
+
+        # An SPI device to use instead of opening one (see
+        # st7565.fake), and the GPIO backend or its name (see
+        # st7565.gpio).
+        self.spi = spi
+        self.gpio = 'rpio' if gpio is None else gpio
+
+        # The current level of the A0 line, or None if unknown.
+        self.a0 = None
 
         if adafruit:
             self.pagemap = [3, 2, 1, 0, 7, 6, 5, 4]
         else:
             self.pagemap = None
 
+        # A copy of what we believe is currently in display RAM, used
+        # by write_buffer to send only what has changed.  None means
+        # the contents of the display are unknown.
+        self.shadow = None
+
+        # The display RAM line shown at the top of the display.
+        self.start_line = 0
+
+        # When inside a transaction, a list of [a0, bytearray] runs
+        # waiting to be written.
+        self._pending = None
+
+        if font is None:
+            self.text = st7565.text.TextRenderer()
+        else:
+            self.text = st7565.text.TextRenderer(font)
+
         self.init_spi()
         self.init_gpio()
 
@@ -78,13 +119,22 @@ class LCD (object):
     def init_gpio(self):
         '''Initialize GPIO configuration. Use BCM pin names
         and configure RST and A0 outputs.'''
-        GPIO.setmode(GPIO.BCM)
+        if isinstance(self.gpio, str):
+            self.gpio = st7565.gpio.open_backend(self.gpio)
+
         for pin in [self.pin_rst, self.pin_a0]:
-            GPIO.setup(pin, GPIO.OUT, initial=1)
+            self.gpio.setup(pin, initial=1)
+        self.a0 = 1
 
     def init_spi(self):
-        '''Open connection to kernel SPI device.'''
-        self.spi = st7565.spidev.SpiDev(self.spi_bus, self.spi_dev)
+        '''Open connection to kernel SPI device, unless an SPI device
+        was passed to the constructor.'''
+        if self.spi is not None:
+            return
+
+        self.spi = st7565.spidev.SpiDev(self.spi_bus, self.spi_dev,
+                                        max_speed_hz=self.spi_speed_hz,
+                                        metrics=self.metrics)
 
     def init_lcd(self):
         '''Initialize the LCD.  Based on code from
@@ -117,14 +167,22 @@ class LCD (object):
 
     def clear(self):
         '''Clear the display. Writes 0x00 to all display positions.'''
-        for page in range(8):
-            LOG.debug('clear page %d', page)
-            self.page_set(page)
+        with self.transaction():
+            for page in range(PAGES):
+                LOG.debug('clear page %d', page)
+                self.page_set(page)
+                self.column_set(0)
+                self._send_data([0x00] * COLUMNS)
+
+            self.page_set(0)
             self.column_set(0)
-            self.send_data([0x00] * 128)
 
-        self.page_set(0)
-        self.column_set(0)
+        self.shadow = bytearray(PAGES * COLUMNS)
+
+    def invalidate(self):
+        '''Forget what we know about the contents of the display, so
+        that the next call to `write_buffer` will send everything.'''
+        self.shadow = None
 
     def page_set(self, page):
         '''Set the current page.'''
@@ -139,25 +197,23 @@ class LCD (object):
         if self.adafruit:
             col += 1
 
-        # set column lsb
         lsb = (col & 0x0f)
-        self.send_command([st7565.ops.COLUMN_SET_LSB | lsb])
-
-        # set column msb
         msb = (col & 0xf0) >> 4
-        self.send_command([st7565.ops.COLUMN_SET_MSB | msb])
+        self.send_command([st7565.ops.COLUMN_SET_LSB | lsb,
+                           st7565.ops.COLUMN_SET_MSB | msb])
 
     def pos(self, page, col=0):
         '''Set the current page and column.  If unspecified, col defaults
         to 0.'''
-        self.page_set(page)
-        self.column_set(col)
+        with self.transaction():
+            self.page_set(page)
+            self.column_set(col)
 
     def _set_pin(self, pin):
-        GPIO.output(pin, 1)
+        self.gpio.output(pin, 1)
 
     def _reset_pin(self, pin):
-        GPIO.output(pin, 0)
+        self.gpio.output(pin, 0)
 
     def reset(self):
         '''Perform a hard reset of the LCD by bring the RST line low for
@@ -171,25 +227,90 @@ class LCD (object):
     def send_command(self, bytes):
         '''Send a command to the LCD.  Brings A0 low then sends the data
         via SPI.'''
-        LOG.debug('sending command: %s',
-                  ' '.join(hex(x) for x in bytes))
-        self._reset_pin(self.pin_a0)
-        self.send(bytes)
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('sending command: %s', st7565.metrics.hexdump(bytes))
+        self.metrics.incr('lcd.command_bytes', len(bytes))
+        self._queue(0, bytes)
 
     def send_data(self, bytes):
-        '''Send a command to the LCD.  Brings A0 high then sends the data
-        via SPI.'''
-        LOG.debug('sending data: %s',
-                  ' '.join(hex(x) for x in bytes))
-        self._set_pin(self.pin_a0)
+        '''Send data to the LCD.  Brings A0 high then sends the data
+        via SPI.  Since we don't know where the data will land in
+        display RAM, this invalidates the shadow copy used by
+        `write_buffer`.'''
+        self.shadow = None
+        self._send_data(bytes)
+
+    def _send_data(self, bytes):
+        if LOG.isEnabledFor(logging.DEBUG):
+            LOG.debug('sending data: %s', st7565.metrics.hexdump(bytes))
+        self.metrics.incr('lcd.data_bytes', len(bytes))
+        self._queue(1, bytes)
+
+    def _queue(self, a0, bytes):
+        '''Write bytes with the A0 line at level `a0`, or if we are in a
+        transaction add them to the pending writes, merging them with
+        the previous run if it used the same A0 level.'''
+        if self._pending is None:
+            self._write(a0, bytes)
+        elif self._pending and self._pending[-1][0] == a0:
+            self._pending[-1][1].extend(bytes)
+        else:
+            self._pending.append([a0, bytearray(bytes)])
+
+    def _write(self, a0, bytes):
+        if a0 != self.a0:
+            self.metrics.incr('lcd.a0_writes')
+            self.gpio.output(self.pin_a0, a0)
+            self.a0 = a0
         self.send(bytes)
 
+    @contextlib.contextmanager
+    def transaction(self):
+        '''Batch commands and data.  Within a transaction, calls to
+        `send_command` and `send_data` are queued instead of being
+        written immediately; consecutive writes that share the same A0
+        level are merged.  On exit each run is written with a single A0
+        change and a single SPI write:
+
+            with lcd.transaction():
+                lcd.pos(2, 0)
+                lcd.puts('Hello, world')
+
+        Transactions may be nested; everything is written when the
+        outermost transaction exits.  If the block raises an exception
+        nothing is written.  If writing fails part way through, the
+        shadow copy and the cached A0 level are discarded, since the
+        display may hold only some of the changes.'''
+        if self._pending is not None:
+            yield
+            return
+
+        self._pending = []
+        try:
+            yield
+        except:
+            self._pending = None
+            self.shadow = None
+            raise
+
+        pending, self._pending = self._pending, None
+        self.metrics.incr('lcd.transactions')
+        try:
+            for a0, bytes in pending:
+                self._write(a0, bytes)
+        except:
+            self.shadow = None
+            self.a0 = None
+            raise
+
     def send(self, bytes):
         '''Send bytes to the LCD via SPI protocol.'''
+        self.metrics.incr('lcd.writes')
         self.spi.write(bytes)
 
     def soft_reset(self):
         self.send_command([st7565.ops.RESET])
+        self.start_line = 0
 
     def display_on(self):
         self.send_command([st7565.ops.DISPLAY_ON])
@@ -253,6 +374,50 @@ class LCD (object):
 
         op = st7565.ops.DISPLAY_START_LINE_SET | line
         self.send_command([op])
+        self.start_line = line
+
+    def vscroll(self, steps=1, buffer=None):
+        '''Scroll the display vertically by `steps` rows (down if
+        `steps` is positive, up if it is negative).  The rows that
+        scroll off one edge wrap around to the other.
+
+        The controller numbers the lines of a page from D0, while
+        buffers put D7 at the top, so only whole pages can be scrolled
+        in hardware.  Those are moved by changing the display start
+        line, which costs a single command byte; any remaining rows are
+        scrolled by rewriting display RAM.
+
+        If `buffer` is given it is the new contents of the display,
+        and is written with `write_buffer`.  Since display RAM itself
+        has not moved, only the rows that differ from what was already
+        in the wrapped region are sent.  A ticker typically looks like:
+
+            screen.vscroll(-8)
+            # draw the newly exposed bottom page into screen
+            lcd.vscroll(-8, screen)
+
+        Without a buffer, scrolling by anything other than whole pages
+        rebuilds the display contents from what was last written, and
+        raises ValueError if those are unknown.
+
+        Hardware scrolling assumes that display RAM pages appear in
+        order down the panel, so it is not available with a page map
+        (`adafruit=True`).'''
+        if self.pagemap:
+            raise ValueError('hardware scrolling is not supported '
+                             'with a page map')
+
+        if buffer is None and steps % 8:
+            if self.shadow is None:
+                raise ValueError('display contents are unknown')
+            buffer = self._ram_layout(self.shadow, -self.start_line)
+            buffer.vscroll(steps)
+
+        with self.transaction():
+            self.display_start_line_set(
+                (self.start_line - steps // 8 * 8) % (PAGES * 8))
+            if buffer is not None:
+                self.write_buffer(buffer)
 
     def brightness_set(self, val):
         '''Set the display brightness.'''
@@ -281,22 +446,104 @@ class LCD (object):
 
     def putc(self, c):
         '''Draw a single character at the current position.'''
-        bytes = font5x7.glyphs[ord(c) - font5x7.min_char]
-        self.send_data(bytes + [0x00] * (len(bytes)-font5x7.char_width))
+        self.send_data(self.text.glyph(c)[0])
 
     def puts(self, s):
-        '''Draw a string of characters at the current position.'''
-        for c in s:
-            self.putc(c)
-
-    def write_buffer(self, buffer):
-        '''Write an entire 8x128 buffer to the LCD.'''
-        for p in range(8):
-            self.page_set(p)
-            self.column_set(0)
-            bytes = buffer[128*p:128*p+128]
-            self.send_data(bytes)
-
+        '''Draw a string of characters at the current position.  The
+        whole string is rendered into one buffer and sent in a single
+        write.  Only the top page of a multi-page font is drawn; use
+        `puts_at` for those.'''
+        self.send_data(self.text.render(s))
+
+    def puts_at(self, page, col, s):
+        '''Draw a string of characters with its top left corner at `page`
+        and `col`, using as many pages as the font is tall.'''
+        with self.transaction():
+            for i, row in enumerate(self.text.render_pages(s)):
+                self.pos(page + i, col)
+                self.send_data(row)
+
+    def write_buffer(self, buffer, force=False):
+        '''Write an entire 8x128 buffer to the LCD.
+
+        The buffer is compared against a shadow copy of what was last
+        written, and only the pages that differ are sent; within each
+        of those pages only the span of columns between the first and
+        last changed byte is sent.  Pass `force=True` to ignore the
+        shadow copy and rewrite the entire display.
+
+        If the display has been scrolled with `vscroll`, the buffer is
+        rotated to match the current start line before it is written,
+        so it always appears on the display the right way up.'''
+        metrics = self.metrics
+        if metrics.enabled:
+            started = st7565.metrics.clock()
+
+        if not isinstance(buffer, (bytes, bytearray, memoryview)):
+            buffer = bytearray(buffer)
+
+        if self.start_line:
+            buffer = self._ram_layout(buffer)
+
+        if force or self.shadow is None:
+            shadow = None
+            self.shadow = bytearray(PAGES * COLUMNS)
+        else:
+            shadow = self.shadow
+
+        with self.transaction():
+            for p in range(PAGES):
+                start = COLUMNS * p
+                end = start + COLUMNS
+                new = buffer[start:end]
+
+                if shadow is None:
+                    first, last = 0, COLUMNS - 1
+                else:
+                    old = shadow[start:end]
+                    if new == old:
+                        continue
+
+                    first = 0
+                    while new[first] == old[first]:
+                        first += 1
+                    last = COLUMNS - 1
+                    while new[last] == old[last]:
+                        last -= 1
+
+                self.page_set(p)
+                self.column_set(first)
+                self._send_data(new[first:last + 1])
+                self.shadow[start:end] = new
+
+        if metrics.enabled:
+            metrics.incr('lcd.flushes')
+            metrics.observe('lcd.flush_seconds',
+                            st7565.metrics.clock() - started)
+
+    def grayscale(self, bits=2, rate=None):
+        '''Return a `st7565.grayscale.GrayscaleDisplay` that shows
+        `bits`-bit grayscale images on this display by alternating
+        bit-planes.'''
+        return st7565.grayscale.GrayscaleDisplay(self, bits, rate=rate)
+
+    def _ram_layout(self, buffer, start_line=None):
+        '''Return a copy of `buffer` arranged the way it must be stored
+        in display RAM for it to appear unchanged at `start_line` (by
+        default the current start line).
+
+        The controller shows RAM line `(line + start_line) % 64` in
+        place of `line`, counting the lines of each page from D0, so
+        the buffer is scrolled with its bits reversed.  Passing the
+        negated start line undoes the arrangement.'''
+        if start_line is None:
+            start_line = self.start_line
+
+        ram = st7565.bitmap.Bitmap(PAGES, COLUMNS)
+        ram[:] = bytes(buffer).translate(st7565.bitops.REVERSE)
+        ram.vscroll(start_line)
+        ram[:] = ram.translate(st7565.bitops.REVERSE)
+        return ram
 
 if __name__ == '__main__':
     logging.basicConfig(
@@ -0,0 +1,196 @@
+'''Lightweight instrumentation for the display hot paths.
+
+`LCD`, `SpiDev` and `Backlight` count what they do (bytes sent,
+commands, A0 changes, transfers) and time their operations into
+latency histograms, using a `Metrics` object that defaults to the
+shared `registry`:
+
+    import st7565.metrics
+
+    snap = st7565.metrics.registry.snapshot()
+    print(st7565.metrics.format_text(snap))
+    st7565.metrics.registry.export(
+        st7565.metrics.PrometheusExporter('/var/lib/node/st7565.prom'))
+
+A disabled `Metrics` object (`Metrics(enabled=False)`) ignores every
+update, and instrumented code skips its timing calls entirely.
+
+Updates are not locked; counts from concurrent threads may
+occasionally be lost, which is an acceptable trade for keeping them
+cheap.'''
+
+import bisect
+import time
+
+import st7565.fileutil
+
+# Histogram bucket upper bounds, in seconds.
+BUCKETS = (
+    10e-6, 25e-6, 50e-6, 100e-6, 250e-6, 500e-6,
+    1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3,
+    100e-3, 250e-3, 500e-3, 1.0,
+)
+
+clock = time.perf_counter
+
+
+class Histogram (object):
+    '''A fixed-bucket histogram of observed values.'''
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {
+            'buckets': list(self.buckets),
+            'counts': list(self.counts),
+            'count': self.count,
+            'sum': self.sum,
+        }
+
+
+class Metrics (object):
+    '''A set of named counters and histograms.'''
+
+    def __init__(self, enabled=True, buckets=BUCKETS):
+        self.enabled = enabled
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+
+    def incr(self, name, n=1):
+        '''Add `n` to the counter `name`.'''
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def observe(self, name, value):
+        '''Record `value` (normally a duration in seconds) in the
+        histogram `name`.'''
+        if not self.enabled:
+            return
+        try:
+            hist = self.histograms[name]
+        except KeyError:
+            hist = self.histograms[name] = Histogram(self.buckets)
+        hist.observe(value)
+
+    def snapshot(self):
+        '''Return a copy of the current values as a dictionary with
+        `counters` and `histograms` keys.'''
+        return {
+            'time': time.time(),
+            'counters': dict(self.counters),
+            'histograms': dict((name, hist.snapshot())
+                               for name, hist in
+                               list(self.histograms.items())),
+        }
+
+    def reset(self):
+        '''Reset every counter and histogram.'''
+        self.counters = {}
+        self.histograms = {}
+
+    def export(self, exporter):
+        '''Pass a snapshot to `exporter`, any callable that accepts
+        one.'''
+        exporter(self.snapshot())
+
+
+registry = Metrics()
+
+
+def format_text(snapshot):
+    '''Format a snapshot as human readable text.'''
+    lines = []
+    for name in sorted(snapshot['counters']):
+        lines.append('%-32s %d' % (name, snapshot['counters'][name]))
+
+    for name in sorted(snapshot['histograms']):
+        hist = snapshot['histograms'][name]
+        mean = hist['sum'] / hist['count'] if hist['count'] else 0
+        lines.append('%-32s count=%d mean=%.1fus' % (
+            name, hist['count'], mean * 1e6))
+        for bound, count in zip(hist['buckets'] + [None],
+                                hist['counts']):
+            if count:
+                lines.append('    %-10s %d' % (
+                    '<= %gus' % (bound * 1e6) if bound is not None
+                    else '> %gus' % (hist['buckets'][-1] * 1e6),
+                    count))
+
+    return '\n'.join(lines)
+
+
+def _prometheus_name(name, prefix):
+    return prefix + name.replace('.', '_').replace('-', '_')
+
+
+def format_prometheus(snapshot, prefix='st7565_'):
+    '''Format a snapshot in the Prometheus text exposition format.'''
+    lines = []
+    for name in sorted(snapshot['counters']):
+        metric = _prometheus_name(name, prefix) + '_total'
+        lines.append('# TYPE %s counter' % metric)
+        lines.append('%s %d' % (metric, snapshot['counters'][name]))
+
+    for name in sorted(snapshot['histograms']):
+        hist = snapshot['histograms'][name]
+        metric = _prometheus_name(name, prefix)
+        lines.append('# TYPE %s histogram' % metric)
+        total = 0
+        for bound, count in zip(hist['buckets'], hist['counts']):
+            total += count
+            lines.append('%s_bucket{le="%g"} %d' % (metric, bound, total))
+        lines.append('%s_bucket{le="+Inf"} %d' % (metric, hist['count']))
+        lines.append('%s_sum %r' % (metric, hist['sum']))
+        lines.append('%s_count %d' % (metric, hist['count']))
+
+    return '\n'.join(lines) + '\n'
+
+
+class TextExporter (object):
+    '''Write snapshots as text to a stream.'''
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def __call__(self, snapshot):
+        self.stream.write(format_text(snapshot) + '\n')
+        self.stream.flush()
+
+
+class PrometheusExporter (object):
+    '''Write snapshots in Prometheus format to `path`, replacing it
+    atomically (suitable for the node exporter's textfile
+    collector).'''
+
+    def __init__(self, path, prefix='st7565_'):
+        self.path = path
+        self.prefix = prefix
+
+    def __call__(self, snapshot):
+        with st7565.fileutil.atomic_write(self.path, 'w') as out:
+            out.write(format_prometheus(snapshot, self.prefix))
+
+
+class hexdump (object):
+    '''Format bytes as hex when (and only when) converted to a string,
+    for use as a logging argument.'''
+
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return ' '.join(hex(x) for x in bytearray(self.data))
@@ -0,0 +1,233 @@
+import collections
+import logging
+import threading
+
+import st7565.metrics
+
+LOG = logging.getLogger(__name__)
+
+
+class Panel (object):
+    '''One display managed by a `MultiDisplay`, with its flush
+    statistics.'''
+
+    def __init__(self, name, lcd, bus):
+        self.name = name
+        self.lcd = lcd
+        self.bus = bus
+
+        # True if another panel on the same bus drives the same A0 pin,
+        # so the LCD's idea of the A0 level can't be trusted.
+        self.shared_a0 = False
+
+        self.latency = st7565.metrics.Histogram()
+        self.flush = st7565.metrics.Histogram()
+        self.last_latency = None
+        self.max_latency = 0.0
+
+    def stats(self):
+        count = self.latency.count
+        return {
+            'bus': self.bus,
+            'flushes': count,
+            'last': self.last_latency,
+            'mean': self.latency.sum / count if count else None,
+            'max': self.max_latency,
+            'mean_flush': (self.flush.sum / self.flush.count
+                           if self.flush.count else None),
+        }
+
+
+class _Bus (object):
+    '''A worker thread that flushes the panels on one SPI bus, one at a
+    time.'''
+
+    def __init__(self, name):
+        self.name = name
+        self.panels = collections.deque()
+        self.jobs = collections.deque()
+        self.cond = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._run,
+                                       name='st7565-bus-%s' % name)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def submit(self, batch):
+        with self.cond:
+            self.jobs.append(batch)
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.thread.join()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while self.running and not self.jobs:
+                    self.cond.wait()
+                if not self.jobs:
+                    break
+                batch = self.jobs.popleft()
+
+            batch.run(self)
+
+
+class _Batch (object):
+    '''The work for a single `MultiDisplay.update` call.'''
+
+    def __init__(self, frames, force, nbuses):
+        self.frames = frames
+        self.force = force
+        self.started = st7565.metrics.clock()
+        self.remaining = nbuses
+        self.errors = []
+        self.latencies = {}
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def run(self, bus):
+        # Flush in the bus's current rotation, then rotate it so that
+        # every panel takes its turn at the front.
+        for panel in list(bus.panels):
+            if panel.name not in self.frames:
+                continue
+            self._flush(panel)
+        bus.panels.rotate(-1)
+
+        with self.lock:
+            self.remaining -= 1
+            if not self.remaining:
+                self.done.set()
+
+    def _flush(self, panel):
+        started = st7565.metrics.clock()
+        try:
+            if panel.shared_a0:
+                panel.lcd.a0 = None
+            panel.lcd.write_buffer(self.frames[panel.name],
+                                   force=self.force)
+        except Exception as exc:
+            LOG.exception('failed to update panel %s', panel.name)
+            with self.lock:
+                self.errors.append(exc)
+            return
+
+        now = st7565.metrics.clock()
+        latency = now - self.started
+        panel.flush.observe(now - started)
+        panel.latency.observe(latency)
+        panel.last_latency = latency
+        panel.max_latency = max(panel.max_latency, latency)
+        self.latencies[panel.name] = latency
+
+
+class MultiDisplay (object):
+    '''Drive several `st7565.lcd.LCD` instances from one process.
+
+        displays = MultiDisplay()
+        displays.add('left', st7565.lcd.LCD(spi_bus=0, spi_dev=0,
+                                             pin_a0=24))
+        displays.add('right', st7565.lcd.LCD(spi_bus=1, spi_dev=0,
+                                              pin_a0=23))
+        displays.update({'left': screen1, 'right': screen2})
+
+    Each SPI bus gets a writer thread.  Panels on different buses are
+    flushed in parallel (the SPI transfer releases the GIL); panels on
+    the same bus are flushed one after another, and the order rotates
+    on every update so no panel is always last.
+
+    `update` returns the latency of each panel, measured from the call
+    to the end of that panel's flush; `stats` summarizes them.
+
+    The writer threads own the LCDs while the manager is open; don't
+    call their methods from other threads.'''
+
+    def __init__(self, metrics=None):
+        self.metrics = (st7565.metrics.registry if metrics is None
+                        else metrics)
+        self.panels = collections.OrderedDict()
+        self._buses = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, lcd, bus=None):
+        '''Add `lcd` as the panel `name`.  `bus` identifies the SPI bus
+        it is attached to and defaults to `lcd.spi_bus`; panels with the
+        same `bus` are never flushed at the same time.'''
+        if name in self.panels:
+            raise ValueError('panel %s already exists' % name)
+
+        if bus is None:
+            bus = lcd.spi_bus
+
+        panel = Panel(name, lcd, bus)
+        for other in self.panels.values():
+            if other.bus == bus and other.lcd.pin_a0 == lcd.pin_a0:
+                other.shared_a0 = panel.shared_a0 = True
+
+        with self._lock:
+            if bus not in self._buses:
+                self._buses[bus] = _Bus(bus)
+            self._buses[bus].panels.append(panel)
+            self.panels[name] = panel
+
+        return panel
+
+    def __getitem__(self, name):
+        return self.panels[name].lcd
+
+    def update(self, frames, force=False, timeout=None):
+        '''Write each bitmap in `frames`, a dictionary mapping panel
+        names to buffers, to its panel, and wait until they have all been
+        written.  Returns a dictionary of per-panel latencies in seconds.
+        If any flush fails the first error is raised once the others have
+        finished.'''
+        for name in frames:
+            if name not in self.panels:
+                raise KeyError('no such panel: %s' % name)
+
+        buses = set(self.panels[name].bus for name in frames)
+        if not buses:
+            return {}
+
+        batch = _Batch(frames, force, len(buses))
+        for bus in buses:
+            self._buses[bus].submit(batch)
+
+        if not batch.done.wait(timeout):
+            raise RuntimeError('timed out waiting for panels')
+
+        metrics = self.metrics
+        if metrics.enabled:
+            metrics.incr('multi.updates')
+            for name, latency in batch.latencies.items():
+                metrics.observe('multi.%s.latency_seconds' % name, latency)
+            metrics.observe('multi.update_seconds',
+                            st7565.metrics.clock() - batch.started)
+
+        if batch.errors:
+            raise batch.errors[0]
+
+        return batch.latencies
+
+    def stats(self):
+        '''Return a dictionary of latency statistics (in seconds) for each
+        panel.'''
+        return dict((name, panel.stats())
+                    for name, panel in self.panels.items())
+
+    def close(self):
+        '''Stop the writer threads.'''
+        with self._lock:
+            buses, self._buses = self._buses, {}
+        for bus in buses.values():
+            bus.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
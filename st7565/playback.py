@@ -0,0 +1,331 @@
+'''Play a stream of frames on the display.
+
+Frames are read from any binary file object (a file, a FIFO, or
+`sys.stdin.buffer`) in one of two formats:
+
+    netpbm  concatenated binary PBM (P4) or PGM (P5) images, as written
+            by `ffmpeg -f image2pipe -c:v pbm` (or `-c:v pgm`); PGM
+            frames are dithered
+    raw     1024-byte frames in display page format, as produced by
+            `st7565.bitmap.Bitmap`
+
+A decode thread reads and converts frames and puts them on a bounded
+queue.  When the queue is full the decoder stops reading, so a fast
+producer is held back by the pipe rather than buffered in memory, and
+memory use stays the same however long the stream is.  The caller's
+thread takes frames off the queue and writes them to the display,
+paced to the target frame rate:
+
+    with open('video.pgm', 'rb') as fd:
+        player = Player(lcd, fd, fps=30)
+        player.run()
+        print(player.stats())
+'''
+
+import logging
+import queue
+import threading
+import time
+
+import st7565.bitmap
+import st7565.dither
+
+LOG = logging.getLogger(__name__)
+
+FORMATS = ('auto', 'netpbm', 'raw')
+
+WHITESPACE = b' \t\r\n\x0b\x0c'
+
+# Marks the end of the stream on the queue.
+_END = object()
+
+
+class FormatError (ValueError):
+    pass
+
+
+def _read_exact(fd, size):
+    '''Read exactly `size` bytes, or return None at the end of the
+    stream.  A frame cut short raises FormatError.'''
+    data = fd.read(size)
+    if not data:
+        return None
+    while len(data) < size:
+        more = fd.read(size - len(data))
+        if not more:
+            raise FormatError('stream ended in the middle of a frame')
+        data += more
+    return data
+
+
+def _read_token(fd):
+    '''Read a whitespace separated header token, skipping comments.'''
+    token = b''
+    while True:
+        c = fd.read(1)
+        if not c:
+            if token:
+                return token
+            raise FormatError('stream ended in a netpbm header')
+        if c == b'#':
+            while c not in (b'\n', b''):
+                c = fd.read(1)
+            c = b'\n'
+        if c in WHITESPACE:
+            if token:
+                return token
+            continue
+        token += c
+
+
+def read_netpbm(fd):
+    '''Yield `(magic, width, height, maxval, data)` for each binary PBM or
+    PGM image in the stream.'''
+    while True:
+        magic = fd.read(2)
+        while magic[:1] and magic[:1] in WHITESPACE:
+            magic = magic[1:] + fd.read(1)
+        if not magic:
+            return
+        if magic not in (b'P4', b'P5'):
+            raise FormatError('not a binary PBM or PGM frame: %r' % magic)
+
+        try:
+            width = int(_read_token(fd))
+            height = int(_read_token(fd))
+            maxval = 1 if magic == b'P4' else int(_read_token(fd))
+        except ValueError:
+            raise FormatError('bad netpbm header')
+
+        # _read_token consumed the single whitespace byte that ends the
+        # header.
+        if magic == b'P4':
+            size = (width + 7) // 8 * height
+        else:
+            size = width * height * (2 if maxval > 255 else 1)
+
+        data = _read_exact(fd, size)
+        if data is None:
+            raise FormatError('stream ended in the middle of a frame')
+        yield magic, width, height, maxval, data
+
+
+def read_raw(fd, size=1024):
+    '''Yield each `size`-byte frame in the stream.'''
+    while True:
+        data = _read_exact(fd, size)
+        if data is None:
+            return
+        yield data
+
+
+def detect(fd):
+    '''Guess the format of a stream from its first bytes.  `fd` must
+    support `peek` (as `io.BufferedReader` does).'''
+    head = fd.peek(2)[:2]
+    if head in (b'P4', b'P5'):
+        return 'netpbm'
+    return 'raw'
+
+
+class Decoder (object):
+    '''Converts the frames of a stream to `st7565.bitmap.Bitmap` objects
+    for a display of `pages` x `columns`.  Images smaller than the
+    display are centered; larger ones are rejected (scale them on the
+    way in, e.g. with ffmpeg's `-vf scale=128:64`).'''
+
+    def __init__(self, format='auto', dither='bayer', pages=8,
+                 columns=128):
+        if format not in FORMATS:
+            raise ValueError('unknown format: %s' % format)
+        self.format = format
+        self.dither = dither
+        self.pages = pages
+        self.columns = columns
+        self._scale = {}
+
+    def frames(self, fd):
+        '''Yield a bitmap for each frame in `fd`.'''
+        format = self.format
+        if format == 'auto':
+            format = detect(fd)
+        LOG.debug('reading %s frames', format)
+
+        if format == 'raw':
+            for data in read_raw(fd, self.pages * self.columns):
+                bitmap = st7565.bitmap.Bitmap(self.pages, self.columns)
+                bitmap[:] = data
+                yield bitmap
+        else:
+            for frame in read_netpbm(fd):
+                yield self.convert(*frame)
+
+    def convert(self, magic, width, height, maxval, data):
+        '''Convert a decoded netpbm image to a bitmap.'''
+        bitmap = st7565.bitmap.Bitmap(self.pages, self.columns)
+        if width > bitmap.width or height > bitmap.height:
+            raise FormatError('frame of size (%d,%d) is larger than the '
+                              'display' % (width, height))
+
+        if magic == b'P5':
+            data = self._gray(data, maxval)
+            data = st7565.dither.dither_gray(data, width, height,
+                                             self.dither)
+
+        # PBM bits are set for black pixels, as the bitmap expects.
+        bitmap._draw_rows(data, width, height,
+                          (bitmap.width - width) // 2,
+                          (bitmap.height - height) // 2)
+        return bitmap
+
+    def _gray(self, data, maxval):
+        '''Return 8-bit gray pixels from PGM pixel data.'''
+        if maxval > 255:
+            # 16-bit samples are big-endian; keep the high byte.
+            data = data[0::2]
+            maxval >>= 8
+        if maxval == 255:
+            return data
+
+        table = self._scale.get(maxval)
+        if table is None:
+            table = self._scale[maxval] = bytes(bytearray(
+                min(255, (v * 255 + maxval // 2) // max(1, maxval))
+                for v in range(256)))
+        return data.translate(table)
+
+
+class Player (object):
+    '''Play the frames in the stream `fd` on an `st7565.lcd.LCD` at `fps`
+    frames per second (or as fast as they arrive, if `fps` is 0).
+
+    At most `queue_size` decoded frames are held.  If `drop` is true
+    and the display falls more than a frame behind, queued frames are
+    skipped to catch up; otherwise every frame is shown, late.'''
+
+    def __init__(self, lcd, fd, fps=30, format='auto', dither='bayer',
+                 queue_size=8, drop=False):
+        self.lcd = lcd
+        self.fd = fd
+        self.period = 1.0 / fps if fps else 0
+        self.drop = drop
+        self.decoder = Decoder(format, dither)
+        self.queue = queue.Queue(maxsize=queue_size)
+
+        self._stopping = threading.Event()
+        self._thread = None
+        self._held = None
+
+        self.decoded = 0
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+        self.started = None
+        self.finished = None
+
+    def _decode(self):
+        try:
+            for bitmap in self.decoder.frames(self.fd):
+                self.decoded += 1
+                while not self._stopping.is_set():
+                    try:
+                        self.queue.put(bitmap, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if self._stopping.is_set():
+                    break
+        except Exception as exc:
+            LOG.exception('failed to decode frame')
+            self._put_end(exc)
+        else:
+            self._put_end(_END)
+
+    def _put_end(self, item):
+        while not self._stopping.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def run(self):
+        '''Play the stream until it ends (or `stop` is called).  Errors
+        reading or decoding the stream are raised here.'''
+        self._thread = threading.Thread(target=self._decode,
+                                        name='st7565-decoder')
+        self._thread.daemon = True
+        self._thread.start()
+
+        self.started = time.monotonic()
+        deadline = self.started
+        try:
+            while not self._stopping.is_set():
+                item = self._next()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+
+                now = time.monotonic()
+                if now < deadline:
+                    time.sleep(deadline - now)
+                elif self.period and now - deadline > self.period:
+                    self.late += 1
+                    if self.drop:
+                        item = self._skip(item, now - deadline)
+                    deadline = time.monotonic()
+
+                self.lcd.write_buffer(item)
+                self.frames += 1
+                deadline += self.period
+        finally:
+            self.finished = time.monotonic()
+            self.stop()
+
+    def _skip(self, item, behind):
+        '''Skip up to `behind` seconds worth of queued frames, returning
+        the frame to show.'''
+        for i in range(int(behind / self.period)):
+            try:
+                nxt = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is _END or isinstance(nxt, Exception):
+                # Leave it for the main loop to handle.
+                self._held = nxt
+                break
+            item = nxt
+            self.dropped += 1
+        return item
+
+    def _next(self):
+        '''Return the next queued item, or `_END` once `stop` has been
+        called.'''
+        if self._held is not None:
+            item, self._held = self._held, None
+            return item
+        while not self._stopping.is_set():
+            try:
+                return self.queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _END
+
+    def stop(self):
+        '''Stop playing.  `run` returns within a fraction of a second,
+        even while waiting for a frame; the decode thread exits once it
+        has finished reading the frame it is waiting for.'''
+        self._stopping.set()
+
+    def stats(self):
+        '''Return a dictionary of playback statistics.'''
+        end = self.finished or time.monotonic()
+        elapsed = end - self.started if self.started else 0
+        return {
+            'frames': self.frames,
+            'decoded': self.decoded,
+            'dropped': self.dropped,
+            'late': self.late,
+            'fps': self.frames / elapsed if elapsed else 0.0,
+        }
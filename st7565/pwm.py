@@ -0,0 +1,206 @@
+'''PWM backends for the RGB backlight.
+
+A backend drives a few PWM channels, numbered from 0.  Duty cycles are
+integers between 0 (off) and `RESOLUTION` (fully on), measured as the
+fraction of the period the LED is lit; backends take care of LEDs that
+are wired active low.  Every backend has the same interface:
+
+    setup(channel, pin)       prepare `channel`, attached to GPIO `pin`
+    set_duty(channel, duty)   set the duty cycle of `channel`
+    close()                   release the channels
+
+Available backends, by name (see `open_backend`):
+
+    rpio    RPIO.PWM's DMA-driven software PWM (needs root)
+    sysfs   kernel PWM channels under /sys/class/pwm
+    fake    no hardware; records duty cycles
+'''
+
+import errno
+import logging
+import os
+import time
+
+import st7565.transitions
+
+LOG = logging.getLogger(__name__)
+
+RESOLUTION = st7565.transitions.RESOLUTION
+
+# RPIO.PWM's default: 50Hz, with pulse widths in 10us increments.
+FREQ = 50
+PULSE_INCR_US = 10
+
+SYSFS_PWM = '/sys/class/pwm'
+
+
+class RPIOPWM (object):
+    '''Software PWM using RPIO.PWM, which drives the pins from DMA
+    transfers paced by the PCM peripheral.  Each channel uses one DMA
+    channel.'''
+
+    def __init__(self, freq=None, active_low=True):
+        import RPIO
+        import RPIO.PWM
+        self.gpio = RPIO
+        self.pwm = RPIO.PWM
+        self.active_low = active_low
+
+        # The subcycle must be a whole number of pulse increments.
+        subcycle_us = int(1e6 / (freq or FREQ))
+        self.subcycle_us = subcycle_us - subcycle_us % PULSE_INCR_US
+        self.width = self.subcycle_us // PULSE_INCR_US - 1
+        self.pins = {}
+
+        LOG.debug('initializing PWM configuration')
+        RPIO.setwarnings(False)
+        RPIO.setmode(RPIO.BCM)
+        self.pwm.setup(pulse_incr_us=PULSE_INCR_US,
+                       delay_hw=self.pwm.DELAY_VIA_PCM)
+        self.pwm.set_loglevel(self.pwm.LOG_LEVEL_ERRORS)
+
+    def setup(self, channel, pin):
+        self.gpio.setup(pin, self.gpio.OUT, initial=0)
+        self.pwm.init_channel(channel, self.subcycle_us)
+        self.pins[channel] = pin
+
+    def set_duty(self, channel, duty):
+        pin = self.pins[channel]
+        self.pwm.clear_channel(channel)
+
+        if duty <= 0 or duty >= RESOLUTION:
+            self.gpio.output(pin, int((duty > 0) != self.active_low))
+            return
+
+        width = self.width * duty // RESOLUTION
+        if self.active_low:
+            width = self.width - width
+        self.pwm.add_channel_pulse(channel, pin, 0, width)
+
+    def close(self):
+        for channel in self.pins:
+            self.pwm.clear_channel(channel)
+
+
+class SysfsPWM (object):
+    '''Hardware PWM through the kernel's sysfs interface.  Backlight
+    channel `n` is driven by PWM channel `channels[n]` of `pwmchip<chip>`;
+    use None for a channel that has no PWM.  Which pins the PWM channels
+    come out on is decided by the device tree (on a Raspberry Pi, the
+    `pwm` or `pwm-2chan` overlay), not by the `pin` passed to `setup`.
+
+    The `duty_cycle` files are kept open and only written when the
+    value changes.  Active low LEDs are handled by inverting the duty
+    cycle, since not every PWM driver supports the `polarity`
+    attribute.'''
+
+    def __init__(self, chip=0, channels=(0, 1, None), freq=None,
+                 active_low=True, path=SYSFS_PWM):
+        self.path = os.path.join(path, 'pwmchip%d' % chip)
+        self.channels = channels
+        self.period = int(1e9 / (freq or FREQ))
+        self.active_low = active_low
+        self._fds = {}
+        self._values = {}
+
+    def _attr(self, pwm, name):
+        return os.path.join(self.path, 'pwm%d' % pwm, name)
+
+    def _write(self, path, value):
+        with open(path, 'w') as fd:
+            fd.write('%s\n' % value)
+
+    def _export(self, pwm):
+        if os.path.isdir(os.path.join(self.path, 'pwm%d' % pwm)):
+            return
+
+        self._write(os.path.join(self.path, 'export'), pwm)
+
+        # udev may need a moment to set permissions on the new channel.
+        for i in range(50):
+            if os.access(self._attr(pwm, 'enable'), os.W_OK):
+                return
+            time.sleep(0.01)
+
+        raise OSError(errno.EACCES, 'cannot configure pwm%d' % pwm,
+                      self._attr(pwm, 'enable'))
+
+    def setup(self, channel, pin):
+        pwm = self.channels[channel]
+        if pwm is None:
+            LOG.warning('no PWM channel for backlight channel %d', channel)
+            return
+
+        LOG.debug('setting up %s/pwm%d', self.path, pwm)
+        self._export(pwm)
+
+        # duty_cycle may not exceed period, so start from zero.
+        self._write(self._attr(pwm, 'duty_cycle'), 0)
+        self._write(self._attr(pwm, 'period'), self.period)
+        self._fds[channel] = os.open(self._attr(pwm, 'duty_cycle'),
+                                     os.O_WRONLY)
+        self._values[channel] = None
+        self.set_duty(channel, 0)
+        self._write(self._attr(pwm, 'enable'), 1)
+
+    def set_duty(self, channel, duty):
+        fd = self._fds.get(channel)
+        if fd is None:
+            return
+
+        duty = min(RESOLUTION, max(0, duty))
+        value = self.period * duty // RESOLUTION
+        if self.active_low:
+            value = self.period - value
+
+        if value != self._values[channel]:
+            os.pwrite(fd, b'%d\n' % value, 0)
+            self._values[channel] = value
+
+    def close(self):
+        for channel, fd in self._fds.items():
+            os.close(fd)
+            self._write(self._attr(self.channels[channel], 'enable'), 0)
+        self._fds = {}
+        self._values = {}
+
+
+class FakePWM (object):
+    '''A backend with no hardware behind it.  Records the duty cycle of
+    each channel in `duties` and counts calls to `set_duty`.'''
+
+    def __init__(self, freq=None):
+        self.freq = freq or FREQ
+        self.pins = {}
+        self.duties = {}
+        self.updates = 0
+
+    def setup(self, channel, pin):
+        self.pins[channel] = pin
+        self.duties[channel] = 0
+
+    def set_duty(self, channel, duty):
+        self.updates += 1
+        self.duties[channel] = duty
+
+    def close(self):
+        pass
+
+
+BACKENDS = {
+    'rpio': RPIOPWM,
+    'sysfs': SysfsPWM,
+    'fake': FakePWM,
+}
+
+
+def open_backend(name='rpio', **kwargs):
+    '''Create the PWM backend called `name` (see `BACKENDS`), passing it
+    any keyword arguments.'''
+    try:
+        cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError('unknown PWM backend: %s' % name)
+
+    LOG.debug('using %s PWM backend', name)
+    return cls(**kwargs)
@@ -0,0 +1,199 @@
+import collections
+import logging
+import threading
+import time
+
+import st7565.bitmap
+
+LOG = logging.getLogger(__name__)
+
+
+class FrameScheduler (object):
+    '''Double-buffered, paced output to an `st7565.lcd.LCD`.
+
+    The application draws into the back buffer (`back`) and calls
+    `present` to hand it over.  A writer thread flushes the front
+    buffer to the display once per frame period while the application
+    renders the next frame into the new back buffer:
+
+        with FrameScheduler(lcd, fps=30) as sched:
+            while True:
+                sched.back.clear()
+                draw(sched.back, sched.frame_number())
+                sched.present()
+
+    Frames are written on deadlines spaced `1/fps` seconds apart.  If a
+    frame arrives late it is written immediately and the schedule
+    restarts from there, rather than writing a burst of frames to
+    catch up.  Animations that should keep time when rendering falls
+    behind can use `frame_number` to decide what to draw, skipping the
+    frames they missed.
+
+    While the scheduler is running the writer thread owns the LCD;
+    don't call its methods from other threads.'''
+
+    def __init__(self, lcd, fps=30, pages=8, columns=128):
+        self.lcd = lcd
+        self.fps_target = fps
+        self.period = 1.0 / fps if fps else 0
+
+        self.back = st7565.bitmap.Bitmap(pages, columns)
+        self._front = st7565.bitmap.Bitmap(pages, columns)
+
+        # _pending is true when the front buffer holds a frame that has
+        # not yet been written; _busy is true while it is being written.
+        self._pending = False
+        self._busy = False
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self._error = None
+
+        self._started = None
+        self._times = collections.deque(maxlen=max(2, int(fps or 30)))
+        self.frames = 0
+        self.dropped = 0
+        self.late = 0
+
+    def start(self):
+        '''Start the writer thread.'''
+        if self._running:
+            return
+
+        LOG.debug('starting frame scheduler at %s fps', self.fps_target)
+        self._error = None
+        self._running = True
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._writer,
+                                        name='st7565-writer')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''Write any pending frame and stop the writer thread.'''
+        with self._cond:
+            while self._running and (self._pending or self._busy):
+                self._cond.wait()
+            self._running = False
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+        if self._error is not None:
+            raise self._error
+
+    def present(self, block=True, copy=False):
+        '''Hand the back buffer to the writer thread and return the new
+        back buffer (also available as `back`).
+
+        If `block` is true, wait until the previously presented frame
+        has been written, so the application renders at most one frame
+        ahead of the display.  Otherwise a frame that has not been
+        written yet is replaced and counted in `dropped`.
+
+        If `copy` is true the new back buffer starts out as a copy of
+        the frame just presented, for applications that update the
+        display incrementally.
+
+        Raises the error that stopped the writer thread, if it failed,
+        or `RuntimeError` if it isn't running.'''
+        with self._cond:
+            self._check()
+            while self._busy or (block and self._pending):
+                self._cond.wait()
+                self._check()
+
+            if self._pending:
+                self.dropped += 1
+
+            self.back, self._front = self._front, self.back
+            self._pending = True
+            self._cond.notify_all()
+
+            if copy:
+                self.back[:] = self._front
+
+        return self.back
+
+    def frame_number(self):
+        '''Return the number of frame periods that have elapsed since the
+        scheduler was started.'''
+        if not self.period or self._started is None:
+            return self.frames
+        return int((time.monotonic() - self._started) / self.period)
+
+    @property
+    def fps(self):
+        '''The frame rate achieved over the last second or so.'''
+        if len(self._times) < 2:
+            return 0.0
+        elapsed = self._times[-1] - self._times[0]
+        if not elapsed:
+            return 0.0
+        return (len(self._times) - 1) / elapsed
+
+    def stats(self):
+        '''Return a dictionary of frame statistics.'''
+        return {
+            'fps': self.fps,
+            'frames': self.frames,
+            'dropped': self.dropped,
+            'late': self.late,
+        }
+
+    def _check(self):
+        # The error stays set, so that every later call fails the same
+        # way instead of waiting for a writer that has gone.
+        if self._error is not None:
+            raise self._error
+        if not self._running:
+            raise RuntimeError('frame scheduler is not running')
+
+    def _writer(self):
+        deadline = time.monotonic()
+
+        while True:
+            with self._cond:
+                while self._running and not self._pending:
+                    self._cond.wait()
+                if not self._running:
+                    break
+
+            now = time.monotonic()
+            if now < deadline:
+                time.sleep(deadline - now)
+            elif now - deadline > self.period:
+                self.late += 1
+                deadline = now
+
+            with self._cond:
+                self._busy = True
+                self._pending = False
+
+            try:
+                self.lcd.write_buffer(self._front)
+            except Exception as exc:
+                LOG.exception('failed to write frame')
+                with self._cond:
+                    self._error = exc
+                    self._busy = False
+                    self._running = False
+                    self._cond.notify_all()
+                break
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+            self.frames += 1
+            self._times.append(time.monotonic())
+            deadline += self.period
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
@@ -1,36 +1,234 @@
+import ctypes
+import fcntl
 import logging
+import os
 import struct
 
+import st7565.metrics
+
 LOG = logging.getLogger(__name__)
 
+# From <linux/spi/spidev.h>.
+SPI_IOC_MAGIC = ord('k')
+
+SPI_CPHA = 0x01
+SPI_CPOL = 0x02
+
+SPI_MODE_0 = 0
+SPI_MODE_1 = SPI_CPHA
+SPI_MODE_2 = SPI_CPOL
+SPI_MODE_3 = SPI_CPOL | SPI_CPHA
+
+# Default transfer size limit of the spidev driver, used when we
+# cannot read it from sysfs.
+BUFSIZ = 4096
+BUFSIZ_PATH = '/sys/module/spidev/parameters/bufsiz'
+
+_IOC_WRITE = 1
+_IOC_READ = 2
+
+# The size field of an ioctl number is 14 bits wide.
+_IOC_SIZEMASK = (1 << 14) - 1
+
+
+def _ioc(direction, nr, size):
+    return (direction << 30) | (size << 16) | (SPI_IOC_MAGIC << 8) | nr
+
+
+SPI_IOC_RD_MODE = _ioc(_IOC_READ, 1, 1)
+SPI_IOC_WR_MODE = _ioc(_IOC_WRITE, 1, 1)
+SPI_IOC_RD_BITS_PER_WORD = _ioc(_IOC_READ, 3, 1)
+SPI_IOC_WR_BITS_PER_WORD = _ioc(_IOC_WRITE, 3, 1)
+SPI_IOC_RD_MAX_SPEED_HZ = _ioc(_IOC_READ, 4, 4)
+SPI_IOC_WR_MAX_SPEED_HZ = _ioc(_IOC_WRITE, 4, 4)
+
+
+class spi_ioc_transfer (ctypes.Structure):
+    _fields_ = [
+        ('tx_buf', ctypes.c_uint64),
+        ('rx_buf', ctypes.c_uint64),
+        ('len', ctypes.c_uint32),
+        ('speed_hz', ctypes.c_uint32),
+        ('delay_usecs', ctypes.c_uint16),
+        ('bits_per_word', ctypes.c_uint8),
+        ('cs_change', ctypes.c_uint8),
+        ('tx_nbits', ctypes.c_uint8),
+        ('rx_nbits', ctypes.c_uint8),
+        ('word_delay_usecs', ctypes.c_uint8),
+        ('pad', ctypes.c_uint8),
+    ]
+
+
+def SPI_IOC_MESSAGE(n):
+    return _ioc(_IOC_WRITE, 0, n * ctypes.sizeof(spi_ioc_transfer))
+
+
+# The most transfers whose size still fits in SPI_IOC_MESSAGE.
+MAX_TRANSFERS = _IOC_SIZEMASK // ctypes.sizeof(spi_ioc_transfer)
+
+
+def read_bufsiz(path=BUFSIZ_PATH):
+    '''Return the maximum number of bytes the spidev driver will accept
+    in a single message.'''
+    try:
+        with open(path) as fd:
+            return int(fd.read())
+    except (IOError, OSError, ValueError):
+        return BUFSIZ
+
+
+def _address(buf):
+    '''Return `(address, length, ref)` for the memory backing `buf`.
+    Writable buffers (`bytearray`, writable `memoryview`s) and `bytes`
+    are used in place; anything else is copied first.  `ref` must be
+    kept alive until the transfer is complete.'''
+    if isinstance(buf, bytes):
+        return (ctypes.cast(ctypes.c_char_p(buf), ctypes.c_void_p).value,
+                len(buf), buf)
+
+    if not isinstance(buf, memoryview):
+        try:
+            buf = memoryview(buf)
+        except TypeError:
+            buf = memoryview(bytearray(buf))
+
+    if buf.readonly or not buf.contiguous:
+        return _address(buf.tobytes())
+
+    buf = buf.cast('B')
+    if len(buf) == 0:
+        return 0, 0, buf
+
+    ref = (ctypes.c_char * len(buf)).from_buffer(buf)
+    return ctypes.addressof(ref), len(buf), ref
+
 
 class SpiDev (object):
     '''This is a simple wrapper for accessing SPI devices using the Linux
     spidev kernel driver, described at:
 
-    <https://www.kernel.org/doc/Documentation/spi/spi-summary>'''
+    <https://www.kernel.org/doc/Documentation/spi/spi-summary>
 
-    def __init__(self, bus, dev):
+    Data is written with `SPI_IOC_MESSAGE` ioctls directly from the
+    caller's buffers, so `bytes`, `bytearray` and `memoryview` objects
+    are sent without being copied.'''
+
+    def __init__(self, bus, dev, max_speed_hz=None, mode=None,
+                 bits_per_word=None, metrics=None):
         self.bus = bus
         self.dev = dev
         self.fd = -1
+        self.bufsiz = read_bufsiz()
+        self.metrics = (st7565.metrics.registry if metrics is None
+                        else metrics)
 
         self.open()
 
+        if mode is not None:
+            self.mode = mode
+        if bits_per_word is not None:
+            self.bits_per_word = bits_per_word
+        if max_speed_hz is not None:
+            self.max_speed_hz = max_speed_hz
+
     def open(self):
         LOG.debug('opening SPI device %d.%d',
                   self.bus, self.dev)
         assert(self.fd == -1)
-        self.fd = open(
+        self.fd = os.open(
             '/dev/spidev%d.%d' % (self.bus, self.dev),
-            'w')
+            os.O_RDWR)
+
+    def _get(self, request, fmt):
+        buf = bytearray(struct.calcsize(fmt))
+        fcntl.ioctl(self.fd, request, buf, True)
+        return struct.unpack(fmt, buf)[0]
+
+    def _set(self, request, fmt, val):
+        fcntl.ioctl(self.fd, request, struct.pack(fmt, val))
+
+    @property
+    def mode(self):
+        '''The SPI mode (0-3).'''
+        return self._get(SPI_IOC_RD_MODE, 'B')
+
+    @mode.setter
+    def mode(self, val):
+        self._set(SPI_IOC_WR_MODE, 'B', val)
+
+    @property
+    def bits_per_word(self):
+        return self._get(SPI_IOC_RD_BITS_PER_WORD, 'B')
+
+    @bits_per_word.setter
+    def bits_per_word(self, val):
+        self._set(SPI_IOC_WR_BITS_PER_WORD, 'B', val)
+
+    @property
+    def max_speed_hz(self):
+        '''The SPI clock speed in Hz.'''
+        return self._get(SPI_IOC_RD_MAX_SPEED_HZ, 'I')
+
+    @max_speed_hz.setter
+    def max_speed_hz(self, val):
+        self._set(SPI_IOC_WR_MAX_SPEED_HZ, 'I', val)
 
     def write(self, bytes):
+        '''Write a single buffer to the device.'''
+        self.write_segments([bytes])
+
+    def write_segments(self, segments):
+        '''Write several buffers to the device.  Segments are sent as
+        transfers of a single SPI message (chip select stays asserted
+        between them), starting a new message whenever the spidev
+        `bufsiz` limit would be exceeded or the message already holds
+        `MAX_TRANSFERS` transfers.  Segments larger than the limit are
+        split.'''
         assert(self.fd != -1)
-        self.fd.write(
-            struct.pack('%ds' % len(bytes),
-                        ''.join(chr(x) for x in bytes)))
-        self.fd.flush()
+
+        transfers = []
+        refs = []
+        total = 0
+
+        for seg in segments:
+            addr, length, ref = _address(seg)
+            refs.append(ref)
+
+            while length > 0:
+                if total == self.bufsiz or len(transfers) == MAX_TRANSFERS:
+                    self._message(transfers)
+                    transfers = []
+                    total = 0
+
+                chunk = min(length, self.bufsiz - total)
+                transfers.append((addr, chunk))
+                addr += chunk
+                length -= chunk
+                total += chunk
+
+        if transfers:
+            self._message(transfers)
+
+    def _message(self, transfers):
+        xfers = (spi_ioc_transfer * len(transfers))()
+        nbytes = 0
+        for xfer, (addr, length) in zip(xfers, transfers):
+            xfer.tx_buf = addr
+            xfer.len = length
+            nbytes += length
+
+        metrics = self.metrics
+        if not metrics.enabled:
+            fcntl.ioctl(self.fd, SPI_IOC_MESSAGE(len(transfers)), xfers)
+            return
+
+        started = st7565.metrics.clock()
+        fcntl.ioctl(self.fd, SPI_IOC_MESSAGE(len(transfers)), xfers)
+        metrics.observe('spi.message_seconds',
+                        st7565.metrics.clock() - started)
+        metrics.incr('spi.messages')
+        metrics.incr('spi.transfers', len(transfers))
+        metrics.incr('spi.bytes', nbytes)
 
     def read(self, len=None):
         raise NotImplementedError()
@@ -41,7 +239,7 @@ class SpiDev (object):
     def close(self):
         LOG.debug('closing SPI device %d.%d',
                   self.bus, self.dev)
-        self.fd.close()
+        os.close(self.fd)
         self.fd = -1
 
     def fileno(self):
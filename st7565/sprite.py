@@ -0,0 +1,61 @@
+import logging
+
+import st7565.bitmap
+
+LOG = logging.getLogger(__name__)
+
+
+class Sprite (object):
+    '''An image to be drawn repeatedly with `st7565.bitmap.Bitmap.blit`,
+    at arbitrary positions:
+
+        ball = Sprite.from_image(Image.open('ball.png'))
+        screen.blit(ball, x, y)
+
+    Drawing at a `y` that is not a multiple of 8 needs the image shifted
+    by `y % 8` pixels.  A sprite builds each of the 8 shifted copies
+    (of the image and of its mask, if it has one) the first time it is
+    drawn at that offset, and keeps them, so moving it around never
+    shifts bits again.
+
+    If the sprite has a `mask` (a bitmap of the same size), only the
+    pixels set in the mask are drawn; with `op=COPY` this draws
+    non-rectangular sprites over a background.'''
+
+    def __init__(self, bitmap, mask=None):
+        if mask is not None and (mask.pages, mask.columns) != (
+                bitmap.pages, bitmap.columns):
+            raise ValueError('mask must be the same size as the sprite')
+
+        self.bitmap = bitmap
+        self.mask = None if mask is None else Sprite(mask)
+        self.pages = bitmap.pages
+        self.columns = bitmap.columns
+        self.width = bitmap.width
+        self.height = bitmap.height
+        self._shifted = [None] * 8
+
+    @classmethod
+    def from_image(cls, img):
+        '''Create a sprite from a `PIL.Image.Image`.  If the image has an
+        alpha channel, pixels that are not fully transparent make up the
+        mask.'''
+        mask = None
+        if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+            alpha = img.convert('RGBA').getchannel('A')
+            mask = st7565.bitmap.Bitmap.from_image(
+                alpha.point(lambda a: 0 if a else 255, '1'))
+
+        return cls(st7565.bitmap.Bitmap.from_image(img), mask)
+
+    def shifted(self, shift):
+        '''Return the sprite shifted down by `shift` (0-7) pixels (see
+        `st7565.bitmap.Bitmap.shifted`).'''
+        rows = self._shifted[shift]
+        if rows is None:
+            rows = self._shifted[shift] = self.bitmap.shifted(shift)
+        return rows
+
+    def draw(self, bitmap, x, y, op=st7565.bitmap.OR):
+        '''Draw the sprite onto `bitmap` at `(x, y)`.'''
+        bitmap.blit(self, x, y, op)
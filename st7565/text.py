@@ -0,0 +1,129 @@
+'''Text rendering with cached glyphs.
+
+A `TextRenderer` renders whole strings at once: glyph bytes are looked
+up in a cache and joined into a single buffer per page, which can be
+sent to the LCD in one write or drawn into a `st7565.bitmap.Bitmap` at
+any pixel position.  For positions that are not aligned to a page, each
+glyph is cached pre-shifted into the pages it straddles, so drawing
+never shifts bits one glyph at a time.
+
+Fonts are described in `st7565.fonts`.'''
+
+import st7565.bitops as bitops
+import st7565.fonts
+import st7565.fonts.font5x7 as font5x7
+
+
+class TextRenderer (object):
+
+    def __init__(self, font=font5x7):
+        '''Create a renderer for `font`, either a font object as
+        described in `st7565.fonts` or a font module in the style of
+        `st7565.fonts.font5x7`.'''
+        if hasattr(font, 'glyphs') and not hasattr(font, 'glyph'):
+            font = st7565.fonts.ModuleFont(font)
+
+        self.font = font
+        self.pages = font.pages
+        self._glyphs = {}
+        self._shifted = {}
+
+    def glyph(self, c):
+        '''Return the glyph for character `c` as a tuple with one row of
+        column bytes per page.  Characters not in the font are drawn as
+        `?`.'''
+        try:
+            return self._glyphs[c]
+        except KeyError:
+            pass
+
+        data = self.font.glyph(c)
+        if data is not None:
+            data = bytes(data)
+            width = len(data) // self.pages
+            rows = tuple(data[i * width:(i + 1) * width]
+                         for i in range(self.pages))
+        elif c != '?':
+            rows = self.glyph('?')
+        else:
+            rows = (b'',) * self.pages
+
+        self._glyphs[c] = rows
+        return rows
+
+    def shifted(self, c, shift):
+        '''Return the glyph for character `c` moved down by `shift` (1-7)
+        pixels, as a tuple with one row of column bytes for each of the
+        `pages + 1` pages it covers.'''
+        try:
+            return self._shifted[c, shift]
+        except KeyError:
+            pass
+
+        rows = self.glyph(c)
+        width = len(rows[0])
+        out = []
+        above = bytes(width)
+        for row in rows + (bytes(width),):
+            out.append(bitops.shift_rows_down(above, row, shift))
+            above = row
+
+        out = tuple(out)
+        self._shifted[c, shift] = out
+        return out
+
+    def render_pages(self, s):
+        '''Return the string `s` as a list with one row of column bytes
+        per page.'''
+        glyph = self.glyph
+        glyphs = [glyph(c) for c in s]
+        return [b''.join([rows[i] for rows in glyphs])
+                for i in range(self.pages)]
+
+    def render(self, s):
+        '''Return the column bytes for the top page of the string `s`
+        (all of it, for a single-page font).'''
+        return self.render_pages(s)[0]
+
+    def width(self, s):
+        '''Return the width of the string `s` in pixels.'''
+        return len(self.render(s))
+
+    def draw(self, bitmap, x, y, s, pen=True):
+        '''Draw the string `s` into `bitmap` with its top left corner at
+        pixel position `(x, y)`.  Set pixels if `pen` is `True`, unset
+        them if `pen` is `False`.  Text that falls outside the bitmap is
+        clipped.'''
+        page, shift = divmod(y, 8)
+
+        if shift == 0:
+            rows = self.render_pages(s)
+        else:
+            shifted = self.shifted
+            glyphs = [shifted(c, shift) for c in s]
+            rows = [b''.join([g[i] for g in glyphs])
+                    for i in range(self.pages + 1)]
+
+        for i, row in enumerate(rows):
+            self._merge(bitmap, page + i, x, row, pen)
+
+    def _merge(self, bitmap, page, x, row, pen):
+        if page < 0 or page >= bitmap.pages or x >= bitmap.columns:
+            return
+
+        if x < 0:
+            row = row[-x:]
+            x = 0
+        row = row[:bitmap.columns - x]
+        if not row:
+            return
+
+        start = page * bitmap.columns + x
+        end = start + len(row)
+        dst = int.from_bytes(bitmap[start:end], 'big')
+        src = int.from_bytes(row, 'big')
+        if pen:
+            dst |= src
+        else:
+            dst &= ~src
+        bitmap[start:end] = dst.to_bytes(len(row), 'big')
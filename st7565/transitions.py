@@ -0,0 +1,295 @@
+'''Backlight transitions: fades, pulses and color cycles.
+
+A transition is computed once, ahead of time, as a list of PWM duty
+cycle steps (`Transition`), and then played by a `Scheduler`:
+
+    st7565.transitions.default_scheduler().start()
+    leds = st7565.backlight.Backlight()
+    leds.transition(st7565.transitions.pulse((1, 0, 0), period=2))
+
+Colors are `(red, green, blue)` tuples of perceived brightness between
+0 and 1.  They are mapped to duty cycles through a gamma table, so
+fades look even to the eye rather than jumping at the bottom and
+flattening out at the top.  Steps in which no channel changes are
+dropped when the transition is built, and the backlight skips channels
+whose duty cycle is unchanged, so a slow fade costs a handful of PWM
+updates rather than three per step.
+
+One scheduler plays every running transition.  It keeps them in a heap
+ordered by the time of their next step.  It is driven from an
+application's main loop by calling `tick`, or runs on its own thread
+(which sleeps until the next step) once `start` is called.  No thread
+is started unless you ask for one, including for the shared
+`default_scheduler`.'''
+
+import bisect
+import heapq
+import itertools
+import logging
+import math
+import threading
+import time
+
+LOG = logging.getLogger(__name__)
+
+GAMMA = 2.2
+LEVELS = 256
+
+# Duty cycles are expressed in increments of the PWM period.  This is
+# the number of 10us increments in a 20ms RPIO.PWM subcycle.
+RESOLUTION = 1999
+
+# Updating faster than the PWM period has no visible effect.
+INTERVAL = 0.02
+
+
+def gamma_table(gamma=GAMMA, levels=LEVELS, resolution=RESOLUTION):
+    '''Return a tuple mapping `levels` brightness levels to duty cycles
+    between 0 and `resolution`.'''
+    return tuple(int(round(resolution * (i / float(levels - 1)) ** gamma))
+                 for i in range(levels))
+
+
+GAMMA_TABLE = gamma_table()
+
+
+def to_duty(value, table=GAMMA_TABLE):
+    '''Convert a brightness between 0 and 1 to a duty cycle.'''
+    value = min(1.0, max(0.0, value))
+    return table[int(round(value * (len(table) - 1)))]
+
+
+def to_brightness(value, gamma=GAMMA):
+    '''Convert a fraction of full duty cycle to a brightness between 0
+    and 1 (the inverse of `to_duty`).'''
+    return min(1.0, max(0.0, value)) ** (1.0 / gamma)
+
+
+class Transition (object):
+    '''A precomputed backlight schedule: `steps` is a list of `(offset,
+    duties)` pairs, where `offset` is the time in seconds from the start
+    of the transition and `duties` a tuple of three duty cycles.  If
+    `loop` is true the transition repeats every `duration` seconds.'''
+
+    def __init__(self, steps, duration, loop=False):
+        self.steps = steps
+        self.offsets = [offset for offset, duties in steps]
+        self.duration = duration
+        self.loop = loop
+
+    def __len__(self):
+        return len(self.steps)
+
+    @classmethod
+    def build(cls, func, duration, interval=INTERVAL, loop=False,
+              table=GAMMA_TABLE):
+        '''Sample `func`, which maps a position between 0 and 1 to a
+        color, every `interval` seconds over `duration` seconds.  Steps
+        that don't change any channel are left out.'''
+        count = max(1, int(math.ceil(duration / interval)))
+        if not loop:
+            count += 1
+
+        steps = []
+        last = None
+        for i in range(count):
+            offset = min(i * interval, duration)
+            duties = tuple(to_duty(v, table)
+                           for v in func(offset / duration if duration
+                                         else 1.0))
+            if duties != last:
+                steps.append((offset, duties))
+                last = duties
+
+        return cls(steps, duration, loop)
+
+
+def _mix(start, end, pos):
+    return tuple(a + (b - a) * pos for a, b in zip(start, end))
+
+
+def fade(start, end, duration, **kwargs):
+    '''Fade from color `start` to color `end`.'''
+    return Transition.build(lambda pos: _mix(start, end, pos),
+                            duration, **kwargs)
+
+
+def pulse(color, period=2.0, low=(0, 0, 0), **kwargs):
+    '''Pulse smoothly between `low` and `color`, repeating every `period`
+    seconds.'''
+    def func(pos):
+        return _mix(low, color, (1 - math.cos(2 * math.pi * pos)) / 2)
+
+    return Transition.build(func, period, loop=True, **kwargs)
+
+
+def color_cycle(colors, period=6.0, **kwargs):
+    '''Fade through each of `colors` in turn and back to the first,
+    taking `period` seconds for the whole cycle.'''
+    colors = list(colors)
+
+    def func(pos):
+        pos *= len(colors)
+        i = int(pos) % len(colors)
+        return _mix(colors[i], colors[(i + 1) % len(colors)], pos - int(pos))
+
+    return Transition.build(func, period, loop=True, **kwargs)
+
+
+def rainbow(period=3.6, **kwargs):
+    '''Cycle through the hues with three sine waves a quarter period
+    apart.'''
+    def func(pos):
+        angle = 2 * math.pi * pos
+        return tuple((math.sin(angle + phase) + 1) / 2
+                     for phase in (0, math.pi / 2, math.pi))
+
+    return Transition.build(func, period, loop=True, **kwargs)
+
+
+class Job (object):
+    '''A transition playing on a backlight.'''
+
+    def __init__(self, backlight, transition, started):
+        self.backlight = backlight
+        self.transition = transition
+        self.started = started
+        self.index = 0
+        self.cancelled = False
+
+    @property
+    def done(self):
+        return self.cancelled or self.index is None
+
+    def deadline(self):
+        return self.started + self.transition.offsets[self.index]
+
+    def run(self, now):
+        '''Apply the latest step that is due and advance to the next
+        one.  Steps that were missed are skipped.'''
+        transition = self.transition
+        if now - self.started >= transition.duration and transition.loop:
+            cycles = int((now - self.started) // transition.duration)
+            self.started += cycles * transition.duration
+            self.index = 0
+
+        # The step we were scheduled for is due even if rounding makes
+        # `now - started` fall just short of its offset.
+        i = bisect.bisect_right(transition.offsets, now - self.started) - 1
+        i = max(i, self.index)
+        self.backlight.set_duties(transition.steps[i][1])
+
+        i += 1
+        if i < len(transition):
+            self.index = i
+        elif transition.loop:
+            self.started += transition.duration
+            self.index = 0
+        else:
+            self.index = None
+
+
+class Scheduler (object):
+    '''Plays transitions.  Call `start` to run the scheduler on a
+    background thread, which sleeps until the next step is due, or call
+    `tick` regularly from your own loop.'''
+
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self._queue = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition(threading.RLock())
+        self._thread = None
+        self._running = False
+
+    def add(self, backlight, transition, start=None):
+        '''Start playing `transition` on `backlight` and return a `Job`
+        that can be passed to `cancel`.'''
+        if not len(transition):
+            raise ValueError('empty transition')
+
+        job = Job(backlight, transition,
+                  self.clock() if start is None else start)
+        with self._cond:
+            heapq.heappush(self._queue,
+                           (job.deadline(), next(self._seq), job))
+            self._cond.notify()
+        return job
+
+    def cancel(self, job):
+        '''Stop playing `job`.  The backlight keeps its current color.'''
+        with self._cond:
+            job.cancelled = True
+            self._cond.notify()
+
+    def tick(self, now=None):
+        '''Apply every step that is due, and return the number of seconds
+        until the next one (or None if nothing is playing).'''
+        with self._cond:
+            if now is None:
+                now = self.clock()
+
+            queue = self._queue
+            while queue and (queue[0][2].cancelled or queue[0][0] <= now):
+                job = heapq.heappop(queue)[2]
+                if job.cancelled:
+                    continue
+
+                try:
+                    job.run(now)
+                except Exception:
+                    LOG.exception('backlight transition failed')
+                    job.cancelled = True
+                    continue
+
+                if not job.done:
+                    heapq.heappush(queue,
+                                   (job.deadline(), next(self._seq), job))
+
+            if not queue:
+                return None
+            return max(0.0, queue[0][0] - now)
+
+    def start(self):
+        '''Run the scheduler on a background thread.'''
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+
+        self._thread = threading.Thread(target=self._run,
+                                        name='st7565-transitions')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        '''Stop the background thread.'''
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        with self._cond:
+            while self._running:
+                self._cond.wait(self.tick())
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_scheduler():
+    '''Return the shared scheduler that `Backlight.transition` uses
+    unless given another.  It is not started: call its `start` method
+    to play transitions on a background thread, or call `tick` from
+    your own loop.'''
+    global _default
+
+    with _default_lock:
+        if _default is None:
+            _default = Scheduler()
+        return _default
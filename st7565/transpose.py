@@ -0,0 +1,108 @@
+'''Conversion of row-major 1-bit images to the page-major format used by
+the ST7565, without third-party dependencies.
+
+Images are converted in blocks of 8x8 pixels: eight bytes taken from
+eight consecutive rows are packed into a 64-bit integer, transposed
+with a handful of shifts and masks, and unpacked into eight column
+bytes.  Since no bit moves further than its own 64-bit word, a whole
+page is handled at once by laying its 8x8 blocks end to end in one
+large integer.'''
+
+INVERT = bytes(bytearray(0xff ^ i for i in range(256)))
+
+
+def transpose8(x):
+    '''Transpose an 8x8 bit matrix packed into a 64-bit integer, most
+    significant byte first.  On input each byte is a row with the
+    leftmost pixel in the most significant bit; on output each byte is
+    a column with the top pixel in the most significant bit.  See
+    Hacker's Delight, section 7-3.'''
+    t = (x ^ (x >> 7)) & 0x00AA00AA00AA00AA
+    x = x ^ t ^ (t << 7)
+    t = (x ^ (x >> 14)) & 0x0000CCCC0000CCCC
+    x = x ^ t ^ (t << 14)
+    t = (x ^ (x >> 28)) & 0x00000000F0F0F0F0
+    x = x ^ t ^ (t << 28)
+    return x
+
+
+_masks = {}
+
+
+def _transpose_masks(words):
+    '''Return the masks used by `transpose8`, repeated for `words`
+    64-bit words.'''
+    try:
+        return _masks[words]
+    except KeyError:
+        masks = tuple(int.from_bytes(bytes.fromhex(m) * words, 'big')
+                      for m in ('00AA00AA00AA00AA',
+                                '0000CCCC0000CCCC',
+                                '00000000F0F0F0F0'))
+        _masks[words] = masks
+        return masks
+
+
+def transpose_blocks(data, words):
+    '''Transpose each of the `words` 8x8 bit matrices stored end to end
+    in `data` (8 bytes each, laid out as for `transpose8`) and return
+    the result as bytes.'''
+    m1, m2, m4 = _transpose_masks(words)
+    x = int.from_bytes(data, 'big')
+    t = (x ^ (x >> 7)) & m1
+    x = x ^ t ^ (t << 7)
+    t = (x ^ (x >> 14)) & m2
+    x = x ^ t ^ (t << 14)
+    t = (x ^ (x >> 28)) & m4
+    x = x ^ t ^ (t << 28)
+    return x.to_bytes(words * 8, 'big')
+
+
+def page_masks(height, offset=0):
+    '''Return a list with one byte per page, marking which rows of that
+    page are covered by an image of `height` rows that starts `offset`
+    rows into the first page.'''
+    masks = []
+    for page in range((offset + height + 7) // 8):
+        mask = 0
+        for row in range(8):
+            if 0 <= page * 8 + row - offset < height:
+                mask |= 0x80 >> row
+        masks.append(mask)
+
+    return masks
+
+
+def pack_rows(data, width, height, offset=0, stride=None, invert=False):
+    '''Convert a packed 1-bit image to page format.
+
+    `data` holds `height` rows of `stride` bytes (by default just
+    enough for `width` pixels), leftmost pixel in the most significant
+    bit, as returned by `PIL.Image.tobytes()` for a mode '1' image.
+    The image is placed `offset` rows (0-7) down from the top of the
+    first page.  Returns a `bytearray` of `width` bytes per page, with
+    uncovered rows zero.  If `invert` is true, 0 bits are treated as
+    set pixels.'''
+    if stride is None:
+        stride = (width + 7) // 8
+
+    data = bytes(data)
+    if invert:
+        data = data.translate(INVERT)
+
+    npages = (offset + height + 7) // 8
+    out = bytearray(npages * width)
+
+    for page in range(npages):
+        # Interleave the 8 rows of this page so that each 8-column
+        # group forms one 8x8 block.
+        blocks = bytearray(stride * 8)
+        for row in range(8):
+            y = page * 8 + row - offset
+            if 0 <= y < height:
+                blocks[row::8] = data[y * stride:(y + 1) * stride]
+
+        out[page * width:(page + 1) * width] = (
+            transpose_blocks(blocks, stride)[:width])
+
+    return out
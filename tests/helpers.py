@@ -0,0 +1,27 @@
+'''Shared helpers for the tests.'''
+
+import st7565.bitmap
+import st7565.emulator
+import st7565.lcd
+import st7565.metrics
+
+
+def make_lcd(adafruit=False, init=False, **kwargs):
+    '''Return an LCD driving an emulator, and the emulator.  The full
+    initialization sequence waits out the reset delays, so unless
+    `init` is true the display is only switched on and cleared.'''
+    emu = st7565.emulator.Emulator(adafruit=adafruit)
+    kwargs.setdefault('metrics', st7565.metrics.Metrics(enabled=False))
+    lcd = st7565.lcd.LCD(spi=emu, gpio=emu, adafruit=adafruit, init=init,
+                         **kwargs)
+    if not init:
+        lcd.display_on()
+        lcd.clear()
+    return lcd, emu
+
+
+def scribble(bitmap, rng, count=200):
+    '''Flip `count` random pixels of `bitmap`.'''
+    for i in range(count):
+        bitmap.set_pixel(rng.randrange(bitmap.width),
+                         rng.randrange(bitmap.height), st7565.bitmap.XOR)
@@ -0,0 +1,89 @@
+import functools
+import random
+import time
+
+import pytest
+
+import st7565.animation
+import st7565.bitmap
+
+from tests.helpers import scribble
+
+
+def slow_frame(bitmap, steps):
+    '''Scroll `bitmap`, taking longer for earlier frames so that
+    workers finish out of order.'''
+    time.sleep(0.02 * (4 - steps % 4))
+    return st7565.animation.hscroll_frame(bitmap, steps)
+
+
+def image_frame(size, param):
+    from PIL import Image
+
+    img = Image.new('1', size, 1)
+    img.putpixel((param, 0), 0)
+    return img
+
+
+def random_screen(seed):
+    screen = st7565.bitmap.Bitmap()
+    scribble(screen, random.Random(seed))
+    return screen
+
+
+@pytest.mark.parametrize('workers', [0, 1, 3])
+def test_precompute_order(workers):
+    screen = random_screen(1)
+    frames = list(st7565.animation.precompute(
+        functools.partial(slow_frame, screen), range(8), workers=workers))
+
+    expected = []
+    for steps in range(8):
+        frame = screen.copy()
+        frame.hscroll(steps)
+        expected.append(bytes(frame))
+    assert frames == expected
+
+
+def test_precompute_workers_match_inline():
+    screen = random_screen(2)
+    inline = list(st7565.animation.vscroll(screen, step=5, workers=0))
+    pooled = list(st7565.animation.vscroll(screen, step=5, workers=2))
+    assert len(inline) == 13
+    assert all(isinstance(frame, bytes) for frame in pooled)
+    assert pooled == inline
+
+
+def test_render_bitmap():
+    screen = random_screen(3)
+    assert st7565.animation.render(lambda param: screen, None) == (
+        bytes(screen))
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_precompute_images(workers):
+    pytest.importorskip('PIL.Image')
+    frames = list(st7565.animation.precompute(
+        functools.partial(image_frame, (4, 2)), range(4), workers=workers))
+
+    # A 4x2 image is centered at (62, 31).
+    for param, frame in enumerate(frames):
+        expected = st7565.bitmap.Bitmap()
+        expected.set_pixel(62 + param, 31)
+        assert frame == bytes(expected)
+
+
+def test_spin():
+    Image = pytest.importorskip('PIL.Image')
+    img = Image.new('1', (20, 20), 1)
+    for x in range(20):
+        img.putpixel((x, 10), 0)
+
+    frames = list(st7565.animation.spin(img, step=90, workers=0))
+    assert len(frames) == 4
+
+    # The first frame is the image itself; a quarter turn moves it.
+    expected = st7565.bitmap.Bitmap()
+    expected.drawbitmap(img, centerx=True, centery=True)
+    assert frames[0] == bytes(expected)
+    assert frames[1] != frames[0]
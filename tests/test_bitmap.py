@@ -0,0 +1,484 @@
+import random
+
+import pytest
+
+import st7565.bitmap
+import st7565.bitops
+import st7565.sprite
+import st7565.transpose
+from st7565.bitmap import AND, CLEAR, COPY, OR, SET, XOR
+
+
+def pixel(bitmap, x, y):
+    return bool(bitmap[(y // 8) * bitmap.columns + x] & (0x80 >> (y % 8)))
+
+
+def random_bitmap(rng, pages=8, columns=128):
+    bitmap = st7565.bitmap.Bitmap(pages, columns)
+    bitmap[:] = bytes(bytearray(rng.randrange(256)
+                                for i in range(len(bitmap))))
+    return bitmap
+
+
+def random_rows(rng, width, height, stride=None):
+    if stride is None:
+        stride = (width + 7) // 8
+    return bytes(bytearray(rng.randrange(256)
+                           for i in range(stride * height)))
+
+
+def row_bit(data, stride, x, y):
+    return bool(data[y * stride + x // 8] & (0x80 >> (x % 8)))
+
+
+def random_image(rng, width, height):
+    '''Return a random mode '1' PIL image, skipping the test if PIL is
+    not installed.'''
+    Image = pytest.importorskip('PIL.Image')
+    img = Image.new('1', (width, height))
+    img.putdata([rng.randrange(2) * 255 for i in range(width * height)])
+    return img
+
+
+def draw_reference(bitmap, img, tx, ty):
+    '''Reference drawbitmap: black image pixels are set, white ones
+    cleared, one pixel at a time.'''
+    width, height = img.size
+    for y in range(height):
+        for x in range(width):
+            bitmap.set_pixel(tx + x, ty + y,
+                             CLEAR if img.getpixel((x, y)) else SET)
+
+
+def draw_rows_case(seed):
+    rng = random.Random(seed)
+    bitmap = random_bitmap(rng)
+    width = rng.randrange(1, bitmap.width + 1)
+    height = rng.randrange(1, bitmap.height + 1)
+    tx = rng.randrange(bitmap.width - width + 1)
+    ty = rng.randrange(bitmap.height - height + 1)
+    invert = rng.random() < 0.5
+    data = random_rows(rng, width, height)
+    return bitmap, (data, width, height, tx, ty, invert)
+
+
+def draw_rows_reference(bitmap, data, width, height, tx, ty, invert):
+    expected = bitmap.copy()
+    stride = (width + 7) // 8
+    for y in range(height):
+        for x in range(width):
+            on = row_bit(data, stride, x, y) != invert
+            expected.set_pixel(tx + x, ty + y, SET if on else CLEAR)
+    return expected
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_draw_rows_numpy(seed):
+    pytest.importorskip('numpy')
+    bitmap, args = draw_rows_case(seed)
+    expected = draw_rows_reference(bitmap, *args)
+    bitmap._draw_rows_numpy(*args)
+    assert bitmap == expected
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_drawbitmap(seed):
+    rng = random.Random(seed)
+    width = rng.randrange(1, 129)
+    height = rng.randrange(1, 65)
+    img = random_image(rng, width, height)
+    tx = rng.randrange(128 - width + 1)
+    ty = rng.randrange(64 - height + 1)
+
+    bitmap = random_bitmap(rng)
+    expected = bitmap.copy()
+    draw_reference(expected, img, tx, ty)
+
+    bitmap.drawbitmap(img, tx, ty)
+    assert bitmap == expected
+
+
+def test_drawbitmap_center():
+    rng = random.Random(1)
+    img = random_image(rng, 10, 7)
+
+    bitmap = st7565.bitmap.Bitmap()
+    bitmap.drawbitmap(img, centerx=True, centery=True)
+    expected = st7565.bitmap.Bitmap()
+    draw_reference(expected, img, 59, 29)
+    assert bitmap == expected
+
+    # Centering one axis leaves the offset on the other.
+    bitmap = st7565.bitmap.Bitmap()
+    bitmap.drawbitmap(img, tx=3, ty=40, centerx=True)
+    expected = st7565.bitmap.Bitmap()
+    draw_reference(expected, img, 59, 40)
+    assert bitmap == expected
+
+
+@pytest.mark.parametrize('size, tx, ty', [
+    ((129, 1), 0, 0),
+    ((1, 65), 0, 0),
+    ((10, 10), 119, 0),
+    ((10, 10), 0, 55),
+    ((10, 10), -1, 0),
+])
+def test_drawbitmap_does_not_fit(size, tx, ty):
+    img = random_image(random.Random(2), *size)
+    bitmap = st7565.bitmap.Bitmap()
+    with pytest.raises(ValueError):
+        bitmap.drawbitmap(img, tx, ty)
+    assert bitmap == st7565.bitmap.Bitmap()
+
+
+def test_transpose8():
+    rng = random.Random(1)
+    for i in range(100):
+        x = rng.getrandbits(64)
+        rows = x.to_bytes(8, 'big')
+        columns = st7565.transpose.transpose8(x).to_bytes(8, 'big')
+        for r in range(8):
+            for c in range(8):
+                assert (bool(rows[r] & (0x80 >> c)) ==
+                        bool(columns[c] & (0x80 >> r)))
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_pack_rows(seed):
+    rng = random.Random(seed)
+    width = rng.randrange(1, 70)
+    height = rng.randrange(1, 40)
+    offset = rng.randrange(8)
+    stride = (width + 7) // 8 + rng.randrange(3)
+    invert = rng.random() < 0.5
+    data = random_rows(rng, width, height, stride)
+
+    out = st7565.transpose.pack_rows(data, width, height, offset=offset,
+                                     stride=stride, invert=invert)
+
+    npages = (offset + height + 7) // 8
+    expected = st7565.bitmap.Bitmap(npages, width)
+    for y in range(height):
+        for x in range(width):
+            if row_bit(data, stride, x, y) != invert:
+                expected.set_pixel(x, y + offset)
+
+    assert bytes(out) == bytes(expected)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_draw_rows(seed, monkeypatch):
+    monkeypatch.setattr(st7565.bitmap, 'numpy', None)
+    bitmap, args = draw_rows_case(seed)
+    expected = draw_rows_reference(bitmap, *args)
+    bitmap._draw_rows(*args)
+    assert bitmap == expected
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_drawbitmap_numpy_matches_transpose(seed, monkeypatch):
+    pytest.importorskip('numpy')
+    rng = random.Random(seed)
+    img = random_image(rng, rng.randrange(1, 129), rng.randrange(1, 65))
+    bitmap = random_bitmap(rng)
+
+    fast = bitmap.copy()
+    fast.drawbitmap(img, centerx=True, centery=True)
+    monkeypatch.setattr(st7565.bitmap, 'numpy', None)
+    slow = bitmap.copy()
+    slow.drawbitmap(img, centerx=True, centery=True)
+    assert fast == slow
+
+
+@pytest.mark.parametrize('steps', [0, 1, 7, 8, 13, -5, 64, 100])
+def test_vscroll(steps):
+    bitmap = random_bitmap(random.Random(steps))
+    expected = st7565.bitmap.Bitmap()
+    for y in range(64):
+        for x in range(128):
+            if pixel(bitmap, x, y):
+                expected.set_pixel(x, (y + steps) % 64)
+
+    bitmap.vscroll(steps)
+    assert bitmap == expected
+
+
+@pytest.mark.parametrize('steps', [1, 5, -3, 127])
+def test_hscroll(steps):
+    bitmap = random_bitmap(random.Random(steps))
+    expected = st7565.bitmap.Bitmap()
+    for y in range(64):
+        for x in range(128):
+            if pixel(bitmap, x, y):
+                expected.set_pixel((x + steps) % 128, y)
+
+    bitmap.hscroll(steps)
+    assert bitmap == expected
+
+
+@pytest.mark.parametrize('steps', range(8))
+def test_shift_rows_down(steps):
+    rng = random.Random(steps)
+    upper = bytes(bytearray(rng.randrange(256) for i in range(16)))
+    lower = bytes(bytearray(rng.randrange(256) for i in range(16)))
+    out = st7565.bitops.shift_rows_down(upper, lower, steps)
+    for i in range(16):
+        column = (upper[i] << 8 | lower[i]) >> steps
+        assert out[i] == column & 0xff
+
+
+def plot(bitmap, points, pen):
+    '''Reference drawing: each distinct point inside the bitmap, one
+    set_pixel at a time.'''
+    for x, y in set(points):
+        if 0 <= x < bitmap.width and 0 <= y < bitmap.height:
+            bitmap.set_pixel(x, y, pen)
+
+
+def circle_points(cx, cy, r):
+    points = []
+    x, y = r, 0
+    err = 1 - r
+    while x >= y:
+        for px, py in ((x, y), (y, x)):
+            for sx in (1, -1):
+                for sy in (1, -1):
+                    points.append((cx + sx * px, cy + sy * py))
+        y += 1
+        if err < 0:
+            err += 2 * y + 1
+        else:
+            x -= 1
+            err += 2 * (y - x) + 1
+    return points
+
+
+@pytest.mark.parametrize('pen', [SET, CLEAR, XOR])
+def test_fill_rect(pen):
+    rng = random.Random(pen)
+    for i in range(50):
+        bitmap = random_bitmap(rng)
+        x1, x2 = rng.randrange(-10, 140), rng.randrange(-10, 140)
+        y1, y2 = rng.randrange(-10, 74), rng.randrange(-10, 74)
+
+        expected = bitmap.copy()
+        plot(expected, [(x, y)
+                        for x in range(min(x1, x2), max(x1, x2) + 1)
+                        for y in range(min(y1, y2), max(y1, y2) + 1)], pen)
+
+        bitmap.fill_rect(x1, y1, x2, y2, pen)
+        assert bitmap == expected
+
+
+@pytest.mark.parametrize('pen', [SET, CLEAR, XOR])
+def test_box(pen):
+    rng = random.Random(pen)
+    for i in range(50):
+        bitmap = random_bitmap(rng)
+        x1, x2 = sorted((rng.randrange(128), rng.randrange(128)))
+        y1, y2 = sorted((rng.randrange(64), rng.randrange(64)))
+
+        expected = bitmap.copy()
+        plot(expected,
+             [(x, y) for x in range(x1, x2 + 1) for y in (y1, y2)] +
+             [(x, y) for x in (x1, x2) for y in range(y1, y2 + 1)], pen)
+
+        bitmap.box(x1, y1, x2, y2, pen)
+        assert bitmap == expected
+
+
+def test_lines_out_of_bounds():
+    bitmap = st7565.bitmap.Bitmap()
+    with pytest.raises(ValueError):
+        bitmap.hline(120, 0, 10)
+    with pytest.raises(ValueError):
+        bitmap.vline(0, 60, 10)
+    with pytest.raises(ValueError):
+        bitmap.box(-1, 0, 10, 10)
+    assert bitmap == st7565.bitmap.Bitmap()
+
+
+@pytest.mark.parametrize('pen', [SET, CLEAR, XOR])
+def test_hline_vline(pen):
+    rng = random.Random(pen)
+    for i in range(50):
+        bitmap = random_bitmap(rng)
+        x, y = rng.randrange(128), rng.randrange(64)
+        hlen = rng.randrange(1, 129 - x)
+        vlen = rng.randrange(1, 65 - y)
+
+        expected = bitmap.copy()
+        plot(expected, [(x + i, y) for i in range(hlen)], pen)
+        bitmap.hline(x, y, hlen, pen)
+        assert bitmap == expected
+
+        plot(expected, [(x, y + i) for i in range(vlen)], pen)
+        bitmap.vline(x, y, vlen, pen)
+        assert bitmap == expected
+
+
+def set_pixels(bitmap):
+    return set((x, y) for y in range(bitmap.height)
+               for x in range(bitmap.width) if pixel(bitmap, x, y))
+
+
+def check_line(points, x1, y1, x2, y2, width=128, height=64):
+    '''Check that `points` (the visible part of a line) has one pixel
+    for each step along the major axis, within half a pixel of the
+    ideal line.'''
+    if abs(x2 - x1) < abs(y2 - y1):
+        # Check steep lines with the axes swapped.
+        points = set((y, x) for x, y in points)
+        x1, y1, x2, y2 = y1, x1, y2, x2
+        width, height = height, width
+
+    lo, hi = min(x1, x2), max(x1, x2)
+    for x, y in points:
+        assert lo <= x <= hi
+
+    for x in range(max(lo, 0), min(hi, width - 1) + 1):
+        if x1 == x2:
+            ideal = [y1 + i for i in range(min(y2 - y1, 0),
+                                           max(y2 - y1, 0) + 1)]
+        else:
+            exact = y1 + (x - x1) * float(y2 - y1) / (x2 - x1)
+            ideal = [y for y in (int(exact) - 1, int(exact), int(exact) + 1)
+                     if abs(y - exact) <= 0.5]
+        visible = [y for y in ideal if 0 <= y < height]
+        drawn = [y for (px, y) in points if px == x]
+        assert set(drawn) <= set(visible)
+        if x1 == x2:
+            assert sorted(drawn) == visible
+        elif len(visible) == len(ideal):
+            assert len(drawn) == 1
+        else:
+            assert len(drawn) <= 1
+
+
+@pytest.mark.parametrize('pen', [SET, CLEAR, XOR])
+def test_line(pen):
+    rng = random.Random(pen)
+    for i in range(100):
+        x1, y1 = rng.randrange(-20, 148), rng.randrange(-20, 84)
+        x2, y2 = rng.randrange(-20, 148), rng.randrange(-20, 84)
+
+        blank = st7565.bitmap.Bitmap()
+        blank.line(x1, y1, x2, y2)
+        points = set_pixels(blank)
+        check_line(points, x1, y1, x2, y2)
+
+        bitmap = random_bitmap(rng)
+        expected = bitmap.copy()
+        plot(expected, points, pen)
+        bitmap.line(x1, y1, x2, y2, pen)
+        assert bitmap == expected
+
+
+@pytest.mark.parametrize('pen', [SET, CLEAR, XOR])
+def test_circle(pen):
+    rng = random.Random(pen)
+    for i in range(50):
+        bitmap = random_bitmap(rng)
+        cx, cy = rng.randrange(-10, 138), rng.randrange(-10, 74)
+        r = rng.randrange(0, 40)
+
+        expected = bitmap.copy()
+        plot(expected, circle_points(cx, cy, r), pen)
+
+        bitmap.circle(cx, cy, r, pen)
+        assert bitmap == expected
+
+
+@pytest.mark.parametrize('pen', [SET, CLEAR, XOR])
+def test_fill_circle(pen):
+    rng = random.Random(pen)
+    for i in range(50):
+        bitmap = random_bitmap(rng)
+        cx, cy = rng.randrange(-10, 138), rng.randrange(-10, 74)
+        r = rng.randrange(0, 40)
+
+        # Fill each column between the top and bottom of the outline.
+        spans = {}
+        for x, y in circle_points(cx, cy, r):
+            top, bottom = spans.get(x, (y, y))
+            spans[x] = (min(top, y), max(bottom, y))
+
+        expected = bitmap.copy()
+        plot(expected, [(x, y) for x, (top, bottom) in spans.items()
+                        for y in range(top, bottom + 1)], pen)
+
+        bitmap.fill_circle(cx, cy, r, pen)
+        assert bitmap == expected
+
+
+def blit_reference(dst, src, x, y, op, mask=None):
+    out = dst.copy()
+    for sy in range(src.height):
+        for sx in range(src.width):
+            dx, dy = x + sx, y + sy
+            if not (0 <= dx < dst.width and 0 <= dy < dst.height):
+                continue
+            if mask is not None and not pixel(mask, sx, sy):
+                continue
+
+            s = pixel(src, sx, sy)
+            d = pixel(out, dx, dy)
+            if op == OR:
+                d = d or s
+            elif op == XOR:
+                d = d != s
+            elif op == CLEAR:
+                d = d and not s
+            elif op == AND:
+                d = d and s
+            elif op == COPY:
+                d = s
+            out.set_pixel(dx, dy, SET if d else CLEAR)
+    return out
+
+
+@pytest.mark.parametrize('op', [OR, XOR, CLEAR, AND, COPY])
+@pytest.mark.parametrize('masked', [False, True])
+def test_blit(op, masked):
+    rng = random.Random(op * 2 + masked)
+    for i in range(40):
+        dst = random_bitmap(rng)
+        src = random_bitmap(rng, rng.randrange(1, 4), rng.randrange(1, 40))
+        mask = (random_bitmap(rng, src.pages, src.columns) if masked
+                else None)
+        x = rng.randrange(-src.width - 2, dst.width + 2)
+        y = rng.randrange(-src.height - 2, dst.height + 2)
+
+        expected = blit_reference(dst, src, x, y, op, mask)
+        dst.blit(src, x, y, op, mask)
+        assert dst == expected
+
+
+def test_sprite_blit():
+    rng = random.Random(1)
+    image = random_bitmap(rng, 2, 12)
+    mask = random_bitmap(rng, 2, 12)
+    sprite = st7565.sprite.Sprite(image, mask)
+
+    for i in range(40):
+        dst = random_bitmap(rng)
+        x, y = rng.randrange(-12, 128), rng.randrange(-16, 64)
+        expected = blit_reference(dst, image, x, y, COPY, mask)
+        sprite.draw(dst, x, y, COPY)
+        assert dst == expected
+
+
+def test_shifted():
+    rng = random.Random(2)
+    bitmap = random_bitmap(rng, 2, 10)
+    for shift in range(8):
+        rows = bitmap.shifted(shift)
+        shifted = st7565.bitmap.Bitmap(3, 10)
+        shifted[:] = b''.join(rows)
+
+        expected = st7565.bitmap.Bitmap(3, 10)
+        for y in range(bitmap.height):
+            for x in range(bitmap.width):
+                if pixel(bitmap, x, y):
+                    expected.set_pixel(x, y + shift)
+        assert shifted == expected
@@ -0,0 +1,94 @@
+import random
+
+import pytest
+
+import st7565.dither
+
+
+def gray_image(rng, width, height):
+    return bytes(bytearray(rng.randrange(256)
+                           for i in range(width * height)))
+
+
+def unpack(data, width, height):
+    '''Return the packed rows as a list of rows of 0/1 values.'''
+    stride = (width + 7) // 8
+    assert len(data) == stride * height
+    data = bytearray(data)
+    return [[(data[y * stride + x // 8] >> (7 - x % 8)) & 1
+             for x in range(width)] for y in range(height)]
+
+
+def diffuse_reference(data, width, height, kernel, divisor):
+    errors = [[0] * width for y in range(height)]
+    out = []
+    for y in range(height):
+        row = []
+        for x in range(width):
+            v = data[y * width + x] + (errors[y][x] + divisor // 2) // divisor
+            on = v < st7565.dither.THRESHOLD
+            row.append(int(on))
+            err = v if on else v - 255
+            for dx, dy, w in kernel:
+                if 0 <= x + dx < width and y + dy < height:
+                    errors[y + dy][x + dx] += err * w
+        out.append(row)
+    return out
+
+
+@pytest.mark.parametrize('size', [(1, 1), (7, 3), (8, 8), (13, 5), (40, 9)])
+def test_threshold(size):
+    width, height = size
+    data = gray_image(random.Random(width), width, height)
+    rows = unpack(st7565.dither.dither_gray(data, width, height,
+                                            'threshold'), width, height)
+    assert rows == [[int(data[y * width + x] < 128) for x in range(width)]
+                    for y in range(height)]
+
+
+@pytest.mark.parametrize('n', [2, 4, 8])
+def test_bayer(n):
+    width, height = 37, 11
+    matrix = st7565.dither.bayer_matrix(n)
+    assert sorted(v for row in matrix for v in row) == sorted(
+        set(v for row in matrix for v in row))
+
+    data = gray_image(random.Random(n), width, height)
+    rows = unpack(st7565.dither.dither_gray(data, width, height, 'bayer',
+                                            size=n), width, height)
+    assert rows == [[int(data[y * width + x] < matrix[y % n][x % n])
+                     for x in range(width)] for y in range(height)]
+
+
+@pytest.mark.parametrize('method', sorted(st7565.dither.KERNELS))
+@pytest.mark.parametrize('size', [(1, 1), (9, 4), (33, 12)])
+def test_diffuse(method, size):
+    width, height = size
+    kernel, divisor = st7565.dither.KERNELS[method]
+    data = gray_image(random.Random(width), width, height)
+    rows = unpack(st7565.dither.dither_gray(data, width, height, method),
+                  width, height)
+    assert rows == diffuse_reference(data, width, height, kernel, divisor)
+
+
+@pytest.mark.parametrize('method', st7565.dither.METHODS)
+def test_tones(method):
+    width, height = 32, 32
+    for gray, lo, hi in ((0, 1.0, 1.0), (255, 0.0, 0.0), (128, 0.4, 0.6)):
+        data = bytes(bytearray([gray] * (width * height)))
+        rows = unpack(st7565.dither.dither_gray(data, width, height, method),
+                      width, height)
+        dark = sum(map(sum, rows)) / float(width * height)
+        if method == 'threshold' and gray == 128:
+            assert dark == 0.0
+        else:
+            assert lo <= dark <= hi
+
+
+def test_errors():
+    with pytest.raises(ValueError):
+        st7565.dither.dither_gray(b'\0' * 4, 2, 2, 'nonesuch')
+    with pytest.raises(ValueError):
+        st7565.dither.dither_gray(b'\0' * 3, 2, 2, 'bayer')
+    with pytest.raises(ValueError):
+        st7565.dither.bayer_matrix(3)
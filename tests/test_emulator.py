@@ -0,0 +1,140 @@
+import random
+
+import pytest
+
+import st7565.bitmap
+import st7565.emulator
+import st7565.ops as ops
+
+from tests.helpers import make_lcd, scribble
+
+
+def test_init_clears_display():
+    lcd, emu = make_lcd(init=True)
+    assert emu.display_on
+    assert not emu.com_reverse and not emu.adc_reverse
+    assert emu.frame() == st7565.bitmap.Bitmap()
+
+
+@pytest.mark.parametrize('adafruit', [False, True])
+def test_frame_matches_buffer(adafruit):
+    lcd, emu = make_lcd(adafruit=adafruit)
+    rng = random.Random(5)
+    screen = st7565.bitmap.Bitmap()
+    for i in range(3):
+        scribble(screen, rng)
+        lcd.write_buffer(screen)
+        assert emu.frame() == screen
+
+
+def test_adafruit_ram_layout():
+    lcd, emu = make_lcd(adafruit=True)
+    screen = st7565.bitmap.Bitmap()
+    screen.set_pixel(0, 0)
+    lcd.write_buffer(screen)
+
+    # Page 0 of the panel is page 3 of display RAM, one column in.
+    assert emu.ram[3 * st7565.emulator.RAM_COLUMNS + 1] == 0x80
+    assert sum(emu.ram) == 0x80
+
+
+def test_lines_are_numbered_d0_first():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.DISPLAY_ON])
+    emu.write_data([0x01])
+
+    # Display line 0 is D0 of page 0, which the panel shows as the
+    # bottom row of the first page.
+    assert emu.line(emu.com(7)) == 0
+    assert [y for y in range(64) if emu.pixel(0, y)] == [7]
+
+    # With a start line of 1, COM 0 shows line 1 and line 0 wraps
+    # round to the last COM output, the top row of the last page.
+    emu.write_command([ops.DISPLAY_START_LINE_SET | 1])
+    assert emu.line(emu.com(56)) == 0
+    assert [y for y in range(64) if emu.pixel(0, y)] == [56]
+
+
+def test_start_line_wraps():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.DISPLAY_ON, ops.DISPLAY_START_LINE_SET | 8])
+    emu.write_data([0x80])
+
+    # Line 7 (D7 of page 0) is now shown by the last page.
+    assert emu.pixel(0, 56)
+    assert [y for y in range(64) if emu.pixel(0, y)] == [56]
+
+
+def test_common_output_mode_reverse():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.DISPLAY_ON, ops.COMMON_OUTPUT_MODE_SELECT | 8])
+    emu.write_data([0x01])
+    assert emu.line(emu.com(56)) == 0
+    assert [y for y in range(64) if emu.pixel(0, y)] == [56]
+
+
+def test_adc_reverse():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.DISPLAY_ON, ops.ADC_SELECT | 1])
+    emu.column = st7565.emulator.RAM_COLUMNS - 1
+    emu.write_data([0x80])
+    assert emu.pixel(0, 0)
+
+
+def test_display_modes():
+    lcd, emu = make_lcd()
+    screen = st7565.bitmap.Bitmap()
+    screen.set_pixel(3, 4)
+    lcd.write_buffer(screen)
+
+    lcd.display_reverse()
+    assert not emu.pixel(3, 4) and emu.pixel(0, 0)
+    lcd.display_normal()
+
+    lcd.display_points_on()
+    assert emu.pixel(0, 0)
+    lcd.display_points_normal()
+
+    lcd.display_off()
+    assert not emu.pixel(3, 4)
+
+
+def test_data_address():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.PAGE_SET | 2, ops.COLUMN_SET_MSB | 8,
+                       ops.COLUMN_SET_LSB | 2])
+    assert emu.column == 130
+
+    # The column address stops at the last column.
+    emu.write_data([1, 2, 3, 4])
+    assert emu.column == st7565.emulator.RAM_COLUMNS - 1
+    start = 2 * st7565.emulator.RAM_COLUMNS + 130
+    assert emu.ram[start:start + 2] == bytearray([1, 2])
+    assert emu.data_bytes == 4
+
+
+def test_read_modify_write():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.COLUMN_SET_LSB | 5, ops.RMW])
+    emu.write_data([1, 2, 3])
+    emu.write_command([st7565.emulator.RMW_END])
+    assert emu.column == 5
+
+
+def test_two_byte_commands():
+    emu = st7565.emulator.Emulator()
+    emu.write_command([ops.BRIGHTNESS_SET, 0x11, ops.BOOSTER_RATIO_SET, 1])
+    assert emu.brightness == 0x11
+    assert emu.booster_ratio == 1
+    assert emu.command_bytes == 4
+    assert emu.unknown == 0
+
+
+def test_hardware_reset():
+    lcd, emu = make_lcd()
+    lcd.display_start_line_set(5)
+    assert emu.start_line == 5
+
+    lcd.reset()
+    assert emu.start_line == 0
+    assert not emu.display_on
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+import st7565.fileutil
+
+
+def test_atomic_write(tmp_path):
+    path = str(tmp_path / 'out')
+    with st7565.fileutil.atomic_write(path) as out:
+        out.write(b'new')
+        assert not os.path.exists(path)
+    with open(path, 'rb') as fd:
+        assert fd.read() == b'new'
+
+    with st7565.fileutil.atomic_write(path, 'w') as out:
+        out.write('text')
+    with open(path) as fd:
+        assert fd.read() == 'text'
+
+
+def test_atomic_write_error(tmp_path):
+    path = str(tmp_path / 'out')
+    with open(path, 'w') as fd:
+        fd.write('old')
+
+    with pytest.raises(KeyError):
+        with st7565.fileutil.atomic_write(path, 'w') as out:
+            out.write('new')
+            raise KeyError()
+
+    with open(path) as fd:
+        assert fd.read() == 'old'
+    assert os.listdir(str(tmp_path)) == ['out']
+
+
+def test_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert st7565.fileutil.cache_dir('x') == str(tmp_path / 'st7565' / 'x')
+
+    monkeypatch.delenv('XDG_CACHE_HOME')
+    monkeypatch.setenv('HOME', str(tmp_path))
+    assert st7565.fileutil.cache_dir('x') == str(
+        tmp_path / '.cache' / 'st7565' / 'x')
@@ -0,0 +1,164 @@
+import io
+import os
+
+import pytest
+
+import st7565.bitmap
+import st7565.fonts
+import st7565.fonts.atlas as atlas
+import st7565.fonts.font5x7 as font5x7
+import st7565.text
+
+from tests.helpers import make_lcd
+
+# A two-page font: 'A' is 4 columns wide and spans all 12 rows, 'B' is
+# missing and 'C' has a 2x2 bitmap offset into a 3-column cell.
+BDF = b'''STARTFONT 2.1
+FONT -test-tiny
+SIZE 12 75 75
+FONTBOUNDINGBOX 4 12 0 -2
+STARTPROPERTIES 2
+FONT_ASCENT 10
+FONT_DESCENT 2
+ENDPROPERTIES
+CHARS 2
+STARTCHAR A
+ENCODING 65
+DWIDTH 4 0
+BBX 4 12 0 -2
+BITMAP
+F0
+80
+80
+80
+80
+80
+80
+80
+80
+80
+80
+90
+ENDCHAR
+STARTCHAR C
+ENCODING 67
+DWIDTH 3 0
+BBX 2 2 1 0
+BITMAP
+C0
+40
+ENDCHAR
+ENDFONT
+'''
+
+GLYPH_A = bytes(bytearray([0xff, 0x80, 0x80, 0x80,
+                           0xf0, 0x00, 0x00, 0x10]))
+GLYPH_C = bytes(bytearray([0x00, 0x00, 0x00,
+                           0x00, 0x80, 0xc0]))
+
+
+@pytest.fixture
+def bdf(tmp_path):
+    path = tmp_path / 'tiny.bdf'
+    path.write_bytes(BDF)
+    return str(path)
+
+
+def test_read_bdf():
+    font = atlas.read_bdf(io.BytesIO(BDF))
+    assert font.pages == 2
+    assert font.ascent == 10
+    assert font.glyph('A') == GLYPH_A
+    assert font.glyph('C') == GLYPH_C
+    assert font.glyph('B') is None
+
+
+def test_compile(bdf, tmp_path):
+    dst = str(tmp_path / 'tiny.stf')
+    st7565.fonts.compile(bdf, dst)
+
+    with atlas.Atlas(dst) as font:
+        assert font.pages == 2
+        assert font.ascent == 10
+        assert font.glyph('A') == GLYPH_A
+        assert font.glyph('C') == GLYPH_C
+        assert font.glyph('B') is None
+        assert font.glyph('@') is None
+        assert font.glyph('D') is None
+
+
+def test_module_atlas(tmp_path):
+    dst = str(tmp_path / '5x7.stf')
+    with open(dst, 'wb') as out:
+        atlas.write_atlas(out, atlas.read_module(font5x7))
+
+    module = st7565.fonts.ModuleFont(font5x7)
+    with atlas.Atlas(dst) as font:
+        for c in 'Hello, world!':
+            assert font.glyph(c) == module.glyph(c)
+
+
+def test_not_an_atlas(tmp_path):
+    path = tmp_path / 'junk.stf'
+    path.write_bytes(b'ST7565FX' + b'\0' * 32)
+    with pytest.raises(ValueError):
+        atlas.Atlas(str(path))
+
+
+def test_load_caches_by_content(bdf, tmp_path, monkeypatch):
+    cache = str(tmp_path / 'cache')
+    font = st7565.fonts.load(bdf, cache_dir=cache)
+    assert font.glyph('A') == GLYPH_A
+    names = os.listdir(cache)
+    assert len(names) == 1 and names[0].endswith(st7565.fonts.SUFFIX)
+
+    # The same content is not compiled again, wherever it lives.
+    copy = tmp_path / 'copy.bdf'
+    copy.write_bytes(BDF)
+
+    def fail(src, dst):
+        raise AssertionError('compiled again')
+
+    monkeypatch.setattr(st7565.fonts, 'compile', fail)
+    assert st7565.fonts.load(str(copy), cache_dir=cache).glyph('C') == (
+        GLYPH_C)
+    monkeypatch.undo()
+
+    # Different content gets its own entry.
+    copy.write_bytes(BDF.replace(b'90\n', b'80\n'))
+    st7565.fonts.load(str(copy), cache_dir=cache)
+    assert len(os.listdir(cache)) == 2
+
+
+def test_load_atlas(bdf, tmp_path):
+    dst = str(tmp_path / 'tiny.stf')
+    st7565.fonts.compile(bdf, dst)
+    cache = str(tmp_path / 'cache')
+    font = st7565.fonts.load(dst, cache_dir=cache)
+    assert font.path == dst
+    assert not os.path.exists(cache)
+
+
+def test_puts_at_multi_page(bdf, tmp_path):
+    font = st7565.fonts.load(bdf, cache_dir=str(tmp_path))
+    lcd, emu = make_lcd(font=font)
+    lcd.puts_at(2, 10, 'AC')
+
+    expected = st7565.bitmap.Bitmap()
+    expected[2 * 128 + 10:2 * 128 + 17] = GLYPH_A[:4] + GLYPH_C[:3]
+    expected[3 * 128 + 10:3 * 128 + 17] = GLYPH_A[4:] + GLYPH_C[3:]
+    assert emu.frame() == expected
+
+
+def test_draw_multi_page_unaligned(bdf, tmp_path):
+    font = st7565.fonts.load(bdf, cache_dir=str(tmp_path))
+    renderer = st7565.text.TextRenderer(font)
+
+    aligned = st7565.bitmap.Bitmap()
+    aligned.puts(5, 16, 'ACA', renderer=renderer)
+    for shift in range(1, 8):
+        bitmap = st7565.bitmap.Bitmap()
+        bitmap.puts(5, 16 + shift, 'ACA', renderer=renderer)
+        expected = aligned.copy()
+        expected.vscroll(shift)
+        assert bitmap == expected
@@ -0,0 +1,124 @@
+import os
+
+import pytest
+
+import st7565.framecache
+
+HEADER = st7565.framecache.HEADER.size
+
+
+def frames(count, size=16, seed=0):
+    return [bytes(bytearray((seed + i + j) & 0xff for j in range(size)))
+            for i in range(count)]
+
+
+def set_mtime(cache, key, mtime):
+    os.utime(cache.path_for(key), (mtime, mtime))
+
+
+def test_round_trip(tmp_path):
+    cache = st7565.framecache.FrameCache(str(tmp_path / 'frames'))
+    assert cache.get('missing') is None
+
+    stored = frames(5)
+    cache.put('key', stored)
+    with cache.get('key') as loaded:
+        assert len(loaded) == 5
+        assert isinstance(loaded[0], memoryview)
+        assert [bytes(frame) for frame in loaded] == stored
+
+    assert os.path.getsize(cache.path_for('key')) == HEADER + 5 * 16
+    assert os.listdir(cache.path) == ['key' + st7565.framecache.SUFFIX]
+
+
+def test_put_checks_frame_sizes(tmp_path):
+    cache = st7565.framecache.FrameCache(str(tmp_path))
+    with pytest.raises(ValueError):
+        cache.put('key', [b'\0' * 16, b'\0' * 15])
+    assert os.listdir(str(tmp_path)) == []
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: b'NOTCACHE' + data[8:],
+    lambda data: data[:8] + b'\x63\x00' + data[10:],
+    lambda data: data[:-1],
+    lambda data: data + b'\0',
+    lambda data: data[:HEADER - 1],
+    lambda data: b'',
+])
+def test_invalid_entries_are_removed(tmp_path, damage):
+    cache = st7565.framecache.FrameCache(str(tmp_path))
+    cache.put('key', frames(3))
+    path = cache.path_for('key')
+    with open(path, 'rb') as fd:
+        data = fd.read()
+    with open(path, 'wb') as fd:
+        fd.write(damage(data))
+
+    assert cache.get('key') is None
+    assert not os.path.exists(path)
+
+
+def test_eviction_by_mtime(tmp_path):
+    entry = HEADER + 4 * 16
+    cache = st7565.framecache.FrameCache(str(tmp_path), max_size=3 * entry)
+    for i, key in enumerate('abc'):
+        cache.put(key, frames(4, seed=i))
+        set_mtime(cache, key, 1000 + i)
+    assert [os.path.basename(path) for mtime, size, path
+            in cache.entries()] == ['a.frames', 'b.frames', 'c.frames']
+
+    # Over the limit: the least recently used entry goes.
+    cache.put('d', frames(4))
+    assert cache.get('a') is None
+    assert sum(size for mtime, size, path in cache.entries()) == 3 * entry
+
+
+def test_get_refreshes_mtime(tmp_path):
+    entry = HEADER + 4 * 16
+    cache = st7565.framecache.FrameCache(str(tmp_path), max_size=2 * entry)
+    cache.put('a', frames(4))
+    cache.put('b', frames(4))
+    set_mtime(cache, 'a', 1000)
+    set_mtime(cache, 'b', 2000)
+
+    cache.get('a').close()
+    assert os.path.getmtime(cache.path_for('a')) > 2000
+
+    cache.put('c', frames(4))
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+
+
+def test_new_entry_is_kept(tmp_path):
+    cache = st7565.framecache.FrameCache(str(tmp_path), max_size=10)
+    cache.put('big', frames(4))
+    assert cache.get('big') is not None
+
+
+def test_clear(tmp_path):
+    cache = st7565.framecache.FrameCache(str(tmp_path))
+    cache.put('a', frames(1))
+    cache.put('b', frames(1))
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_default_cache_dir(monkeypatch, tmp_path):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path))
+    assert st7565.framecache.default_cache_dir() == str(
+        tmp_path / 'st7565' / 'frames')
+
+
+def test_cache_key():
+    Image = pytest.importorskip('PIL.Image')
+    img = Image.new('1', (8, 8))
+    key = st7565.framecache.cache_key(img, animation='spin', step=10)
+    assert key == st7565.framecache.cache_key(img, step=10,
+                                              animation='spin')
+    assert key != st7565.framecache.cache_key(img, animation='spin',
+                                              step=5)
+
+    img.putpixel((0, 0), 1)
+    assert key != st7565.framecache.cache_key(img, animation='spin',
+                                              step=10)
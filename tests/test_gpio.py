@@ -0,0 +1,82 @@
+import mmap
+import struct
+
+import pytest
+
+import st7565.emulator
+import st7565.gpio
+import st7565.lcd
+import st7565.metrics
+
+
+def make_lcd(gpio):
+    emu = st7565.emulator.Emulator()
+    lcd = st7565.lcd.LCD(spi=emu, gpio=gpio, init=False,
+                         metrics=st7565.metrics.Metrics(enabled=False))
+    return lcd, emu
+
+
+def test_a0_is_cached():
+    gpio = st7565.gpio.FakeGPIO()
+    lcd, emu = make_lcd(gpio)
+    outputs = gpio.outputs
+    lcd.send_data([1])
+    lcd.send_data([2])
+    assert gpio.outputs == outputs
+    lcd.send_command([0xe3])
+    lcd.send_command([0xe3])
+    assert gpio.outputs == outputs + 1
+    assert gpio.levels[lcd.pin_a0] == 0
+
+
+def test_a0_is_set_again_after_failed_flush():
+    gpio = st7565.gpio.FakeGPIO()
+    lcd, emu = make_lcd(gpio)
+    lcd.send_command([0xe3])
+
+    def fail(data):
+        raise IOError('write failed')
+
+    emu.write = fail
+    with pytest.raises(IOError):
+        with lcd.transaction():
+            lcd.send_data([1])
+    assert lcd.a0 is None
+
+    del emu.write
+    outputs = gpio.outputs
+    lcd.send_data([1])
+    assert gpio.outputs == outputs + 1
+    assert gpio.levels[lcd.pin_a0] == 1
+
+
+def test_open_backend():
+    lcd, emu = make_lcd('fake')
+    assert isinstance(lcd.gpio, st7565.gpio.FakeGPIO)
+    assert lcd.gpio.levels[lcd.pin_rst] == 1
+
+    with pytest.raises(ValueError):
+        st7565.gpio.open_backend('nonesuch')
+
+
+def test_mem_gpio(tmp_path):
+    path = tmp_path / 'gpiomem'
+    path.write_bytes(b'\xff' * mmap.PAGESIZE)
+
+    def word(index):
+        return struct.unpack_from('I', path.read_bytes(), index * 4)[0]
+
+    gpio = st7565.gpio.MemGPIO(str(path))
+    try:
+        gpio.setup(24)
+        # Pin 24 is an output: GPFSEL2 bits 12-14 are 001.
+        assert word(st7565.gpio.GPFSEL0 + 2) >> 12 & 7 == 1
+        assert word(st7565.gpio.GPFSEL0 + 2) & 0xfff == 0xfff
+        assert word(st7565.gpio.GPCLR0) == 1 << 24
+
+        gpio.output(24, True)
+        assert word(st7565.gpio.GPSET0) == 1 << 24
+        gpio.output(35, False)
+        assert word(st7565.gpio.GPCLR0 + 1) == 1 << 3
+    finally:
+        gpio.close()
@@ -0,0 +1,207 @@
+import pytest
+
+import st7565.bitmap
+import st7565.emulator
+import st7565.grayscale
+import st7565.lcd
+import st7565.metrics
+
+
+class FakeClock (object):
+    '''A clock that only moves when something sleeps or writes, and by
+    a nanosecond each time it is read so that spinning terminates.'''
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        self.now += 1e-9
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class SlowEmulator (st7565.emulator.Emulator):
+    '''An emulator whose data writes take `per_byte` seconds a byte on
+    `clock`, plus `extra` seconds for the next write.'''
+
+    def __init__(self, clock, per_byte=1e-5):
+        st7565.emulator.Emulator.__init__(self)
+        self.clock = clock
+        self.per_byte = per_byte
+        self.extra = 0
+
+    def write_data(self, bytes):
+        st7565.emulator.Emulator.write_data(self, bytes)
+        self.clock.now += len(bytes) * self.per_byte + self.extra
+        self.extra = 0
+
+
+def make_gray(bits=2, rate=None, **kwargs):
+    clock = FakeClock()
+    emu = SlowEmulator(clock)
+    lcd = st7565.lcd.LCD(spi=emu, gpio=emu, init=False,
+                         metrics=st7565.metrics.Metrics(enabled=False))
+    lcd.display_on()
+    gray = st7565.grayscale.GrayscaleDisplay(lcd, bits, rate=rate, spin=0,
+                                             clock=clock, sleep=clock.sleep,
+                                             **kwargs)
+    return gray, lcd, emu, clock
+
+
+def record(gray, emu, clock):
+    '''Make `gray` record `(time, frame)` after each slot's write.'''
+    shown = []
+    write_buffer = gray.lcd.write_buffer
+
+    def wrapper(buffer, force=False):
+        write_buffer(buffer, force)
+        if not force:
+            shown.append((clock.now, emu.frame()))
+
+    gray.lcd.write_buffer = wrapper
+    return shown
+
+
+def pixel(bitmap, x, y):
+    return bool(bitmap[(y // 8) * bitmap.columns + x] & (0x80 >> (y % 8)))
+
+
+# The width of each level's band of columns in `ramp`.
+BAND = 6
+
+
+def ramp(bits):
+    '''Return a 16-row image with one band of columns per level.'''
+    width = BAND << bits
+    return bytes(bytearray(x // BAND for x in range(width)) * 16), width
+
+
+@pytest.mark.parametrize('bits', [2, 4])
+def test_schedule(bits):
+    order = st7565.grayscale.schedule(bits)
+    assert len(order) == (1 << bits) - 1
+    for k in range(bits):
+        slots = [i for i, plane in enumerate(order) if plane == k]
+        assert len(slots) == 1 << k
+        # Evenly spaced: the gaps between a plane's slots are all equal.
+        gaps = set(b - a for a, b in zip(slots, slots[1:]))
+        assert len(gaps) <= 1
+
+
+def test_levels_table():
+    assert st7565.grayscale.levels_table(2)[255] == 0
+    assert st7565.grayscale.levels_table(2)[0] == 3
+    assert st7565.grayscale.levels_table(4)[0] == 15
+
+
+@pytest.mark.parametrize('bits', [2, 4])
+def test_planes(bits):
+    levels, width = ramp(bits)
+    planes = st7565.grayscale.planes(levels, width, 16, bits, tx=3, ty=5)
+    assert len(planes) == bits
+    for k, plane in enumerate(planes):
+        for x in range(width):
+            on = (x // BAND) >> k & 1
+            assert pixel(plane, x + 3, 5) == bool(on)
+            assert pixel(plane, x + 3, 20) == bool(on)
+        assert not pixel(plane, 0, 0)
+
+
+@pytest.mark.parametrize('bits', [2, 4])
+def test_plane_weights(bits):
+    gray, lcd, emu, clock = make_gray(bits, rate=1000)
+    levels, width = ramp(bits)
+    gray.show_levels(levels, width, 16)
+    shown = record(gray, emu, clock)
+
+    gray.cycle()
+    gray.cycle()
+    planes = gray._planes
+    frames = [frame for t, frame in shown]
+    expected = [planes[k] for k in st7565.grayscale.schedule(bits)] * 2
+    assert frames == expected
+
+    # Each level is shown for as many slots as it is dark.
+    for level in range(1 << bits):
+        count = sum(pixel(frame, level * BAND, 0)
+                    for frame in frames[:len(gray.schedule)])
+        assert count == level
+
+
+def test_slots_are_paced_to_rate():
+    gray, lcd, emu, clock = make_gray(2, rate=50)
+    levels, width = ramp(2)
+    gray.show_levels(levels, width, 16)
+
+    starts = []
+    write_buffer = lcd.write_buffer
+
+    def wrapper(buffer, force=False):
+        starts.append(clock.now)
+        write_buffer(buffer, force)
+
+    lcd.write_buffer = wrapper
+    for i in range(4):
+        gray.cycle()
+
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert gaps == pytest.approx([0.02] * len(gaps), abs=1e-6)
+    assert gray.late == 0
+    assert gray.stats()['refresh_rate'] == pytest.approx(50 / 3.0)
+
+
+def test_auto_period_recovers_from_a_slow_write():
+    gray, lcd, emu, clock = make_gray(2, window=6)
+    levels, width = ramp(2)
+    gray.show_levels(levels, width, 16)
+
+    gray.cycle()
+    full = gray.period
+    # Calibration forces full writes, which are slower than the
+    # changes between planes.
+    assert full == pytest.approx(1024 * emu.per_byte, rel=0.01)
+
+    for i in range(2):
+        gray.cycle()
+    normal = gray.period
+    assert normal < full
+
+    emu.extra = 0.05
+    gray.cycle()
+    assert gray.period > 0.05
+
+    # Once the slow write drops out of the window, the slots shrink
+    # back.
+    for i in range(2):
+        gray.cycle()
+    assert gray.period == pytest.approx(normal)
+
+
+def test_auto_slots_are_equal():
+    gray, lcd, emu, clock = make_gray(2, window=3)
+    levels, width = ramp(2)
+    gray.show_levels(levels, width, 16)
+    for i in range(3):
+        gray.cycle()
+
+    starts = []
+    write_buffer = lcd.write_buffer
+
+    def wrapper(buffer, force=False):
+        starts.append(clock.now)
+        write_buffer(buffer, force)
+
+    lcd.write_buffer = wrapper
+    for i in range(3):
+        gray.cycle()
+
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    assert gaps == pytest.approx([gray.period] * len(gaps), abs=1e-6)
+
+
+def test_show_levels_must_fit():
+    gray, lcd, emu, clock = make_gray(2)
+    with pytest.raises(ValueError):
+        gray.show_levels(b'\0' * 4, 2, 2, tx=127)
@@ -0,0 +1,221 @@
+import random
+
+import pytest
+
+import st7565.bitmap
+
+from tests.helpers import make_lcd, scribble
+
+
+def random_screen(seed):
+    screen = st7565.bitmap.Bitmap()
+    scribble(screen, random.Random(seed), 500)
+    return screen
+
+
+def test_write_buffer():
+    lcd, emu = make_lcd()
+    rng = random.Random(1)
+    screen = st7565.bitmap.Bitmap()
+    for i in range(10):
+        scribble(screen, rng)
+        lcd.write_buffer(screen)
+        assert emu.frame() == screen
+
+
+def test_write_buffer_sends_changed_span():
+    lcd, emu = make_lcd()
+    screen = st7565.bitmap.Bitmap()
+    screen.set_pixel(10, 3)
+    screen.set_pixel(20, 5)
+    screen.set_pixel(40, 60)
+
+    sent = emu.data_bytes
+    lcd.write_buffer(screen)
+    # Columns 10-20 of page 0, and column 40 of page 7.
+    assert emu.data_bytes - sent == 11 + 1
+
+    sent = emu.data_bytes
+    lcd.write_buffer(screen)
+    assert emu.data_bytes == sent
+
+
+def test_write_buffer_force():
+    lcd, emu = make_lcd()
+    screen = st7565.bitmap.Bitmap()
+    screen.set_pixel(5, 5)
+    lcd.write_buffer(screen)
+
+    # Change display RAM behind the LCD's back.
+    emu.ram[0] = 0xff
+    lcd.write_buffer(screen)
+    assert emu.frame() != screen
+
+    sent = emu.data_bytes
+    lcd.write_buffer(screen, force=True)
+    assert emu.data_bytes - sent == len(screen)
+    assert emu.frame() == screen
+
+
+def test_invalidate():
+    lcd, emu = make_lcd()
+    screen = st7565.bitmap.Bitmap()
+    lcd.write_buffer(screen)
+    emu.ram[0] = 0xff
+    lcd.invalidate()
+    lcd.write_buffer(screen)
+    assert emu.frame() == screen
+
+
+def test_clear():
+    lcd, emu = make_lcd()
+    screen = st7565.bitmap.Bitmap()
+    scribble(screen, random.Random(4))
+    lcd.write_buffer(screen)
+
+    lcd.clear()
+    blank = st7565.bitmap.Bitmap()
+    assert emu.frame() == blank
+
+    # The shadow copy knows the display is blank.
+    sent = emu.data_bytes
+    lcd.write_buffer(blank)
+    assert emu.data_bytes == sent
+
+
+def test_transaction():
+    lcd, emu = make_lcd()
+    writes = emu.data_bytes
+    with lcd.transaction():
+        lcd.pos(1, 0)
+        lcd.send_data([0xff] * 4)
+        lcd.pos(2, 0)
+        lcd.send_data([0x0f] * 4)
+        with lcd.transaction():
+            lcd.send_data([0xf0])
+        assert emu.data_bytes == writes
+
+    frame = emu.frame()
+    assert bytes(frame[128:132]) == b'\xff' * 4
+    assert bytes(frame[256:261]) == b'\x0f' * 4 + b'\xf0'
+
+
+def test_transaction_merges_runs():
+    lcd, emu = make_lcd()
+    writes = []
+    write = emu.write
+
+    def counting(data):
+        writes.append((emu.a0, bytes(data)))
+        write(data)
+
+    emu.write = counting
+    with lcd.transaction():
+        lcd.pos(1, 0)
+        lcd.send_data([1, 2])
+        lcd.send_data([3])
+        lcd.pos(2, 0)
+        lcd.send_data([4])
+
+    assert [a0 for a0, data in writes] == [0, 1, 0, 1]
+    assert writes[1][1] == b'\x01\x02\x03'
+
+
+def test_transaction_error_writes_nothing():
+    lcd, emu = make_lcd()
+    writes = emu.data_bytes
+    with pytest.raises(KeyError):
+        with lcd.transaction():
+            lcd.send_data([0xff] * 4)
+            raise KeyError()
+
+    assert emu.data_bytes == writes
+    assert lcd.shadow is None
+
+
+def test_failed_flush_resends():
+    lcd, emu = make_lcd()
+    write = emu.write
+    failures = [IOError('write failed')]
+
+    def flaky(data):
+        if failures:
+            raise failures.pop()
+        write(data)
+
+    emu.write = flaky
+    screen = st7565.bitmap.Bitmap()
+    scribble(screen, random.Random(3))
+
+    with pytest.raises(IOError):
+        lcd.write_buffer(screen)
+    lcd.write_buffer(screen)
+    assert emu.frame() == screen
+
+
+@pytest.mark.parametrize('steps', [1, -1, 3, 8, -8, 13, -21, 64])
+def test_vscroll(steps):
+    lcd, emu = make_lcd()
+    screen = random_screen(steps)
+    lcd.write_buffer(screen)
+
+    for i in range(3):
+        screen.vscroll(steps)
+        lcd.vscroll(steps, screen)
+        assert emu.frame() == screen
+        assert emu.start_line % 8 == 0
+
+
+@pytest.mark.parametrize('steps', [1, -5, 8, 19])
+def test_vscroll_without_buffer(steps):
+    lcd, emu = make_lcd()
+    screen = random_screen(steps)
+    lcd.write_buffer(screen)
+
+    for i in range(3):
+        lcd.vscroll(steps)
+        screen.vscroll(steps)
+        assert emu.frame() == screen
+
+
+def test_vscroll_whole_pages_in_hardware():
+    lcd, emu = make_lcd()
+    screen = random_screen(1)
+    lcd.write_buffer(screen)
+
+    sent = emu.data_bytes
+    lcd.vscroll(-16)
+    screen.vscroll(-16)
+    assert emu.data_bytes == sent
+    assert emu.start_line == 16
+    assert emu.frame() == screen
+
+    # A buffer scrolled by whole pages matches display RAM already.
+    screen.vscroll(8)
+    lcd.vscroll(8, screen)
+    assert emu.data_bytes == sent
+    assert emu.frame() == screen
+
+
+def test_vscroll_then_write_buffer():
+    lcd, emu = make_lcd()
+    lcd.write_buffer(random_screen(1))
+    lcd.vscroll(-8)
+
+    screen = random_screen(2)
+    lcd.write_buffer(screen)
+    assert emu.frame() == screen
+
+
+def test_vscroll_unknown_contents():
+    lcd, emu = make_lcd()
+    lcd.invalidate()
+    with pytest.raises(ValueError):
+        lcd.vscroll(1)
+    lcd.vscroll(8)
+
+
+def test_vscroll_with_page_map():
+    lcd, emu = make_lcd(adafruit=True)
+    with pytest.raises(ValueError):
+        lcd.vscroll(8)
@@ -0,0 +1,147 @@
+import io
+import os
+
+import pytest
+
+import st7565.bitmap
+import st7565.metrics
+
+from tests.helpers import make_lcd
+
+
+def test_counters():
+    metrics = st7565.metrics.Metrics()
+    metrics.incr('a')
+    metrics.incr('a', 4)
+    metrics.incr('b')
+    assert metrics.snapshot()['counters'] == {'a': 5, 'b': 1}
+
+
+def test_histogram_buckets():
+    hist = st7565.metrics.Histogram(buckets=(1, 2, 5))
+    for value in (0.5, 1, 1.5, 2, 5, 6, 100):
+        hist.observe(value)
+    # Each bucket counts values up to and including its bound.
+    assert hist.counts == [2, 2, 1, 2]
+    assert hist.count == 7
+    assert hist.sum == pytest.approx(116)
+
+
+def test_snapshot_is_a_copy():
+    metrics = st7565.metrics.Metrics(buckets=(1,))
+    metrics.observe('t', 0.5)
+    snap = metrics.snapshot()
+    metrics.observe('t', 2)
+    metrics.incr('c')
+    assert snap['histograms']['t'] == {
+        'buckets': [1], 'counts': [1, 0], 'count': 1, 'sum': 0.5}
+    assert snap['counters'] == {}
+
+
+def test_reset():
+    metrics = st7565.metrics.Metrics()
+    metrics.incr('a')
+    metrics.observe('t', 0.1)
+    metrics.reset()
+    snap = metrics.snapshot()
+    assert snap['counters'] == {} and snap['histograms'] == {}
+
+
+def test_disabled():
+    metrics = st7565.metrics.Metrics(enabled=False)
+    metrics.incr('a')
+    metrics.observe('t', 0.1)
+    snap = metrics.snapshot()
+    assert snap['counters'] == {} and snap['histograms'] == {}
+
+
+def test_disabled_skips_timing(monkeypatch):
+    def clock():
+        raise AssertionError('timed while disabled')
+
+    monkeypatch.setattr(st7565.metrics, 'clock', clock)
+    lcd, emu = make_lcd()
+    screen = st7565.bitmap.Bitmap()
+    screen.set_pixel(1, 1)
+    lcd.write_buffer(screen)
+
+
+def test_lcd_counts():
+    metrics = st7565.metrics.Metrics()
+    lcd, emu = make_lcd(metrics=metrics)
+    metrics.reset()
+
+    screen = st7565.bitmap.Bitmap()
+    screen.set_pixel(1, 1)
+    lcd.write_buffer(screen)
+
+    snap = metrics.snapshot()
+    assert snap['counters']['lcd.flushes'] == 1
+    assert snap['counters']['lcd.data_bytes'] == 1
+    assert snap['histograms']['lcd.flush_seconds']['count'] == 1
+
+
+def test_text_exporter():
+    metrics = st7565.metrics.Metrics(buckets=(1e-3, 1e-2))
+    metrics.incr('lcd.writes', 3)
+    metrics.observe('lcd.flush_seconds', 0.002)
+    stream = io.StringIO()
+    metrics.export(st7565.metrics.TextExporter(stream))
+
+    lines = stream.getvalue().splitlines()
+    assert lines[0].split() == ['lcd.writes', '3']
+    assert lines[1].split() == ['lcd.flush_seconds', 'count=1',
+                                'mean=2000.0us']
+    assert lines[2].split() == ['<=', '10000us', '1']
+    assert len(lines) == 3
+
+
+SNAPSHOT = {
+    'time': 0,
+    'counters': {'spi.bytes': 12},
+    'histograms': {
+        'spi.message_seconds': {
+            'buckets': [0.001, 0.01],
+            'counts': [1, 2, 1],
+            'count': 4,
+            'sum': 0.5,
+        },
+    },
+}
+
+
+def test_format_prometheus():
+    assert st7565.metrics.format_prometheus(SNAPSHOT) == '''\
+# TYPE st7565_spi_bytes_total counter
+st7565_spi_bytes_total 12
+# TYPE st7565_spi_message_seconds histogram
+st7565_spi_message_seconds_bucket{le="0.001"} 1
+st7565_spi_message_seconds_bucket{le="0.01"} 3
+st7565_spi_message_seconds_bucket{le="+Inf"} 4
+st7565_spi_message_seconds_sum 0.5
+st7565_spi_message_seconds_count 4
+'''
+
+
+def test_prometheus_exporter(tmp_path, monkeypatch):
+    path = str(tmp_path / 'st7565.prom')
+    exporter = st7565.metrics.PrometheusExporter(path, prefix='x_')
+    exporter(SNAPSHOT)
+    with open(path) as fd:
+        assert fd.read() == st7565.metrics.format_prometheus(
+            SNAPSHOT, 'x_')
+
+    # A failed export leaves the previous file in place.
+    def fail(snapshot, prefix):
+        raise KeyError()
+
+    monkeypatch.setattr(st7565.metrics, 'format_prometheus', fail)
+    with pytest.raises(KeyError):
+        exporter(SNAPSHOT)
+    with open(path) as fd:
+        assert 'x_spi_bytes_total 12' in fd.read()
+    assert os.listdir(str(tmp_path)) == ['st7565.prom']
+
+
+def test_hexdump():
+    assert str(st7565.metrics.hexdump(b'\x01\xff')) == '0x1 0xff'
@@ -0,0 +1,165 @@
+import random
+import threading
+import time
+
+import pytest
+
+import st7565.bitmap
+import st7565.emulator
+import st7565.gpio
+import st7565.lcd
+import st7565.metrics
+import st7565.multi
+
+from tests.helpers import make_lcd, scribble
+
+
+class RecordingEmulator (st7565.emulator.Emulator):
+    '''An emulator that logs `(name, thread)` for every write, taking
+    `delay` seconds per write.  If `gpio` is given the A0 level is read
+    from its pins, so that panels can share a pin.'''
+
+    def __init__(self, name, log, delay=0, gpio=None, **kwargs):
+        st7565.emulator.Emulator.__init__(self, **kwargs)
+        self.name = name
+        self.log = log
+        self.delay = delay
+        self.gpio = gpio
+
+    def write(self, bytes):
+        self.log.append((self.name, threading.current_thread().name))
+        if self.delay:
+            time.sleep(self.delay)
+        if self.gpio is not None:
+            self.a0 = self.gpio.levels[self.pin_a0]
+        st7565.emulator.Emulator.write(self, bytes)
+
+
+def add_panel(displays, name, bus, log, delay=0, gpio=None, pin_a0=24):
+    emu = RecordingEmulator(name, log, delay, gpio, pin_a0=pin_a0)
+    lcd = st7565.lcd.LCD(spi=emu, gpio=emu if gpio is None else gpio,
+                         pin_a0=pin_a0, init=False,
+                         metrics=st7565.metrics.Metrics(enabled=False))
+    lcd.display_on()
+    lcd.clear()
+    displays.add(name, lcd, bus=bus)
+    return emu
+
+
+def random_screens(names, seed):
+    rng = random.Random(seed)
+    screens = {}
+    for name in names:
+        screens[name] = st7565.bitmap.Bitmap()
+        scribble(screens[name], rng)
+    return screens
+
+
+def make_multi():
+    return st7565.multi.MultiDisplay(
+        metrics=st7565.metrics.Metrics(enabled=False))
+
+
+def test_parallel_buses():
+    log = []
+    with make_multi() as displays:
+        emus = dict((name, add_panel(displays, name, bus, log, delay=0.01))
+                    for name, bus in (('a', 0), ('b', 1)))
+        del log[:]
+
+        screens = random_screens('ab', 1)
+        started = time.monotonic()
+        latencies = displays.update(screens)
+        elapsed = time.monotonic() - started
+
+    for name in 'ab':
+        assert emus[name].frame() == screens[name]
+    assert set(latencies) == {'a', 'b'}
+
+    # Each panel is written on its own bus's thread, and the two
+    # overlap, so the update takes well under the time the writes take
+    # one after another.
+    assert set(log) == {('a', 'st7565-bus-0'), ('b', 'st7565-bus-1')}
+    serial = 0.01 * len(log)
+    assert elapsed < 0.8 * serial
+
+
+def test_shared_bus_rotates():
+    log = []
+    with make_multi() as displays:
+        for name in 'abc':
+            add_panel(displays, name, 0, log, pin_a0=ord(name))
+
+        orders = []
+        for i in range(3):
+            del log[:]
+            displays.update(random_screens('abc', i))
+            order = []
+            for name, thread in log:
+                assert thread == 'st7565-bus-0'
+                if name not in order:
+                    order.append(name)
+            orders.append(order)
+
+    assert orders == [['a', 'b', 'c'], ['b', 'c', 'a'], ['c', 'a', 'b']]
+
+
+def test_shared_a0():
+    log = []
+    gpio = st7565.gpio.FakeGPIO()
+    with make_multi() as displays:
+        emus = dict((name, add_panel(displays, name, 0, log, gpio=gpio))
+                    for name in 'ab')
+        assert displays.panels['a'].shared_a0
+        assert displays.panels['b'].shared_a0
+
+        for i in range(4):
+            # Leave b believing A0 is low, while a's flush will end with
+            # it high.
+            displays['b'].display_start_line_set(0)
+            screens = random_screens('ab', i)
+            displays.update(screens)
+            for name in 'ab':
+                assert emus[name].frame() == screens[name]
+
+
+def test_different_pins_are_not_shared():
+    with make_multi() as displays:
+        add_panel(displays, 'a', 0, [], pin_a0=24)
+        add_panel(displays, 'b', 0, [], pin_a0=23)
+        add_panel(displays, 'c', 1, [], pin_a0=24)
+        assert not any(panel.shared_a0
+                       for panel in displays.panels.values())
+
+
+def test_errors():
+    log = []
+    with make_multi() as displays:
+        emus = dict((name, add_panel(displays, name, bus, log))
+                    for name, bus in (('a', 0), ('b', 0), ('c', 1)))
+
+        def fail(data):
+            raise IOError('write failed')
+
+        emus['a'].write = fail
+        screens = random_screens('abc', 1)
+        with pytest.raises(IOError):
+            displays.update(screens)
+
+        # The other panels were still written.
+        assert emus['b'].frame() == screens['b']
+        assert emus['c'].frame() == screens['c']
+
+        del emus['a'].write
+        displays.update(screens)
+        assert emus['a'].frame() == screens['a']
+
+        stats = displays.stats()
+        assert stats['a']['flushes'] == 1
+        assert stats['b']['flushes'] == 2
+        assert stats['c']['bus'] == 1
+
+        with pytest.raises(KeyError):
+            displays.update({'nonesuch': screens['a']})
+        with pytest.raises(ValueError):
+            displays.add('a', make_lcd()[0])
@@ -0,0 +1,137 @@
+import io
+import os
+import threading
+import time
+
+import pytest
+
+import st7565.bitmap
+import st7565.playback
+
+from tests.helpers import make_lcd
+
+
+def pbm(width, height, data):
+    return b'P4\n%d %d\n' % (width, height) + data
+
+
+def pgm(width, height, data, maxval=255):
+    return b'P5 %d %d %d\n' % (width, height, maxval) + data
+
+
+def test_read_netpbm():
+    stream = io.BytesIO(
+        pbm(10, 2, b'\xff\xc0\x00\x40') +
+        b'\n' +
+        b'P5\n# a comment\n3 2\n# another\n255\n' + b'\x00\x80\xff' * 2 +
+        pgm(2, 1, b'\x01\x00\x00\x80', maxval=65535))
+
+    frames = list(st7565.playback.read_netpbm(stream))
+    assert frames == [
+        (b'P4', 10, 2, 1, b'\xff\xc0\x00\x40'),
+        (b'P5', 3, 2, 255, b'\x00\x80\xff' * 2),
+        (b'P5', 2, 1, 65535, b'\x01\x00\x00\x80'),
+    ]
+
+
+def test_read_netpbm_empty():
+    assert list(st7565.playback.read_netpbm(io.BytesIO(b''))) == []
+
+
+@pytest.mark.parametrize('stream', [
+    b'P6 1 1 255\n\0\0\0',
+    b'P4 8 2\n\xff',
+    b'P4 8',
+    b'P5 x 1 255\n\0',
+])
+def test_read_netpbm_errors(stream):
+    with pytest.raises(st7565.playback.FormatError):
+        list(st7565.playback.read_netpbm(io.BytesIO(stream)))
+
+
+def test_read_raw():
+    stream = io.BytesIO(b'\1' * 1024 + b'\2' * 1024)
+    assert list(st7565.playback.read_raw(stream)) == [b'\1' * 1024,
+                                                      b'\2' * 1024]
+    with pytest.raises(st7565.playback.FormatError):
+        list(st7565.playback.read_raw(io.BytesIO(b'\1' * 1000)))
+
+
+def test_detect():
+    assert st7565.playback.detect(io.BufferedReader(
+        io.BytesIO(pbm(8, 1, b'\0')))) == 'netpbm'
+    assert st7565.playback.detect(io.BufferedReader(
+        io.BytesIO(b'\0' * 1024))) == 'raw'
+
+
+def test_decoder_centers_frames():
+    decoder = st7565.playback.Decoder()
+    bitmap = decoder.convert(b'P4', 8, 8, 1, b'\x80' + b'\0' * 7)
+    expected = st7565.bitmap.Bitmap()
+    expected.set_pixel(60, 28)
+    assert bitmap == expected
+
+    with pytest.raises(st7565.playback.FormatError):
+        decoder.convert(b'P4', 136, 1, 1, b'\0' * 17)
+
+
+def test_decoder_gray():
+    decoder = st7565.playback.Decoder(dither='threshold')
+    bitmap = decoder.convert(b'P5', 128, 64, 3,
+                             (b'\0' * 64 + b'\3' * 64) * 64)
+    expected = st7565.bitmap.Bitmap()
+    expected.fill_rect(0, 0, 63, 63)
+    assert bitmap == expected
+
+
+def test_player():
+    lcd, emu = make_lcd()
+    frames = [st7565.bitmap.Bitmap() for i in range(5)]
+    for i, frame in enumerate(frames):
+        frame.fill_rect(i * 10, 0, i * 10 + 5, 63)
+
+    stream = io.BufferedReader(io.BytesIO(b''.join(map(bytes, frames))))
+    player = st7565.playback.Player(lcd, stream, fps=0, queue_size=2)
+    player.run()
+
+    assert player.stats()['frames'] == len(frames)
+    assert emu.frame() == frames[-1]
+
+
+def test_player_error():
+    lcd, emu = make_lcd()
+    stream = io.BufferedReader(io.BytesIO(pbm(8, 1, b'\0') + b'P4 8 8\n'))
+    player = st7565.playback.Player(lcd, stream, fps=0)
+    with pytest.raises(st7565.playback.FormatError):
+        player.run()
+    assert player.frames == 1
+
+
+def test_stop_while_waiting_for_frames():
+    lcd, emu = make_lcd()
+    rfd, wfd = os.pipe()
+    stream = os.fdopen(rfd, 'rb')
+    player = st7565.playback.Player(lcd, stream, fps=0, format='raw')
+
+    thread = threading.Thread(target=player.run)
+    thread.daemon = True
+    thread.start()
+    try:
+        # One frame, then a producer that has nothing more to send.
+        frame = st7565.bitmap.Bitmap()
+        frame.fill_rect(0, 0, 9, 9)
+        os.write(wfd, bytes(frame))
+        deadline = time.monotonic() + 5
+        while player.frames < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert player.frames == 1
+
+        player.stop()
+        thread.join(2)
+        assert not thread.is_alive()
+        assert emu.frame() == frame
+    finally:
+        player.stop()
+        os.close(wfd)
+        thread.join(2)
+        stream.close()
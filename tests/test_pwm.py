@@ -0,0 +1,142 @@
+import os
+import threading
+
+import pytest
+
+import st7565.backlight
+import st7565.metrics
+import st7565.pwm
+
+RESOLUTION = st7565.pwm.RESOLUTION
+
+# 50Hz, in nanoseconds.
+PERIOD = 20000000
+
+
+def make_channel(chip, pwm):
+    path = chip / ('pwm%d' % pwm)
+    path.mkdir()
+    for name in ('enable', 'period', 'duty_cycle'):
+        (path / name).write_text('0\n')
+
+
+@pytest.fixture
+def sysfs(tmp_path):
+    '''A fake /sys/class/pwm with pwmchip0, whose channel 0 is already
+    exported.  Writing to `export` creates the other channels, as the
+    kernel would.'''
+    chip = tmp_path / 'pwmchip0'
+    chip.mkdir()
+    (chip / 'export').write_text('')
+    make_channel(chip, 0)
+
+    stop = threading.Event()
+
+    def kernel():
+        done = set()
+        while not stop.wait(0.005):
+            for line in (chip / 'export').read_text().split():
+                if line not in done:
+                    done.add(line)
+                    make_channel(chip, int(line))
+
+    thread = threading.Thread(target=kernel)
+    thread.start()
+    yield chip
+    stop.set()
+    thread.join()
+
+
+def read(chip, pwm, name):
+    # duty_cycle is rewritten in place, so only its first line counts.
+    return int((chip / ('pwm%d' % pwm) / name).read_text().split()[0])
+
+
+def test_setup(sysfs):
+    pwm = st7565.pwm.SysfsPWM(channels=(0, 1, None),
+                              path=str(sysfs.parent))
+    for channel in range(3):
+        pwm.setup(channel, 18)
+
+    assert (sysfs / 'export').read_text() == '1\n'
+    for n in (0, 1):
+        assert read(sysfs, n, 'period') == PERIOD
+        assert read(sysfs, n, 'enable') == 1
+        # Off, for an active low LED.
+        assert read(sysfs, n, 'duty_cycle') == PERIOD
+
+    pwm.close()
+    assert read(sysfs, 0, 'enable') == 0
+    assert read(sysfs, 1, 'enable') == 0
+
+
+def test_export_fails(tmp_path):
+    chip = tmp_path / 'pwmchip0'
+    chip.mkdir()
+    (chip / 'export').write_text('')
+    pwm = st7565.pwm.SysfsPWM(path=str(tmp_path))
+    with pytest.raises(OSError):
+        pwm.setup(0, 18)
+
+
+@pytest.mark.parametrize('active_low', [True, False])
+def test_set_duty(sysfs, active_low):
+    pwm = st7565.pwm.SysfsPWM(channels=(0,), freq=1000,
+                              active_low=active_low,
+                              path=str(sysfs.parent))
+    pwm.setup(0, 18)
+    period = 1000000
+    assert read(sysfs, 0, 'period') == period
+
+    for duty in (RESOLUTION, RESOLUTION // 4, 0, RESOLUTION + 10, -5):
+        pwm.set_duty(0, duty)
+        value = period * min(RESOLUTION, max(0, duty)) // RESOLUTION
+        if active_low:
+            value = period - value
+        assert read(sysfs, 0, 'duty_cycle') == value
+    pwm.close()
+
+
+def test_writes_only_changes(sysfs, monkeypatch):
+    pwm = st7565.pwm.SysfsPWM(channels=(0, None), path=str(sysfs.parent))
+    pwm.setup(0, 18)
+    pwm.setup(1, 22)
+
+    writes = []
+    pwrite = os.pwrite
+
+    def counting(fd, data, offset):
+        writes.append(data)
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, 'pwrite', counting)
+    pwm.set_duty(0, 100)
+    pwm.set_duty(0, 100)
+    pwm.set_duty(1, 100)
+    assert len(writes) == 1
+
+    # Duty cycles that round to the same value are not written either.
+    pwm.set_duty(0, 101)
+    assert len(writes) == 1 + (PERIOD * 101 // RESOLUTION !=
+                               PERIOD * 100 // RESOLUTION)
+    pwm.close()
+
+
+def test_backlight_skips_unchanged_channels():
+    pwm = st7565.pwm.FakePWM()
+    leds = st7565.backlight.Backlight(
+        backend=pwm, metrics=st7565.metrics.Metrics(enabled=False))
+    assert pwm.duties == {0: 0, 1: 0, 2: 0}
+
+    updates = pwm.updates
+    leds.set_duties((RESOLUTION, 0, 0))
+    assert pwm.updates == updates + 1
+    leds.set_duties((RESOLUTION, 0, 0))
+    assert pwm.updates == updates + 1
+    assert leds.red == 1.0
+
+
+def test_open_backend():
+    assert isinstance(st7565.pwm.open_backend('fake'), st7565.pwm.FakePWM)
+    with pytest.raises(ValueError):
+        st7565.pwm.open_backend('nonesuch')
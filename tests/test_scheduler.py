@@ -0,0 +1,102 @@
+import time
+
+import pytest
+
+import st7565.scheduler
+
+from tests.helpers import make_lcd
+
+
+def test_present():
+    lcd, emu = make_lcd()
+    with st7565.scheduler.FrameScheduler(lcd, fps=0) as sched:
+        for i in range(5):
+            sched.back.clear()
+            sched.back.fill_rect(i, i, i + 10, i + 10)
+            sched.present()
+        expected = sched.back.copy()
+        expected.clear()
+        expected.fill_rect(4, 4, 14, 14)
+
+    assert emu.frame() == expected
+    assert sched.frames == 5
+
+
+def test_present_when_not_running():
+    lcd, emu = make_lcd()
+    sched = st7565.scheduler.FrameScheduler(lcd, fps=0)
+    with pytest.raises(RuntimeError):
+        sched.present()
+
+    sched.start()
+    sched.present()
+    sched.stop()
+    with pytest.raises(RuntimeError):
+        sched.present()
+
+
+def test_writer_error_is_kept():
+    lcd, emu = make_lcd()
+
+    def write(data):
+        raise IOError('write failed')
+
+    emu.write = write
+    sched = st7565.scheduler.FrameScheduler(lcd, fps=0)
+    sched.start()
+    sched.back.set_pixel(0, 0)
+    sched.present()
+
+    for i in range(3):
+        with pytest.raises(IOError):
+            sched.present()
+    with pytest.raises(IOError):
+        sched.stop()
+
+
+def test_frames_are_paced():
+    lcd, emu = make_lcd()
+    with st7565.scheduler.FrameScheduler(lcd, fps=50) as sched:
+        started = time.monotonic()
+        for i in range(6):
+            sched.back.clear()
+            sched.back.set_pixel(i, 0)
+            sched.present()
+    elapsed = time.monotonic() - started
+
+    # Six frames on deadlines 20ms apart span at least 100ms.
+    assert elapsed >= 0.095
+    assert sched.frames == 6
+    assert sched.dropped == 0
+
+
+def test_present_without_blocking_drops_frames():
+    lcd, emu = make_lcd()
+    with st7565.scheduler.FrameScheduler(lcd, fps=5) as sched:
+        for i in range(4):
+            sched.back.clear()
+            sched.back.set_pixel(i, 0)
+            sched.present(block=False)
+    assert sched.dropped >= 1
+    assert sched.frames + sched.dropped == 4
+
+    expected = sched.back.copy()
+    expected.clear()
+    expected.set_pixel(3, 0)
+    assert emu.frame() == expected
+
+
+def test_present_copy():
+    lcd, emu = make_lcd()
+    with st7565.scheduler.FrameScheduler(lcd, fps=0) as sched:
+        sched.back.set_pixel(1, 1)
+        back = sched.present(copy=True)
+        assert back is sched.back
+        back.set_pixel(2, 2)
+        sched.present()
+
+    expected = back.copy()
+    expected.clear()
+    expected.set_pixel(1, 1)
+    expected.set_pixel(2, 2)
+    assert emu.frame() == expected
@@ -0,0 +1,143 @@
+import ctypes
+import struct
+
+import pytest
+
+import st7565.metrics
+import st7565.spidev
+
+
+class Recorder (object):
+    '''Stands in for `fcntl.ioctl`, recording each SPI message as a
+    list of `(tx_buf, len, data)` transfers.'''
+
+    def __init__(self):
+        self.messages = []
+        self.requests = []
+        self.settings = []
+
+    def __call__(self, fd, request, arg, mutate=False):
+        if isinstance(arg, ctypes.Array):
+            self.requests.append(request)
+            self.messages.append([
+                (xfer.tx_buf, xfer.len,
+                 ctypes.string_at(xfer.tx_buf, xfer.len))
+                for xfer in arg])
+        else:
+            self.settings.append((request, bytes(arg)))
+        return 0
+
+    def lengths(self):
+        return [[length for addr, length, data in message]
+                for message in self.messages]
+
+    def data(self):
+        return b''.join(data for message in self.messages
+                        for addr, length, data in message)
+
+
+@pytest.fixture
+def spi(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(st7565.spidev.fcntl, 'ioctl', recorder)
+    monkeypatch.setattr(st7565.spidev.SpiDev, 'open',
+                        lambda self: setattr(self, 'fd', 99))
+    dev = st7565.spidev.SpiDev(
+        0, 0, metrics=st7565.metrics.Metrics(enabled=False))
+    dev.bufsiz = 100
+    return dev, recorder
+
+
+def address(buf):
+    return ctypes.addressof((ctypes.c_char * len(buf)).from_buffer(buf))
+
+
+def test_message_number():
+    assert ctypes.sizeof(st7565.spidev.spi_ioc_transfer) == 32
+    # From <linux/spi/spidev.h>: _IOW('k', 0, char[32]).
+    assert st7565.spidev.SPI_IOC_MESSAGE(1) == 0x40206b00
+    assert st7565.spidev.SPI_IOC_MESSAGE(2) == 0x40406b00
+
+    size = st7565.spidev.MAX_TRANSFERS * 32
+    assert size <= st7565.spidev._IOC_SIZEMASK
+    assert size + 32 > st7565.spidev._IOC_SIZEMASK
+
+
+def test_split_at_bufsiz(spi):
+    dev, recorder = spi
+    data = bytearray(range(250))
+    dev.write(data)
+    assert recorder.lengths() == [[100], [100], [50]]
+    assert recorder.data() == data
+
+
+def test_segments_share_messages(spi):
+    dev, recorder = spi
+    segments = [bytearray([i]) * 60 for i in range(3)]
+    dev.write_segments(segments)
+    assert recorder.lengths() == [[60, 40], [20, 60]]
+    assert recorder.data() == b''.join(segments)
+    assert recorder.requests == [st7565.spidev.SPI_IOC_MESSAGE(2)] * 2
+
+
+def test_split_at_max_transfers(spi):
+    dev, recorder = spi
+    dev.bufsiz = 4096
+    count = st7565.spidev.MAX_TRANSFERS + 10
+    dev.write_segments([bytearray([i & 0xff]) for i in range(count)])
+
+    assert [len(message) for message in recorder.messages] == [
+        st7565.spidev.MAX_TRANSFERS, 10]
+    assert recorder.requests == [
+        st7565.spidev.SPI_IOC_MESSAGE(st7565.spidev.MAX_TRANSFERS),
+        st7565.spidev.SPI_IOC_MESSAGE(10)]
+    assert recorder.data() == bytearray(i & 0xff for i in range(count))
+
+
+def test_no_copy(spi):
+    dev, recorder = spi
+    buf = bytearray(range(80))
+    dev.write(buf)
+    assert recorder.messages[0][0][0] == address(buf)
+
+    view = memoryview(buf)[10:30]
+    dev.write(view)
+    assert recorder.messages[1][0][:2] == (address(buf) + 10, 20)
+
+    data = bytes(buf)
+    dev.write(data)
+    assert recorder.messages[2][0][0] == ctypes.cast(
+        ctypes.c_char_p(data), ctypes.c_void_p).value
+
+    # A large buffer is split in place.
+    big = bytearray(250)
+    dev.write(big)
+    assert [addr for addr, length, chunk in
+            sum(recorder.messages[3:], [])] == [
+        address(big), address(big) + 100, address(big) + 200]
+
+
+def test_other_buffers_are_copied(spi):
+    dev, recorder = spi
+    dev.write(memoryview(b'abc'))
+    dev.write([1, 2, 3])
+    dev.write(b'')
+    assert recorder.data() == b'abc\x01\x02\x03'
+
+
+def test_settings(spi):
+    dev, recorder = spi
+    dev.max_speed_hz = 8000000
+    dev.mode = st7565.spidev.SPI_MODE_3
+    assert recorder.settings == [
+        (st7565.spidev.SPI_IOC_WR_MAX_SPEED_HZ, struct.pack('I', 8000000)),
+        (st7565.spidev.SPI_IOC_WR_MODE, b'\x03'),
+    ]
+
+
+def test_read_bufsiz(tmp_path):
+    path = tmp_path / 'bufsiz'
+    path.write_text('65536\n')
+    assert st7565.spidev.read_bufsiz(str(path)) == 65536
+    assert st7565.spidev.read_bufsiz(str(tmp_path / 'missing')) == (
+        st7565.spidev.BUFSIZ)
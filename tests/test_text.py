@@ -0,0 +1,89 @@
+import pytest
+
+import st7565.bitmap
+import st7565.fonts.font5x7 as font5x7
+import st7565.text
+
+from tests.helpers import make_lcd
+
+
+def pixels(bitmap):
+    return set((x, y) for y in range(bitmap.height)
+               for x in range(bitmap.columns)
+               if bitmap[(y // 8) * bitmap.columns + x] & (0x80 >> (y % 8)))
+
+
+def test_glyph_cache():
+    renderer = st7565.text.TextRenderer()
+    glyph = renderer.glyph('A')
+    assert renderer.glyph('A') is glyph
+    assert glyph == (bytes(bytearray(font5x7.glyphs[ord('A')])),)
+
+
+def test_missing_glyph():
+    renderer = st7565.text.TextRenderer()
+    assert renderer.glyph(u'☃') == renderer.glyph('?')
+
+
+def test_render():
+    renderer = st7565.text.TextRenderer()
+    assert renderer.render('Hi') == (bytes(bytearray(font5x7.glyphs[72])) +
+                                     bytes(bytearray(font5x7.glyphs[105])))
+    assert renderer.width('Hi') == 10
+
+
+@pytest.mark.parametrize('y', range(1, 8))
+def test_draw_unaligned(y):
+    aligned = st7565.bitmap.Bitmap()
+    aligned.puts(3, 8, 'Wq|')
+    expected = set((x, py - 8 + y) for x, py in pixels(aligned))
+
+    bitmap = st7565.bitmap.Bitmap()
+    bitmap.puts(3, y, 'Wq|')
+    assert pixels(bitmap) == expected
+
+
+def test_draw_clear():
+    bitmap = st7565.bitmap.Bitmap()
+    bitmap.fill_rect(0, 0, 127, 63)
+    bitmap.puts(10, 13, 'Hello', pen=False)
+
+    drawn = st7565.bitmap.Bitmap()
+    drawn.puts(10, 13, 'Hello')
+    assert pixels(bitmap) == set(
+        (x, y) for x in range(128) for y in range(64)) - pixels(drawn)
+
+
+def test_draw_clipped():
+    bitmap = st7565.bitmap.Bitmap()
+    bitmap.puts(-3, -4, 'AB')
+    bitmap.puts(125, 60, 'AB')
+
+    whole = st7565.bitmap.Bitmap()
+    whole.puts(0, 8, 'AB')
+    expected = set()
+    for x, y in pixels(whole):
+        for dx, dy in ((-3, -12), (125, 52)):
+            if 0 <= x + dx < 128 and 0 <= y + dy < 64:
+                expected.add((x + dx, y + dy))
+    assert pixels(bitmap) == expected
+
+
+def test_lcd_puts():
+    lcd, emu = make_lcd()
+    lcd.pos(3, 0)
+    lcd.putc('A')
+    lcd.puts('bc')
+
+    expected = st7565.bitmap.Bitmap()
+    expected.puts(0, 24, 'Abc')
+    assert emu.frame() == expected
+
+
+def test_lcd_puts_at():
+    lcd, emu = make_lcd()
+    lcd.puts_at(2, 10, 'Hello')
+
+    expected = st7565.bitmap.Bitmap()
+    expected.puts(10, 16, 'Hello')
+    assert emu.frame() == expected
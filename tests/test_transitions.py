@@ -0,0 +1,132 @@
+import threading
+import time
+
+import st7565.backlight
+import st7565.metrics
+import st7565.pwm
+import st7565.transitions
+
+RESOLUTION = st7565.backlight.RESOLUTION
+
+
+def make_backlight():
+    pwm = st7565.pwm.FakePWM()
+    leds = st7565.backlight.Backlight(
+        backend=pwm, metrics=st7565.metrics.Metrics(enabled=False))
+    return leds, pwm
+
+
+class FakeClock (object):
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_build_drops_unchanged_steps():
+    transition = st7565.transitions.fade((0, 0, 0), (0, 0, 0), 1.0)
+    assert len(transition) == 1
+
+    transition = st7565.transitions.fade((0, 0, 0), (1, 0, 0), 1.0)
+    assert transition.steps[0] == (0, (0, 0, 0))
+    assert transition.steps[-1] == (1.0, (RESOLUTION, 0, 0))
+    duties = [step[1] for step in transition.steps]
+    assert len(set(duties)) == len(duties)
+
+
+def test_to_duty():
+    assert st7565.transitions.to_duty(0) == 0
+    assert st7565.transitions.to_duty(1) == RESOLUTION
+    assert st7565.transitions.to_duty(2) == RESOLUTION
+    # Gamma correction keeps the bottom half dim.
+    assert st7565.transitions.to_duty(0.5) < RESOLUTION // 4
+
+
+def test_fade():
+    leds, pwm = make_backlight()
+    clock = FakeClock()
+    scheduler = st7565.transitions.Scheduler(clock=clock)
+    job = leds.fade(1, 0.5, 0, duration=1.0, scheduler=scheduler)
+
+    seen = []
+    while not job.done:
+        wait = scheduler.tick()
+        seen.append(pwm.duties[0])
+        clock.now += wait or 0
+
+    assert seen == sorted(seen)
+    assert pwm.duties[0] == RESOLUTION
+    assert pwm.duties[2] == 0
+    assert 0 < pwm.duties[1] < RESOLUTION
+    assert scheduler.tick() is None
+
+
+def test_loop_skips_whole_cycles():
+    leds, pwm = make_backlight()
+    clock = FakeClock()
+    scheduler = st7565.transitions.Scheduler(clock=clock)
+    transition = st7565.transitions.pulse((1, 1, 1), period=1.0)
+    job = leds.transition(transition, scheduler=scheduler)
+
+    scheduler.tick()
+    clock.now += 10.25
+    assert 0 < scheduler.tick() <= st7565.transitions.INTERVAL
+    assert job.started == 110.0
+    assert pwm.duties[0] > 0
+
+
+def test_stop_transition():
+    leds, pwm = make_backlight()
+    clock = FakeClock(0.0)
+    scheduler = st7565.transitions.Scheduler(clock=clock)
+    leds.transition(st7565.transitions.pulse((1, 1, 1), period=1.0),
+                    scheduler=scheduler)
+
+    scheduler.tick()
+    clock.now = 0.25
+    scheduler.tick()
+    duties = dict(pwm.duties)
+    assert duties[0] > 0
+
+    leds.stop_transition()
+    clock.now = 0.5
+    assert scheduler.tick() is None
+    assert pwm.duties == duties
+
+
+def test_default_scheduler_starts_no_thread(monkeypatch):
+    monkeypatch.setattr(st7565.transitions, '_default', None)
+    leds, pwm = make_backlight()
+    threads = threading.active_count()
+
+    job = leds.transition(st7565.transitions.fade((0, 0, 0), (1, 1, 1),
+                                                  0.1))
+    assert threading.active_count() == threads
+    scheduler = st7565.transitions.default_scheduler()
+    assert scheduler._thread is None
+    assert pwm.duties[0] == 0
+
+    # Ticking it from our own loop plays the transition.
+    deadline = time.monotonic() + 5
+    while not job.done and time.monotonic() < deadline:
+        time.sleep(scheduler.tick() or 0)
+    assert job.done
+    assert pwm.duties[0] == RESOLUTION
+
+
+def test_background_thread():
+    leds, pwm = make_backlight()
+    scheduler = st7565.transitions.Scheduler()
+    scheduler.start()
+    try:
+        job = leds.fade(1, 1, 1, duration=0.1, scheduler=scheduler)
+        deadline = time.monotonic() + 5
+        while not job.done and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert job.done
+        assert pwm.duties == {0: RESOLUTION, 1: RESOLUTION, 2: RESOLUTION}
+    finally:
+        scheduler.stop()
+    assert scheduler._thread is None